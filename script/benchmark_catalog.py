@@ -0,0 +1,79 @@
+import os
+import sys
+import random
+import time
+from itertools import islice
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from service.catalog import FileCatalog
+from service.database import PicFile, FileQuery
+
+FILE_COUNT = 300_000
+ROUNDS = 5
+PAGE_SIZE = 200
+
+def measure(operation) -> float:
+    start_time = time.perf_counter()
+    for _ in range(ROUNDS):
+        operation()
+    return (time.perf_counter() - start_time) / ROUNDS
+
+def list_pic_files(pic_files: list[PicFile], query: FileQuery, pids: set[int] = None) -> list[PicFile]:
+    """The per-object filter and sort the picture browser used before the catalog"""
+    result = []
+    for pic_file in pic_files:
+        if pids is not None and pic_file.pid not in pids:
+            continue
+        if pic_file.file_type in query.excluded_file_types:
+            continue
+        if pic_file.width < query.width_range[0] or pic_file.height > query.height_range[1]:
+            continue
+        result.append(pic_file)
+    if query.ratio is not None:
+        result.sort(key=lambda pic_file: abs(pic_file.ratio - query.ratio))
+    return result
+
+def list_catalog_page(catalog: FileCatalog, query: FileQuery, pids: set[int] = None, size: int = None) -> list[PicFile]:
+    """The files of the first page of ResultCursor, or of all pages"""
+    return catalog.get_pic_files(islice(catalog.iter_query_rows(query, pids), size))
+
+def list_catalog_rows(catalog: FileCatalog, query: FileQuery, pids: set[int] = None) -> list[int]:
+    """Every row of a listing, without building the PicFile objects of the pages"""
+    return list(catalog.iter_query_rows(query, pids))
+
+if __name__ == "__main__":
+    random.seed(0)
+    rows = []
+    pid = 10_000_000
+    while len(rows) < FILE_COUNT:
+        pid += random.randint(1, 300)
+        for num in range(random.choice((1, 1, 1, 2, 3, 8))):
+            width, height = random.randint(500, 4000), random.randint(500, 4000)
+            file_type = random.choice(("jpg", "jpg", "png", "gif"))
+            rows.append((pid, num, "D:/pixiv", f"{pid}_p{num}.{file_type}", file_type, width, height, width * height // 3, width / height))
+
+    pic_files = [PicFile(*row) for row in rows]
+    catalog = FileCatalog(rows)
+    all_pids = sorted(catalog.pid_ranges)
+    tag_pids = set(random.sample(all_pids, len(all_pids) // 8)) # the result of a broad tag
+    by_pid = FileQuery(frozenset({"png"}), (1000, -1), (-1, 3000))
+    by_ratio = FileQuery(frozenset({"png"}), (1000, -1), (-1, 3000), 0.75)
+    next(catalog.iter_rows_by_ratio(0.75)) # the ratio order is built once per catalog
+
+    print(f"{len(rows)} files, {len(tag_pids)} pids of a tag, {ROUNDS} rounds per operation")
+    print(f"{'listing':>22} | {'PicFile ms':>10} | {'first page ms':>13} | {'all rows ms':>11}")
+    for name, query, pids in (
+        ("all files by pid", by_pid, None),
+        ("all files by ratio", by_ratio, None),
+        ("tag files by pid", by_pid, tag_pids),
+        ("tag files by ratio", by_ratio, tag_pids),
+    ):
+        expected = list_pic_files(pic_files, query, pids)
+        assert list_catalog_page(catalog, query, pids) == expected
+        assert list_catalog_page(catalog, query, pids, PAGE_SIZE) == expected[:PAGE_SIZE]
+        print(
+            f"{name:>22} | {measure(lambda: list_pic_files(pic_files, query, pids)) * 1000:>10.1f} | "
+            f"{measure(lambda: list_catalog_page(catalog, query, pids, PAGE_SIZE)) * 1000:>13.1f} | "
+            f"{measure(lambda: list_catalog_rows(catalog, query, pids)) * 1000:>11.1f}"
+        )
@@ -0,0 +1,104 @@
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from service.database import PicDatabase
+from service.tag_tree import TagTree
+
+ROW_COUNT = 100_000
+TAG_TREE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "tag_tree.json")
+
+def build_database(database: PicDatabase, tag_tree: TagTree, row_count: int) -> None:
+    """Fill the database with pictures tagged with tree tags, synonyms and tags outside the tree"""
+    tags = tag_tree.get_tag_list()
+    tags += [synonym for tag in tag_tree.tag_dict.values() for synonym in tag.synonyms]
+    tags += [f"unknown tag {i}" for i in range(2000)]
+    metadata_rows = []
+    for pid in range(1, row_count + 1):
+        pic_tags = database.tag_dictionary.encode(random.sample(tags, 10), database.cursor)
+        metadata_rows.append((pid, f"title {pid}", pic_tags, b"", "", f"user {pid % 1000}", pid % 1000, "2024-01-01", "allAges", 0, 0, 0, 0))
+
+    database.cursor.executemany("INSERT INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", metadata_rows)
+    database.database.commit()
+
+def complete_tag_per_pid(database: PicDatabase, tag_tree: TagTree) -> None:
+    """The previous completion, one read and one update per picture"""
+    connection = database.database
+    all_parent_tag_dict = tag_tree.get_all_parent_tag(include_synonyms=True)
+    cursor = connection.cursor()
+    pid_list = [row[0] for row in cursor.execute("SELECT pid FROM metadata").fetchall()]
+    for pid in pid_list:
+        tags = set(database.tag_dictionary.decode(cursor.execute("SELECT tags FROM metadata WHERE pid = ?", (pid,)).fetchone()[0]))
+        completed_tags = set()
+        for tag in tags:
+            if tag in all_parent_tag_dict:
+                completed_tags.update(all_parent_tag_dict[tag])
+            if tag_tree.is_in_tree(tag):
+                completed_tags.add(tag)
+        cursor.execute("UPDATE metadata SET completedTags = ? WHERE pid = ?", (database.tag_dictionary.encode(completed_tags, cursor), pid))
+    connection.commit()
+
+def get_completed_tags(database: PicDatabase) -> dict[int, set[str]]:
+    rows = database.cursor.execute("SELECT pid, completedTags FROM metadata").fetchall()
+    return {pid: set(database.tag_dictionary.decode(tags)) for pid, tags in rows}
+
+def measure(func, *args) -> tuple[float, object]:
+    start_time = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start_time, result
+
+if __name__ == "__main__":
+    random.seed(0)
+    tag_tree = TagTree(TAG_TREE_FILE)
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory) # PicDatabase always opens pic_data.db in the working directory
+        database = PicDatabase()
+        build_database(database, tag_tree, ROW_COUNT)
+
+        per_pid_time, _ = measure(complete_tag_per_pid, database, tag_tree)
+        expected = get_completed_tags(database)
+        database.cursor.execute("UPDATE metadata SET completedTags = x''")
+        database.database.commit()
+        batched_time, _ = measure(database.complete_tag, tag_tree)
+        assert get_completed_tags(database) == expected
+        unchanged_time, changed_pids = measure(database.complete_tag, tag_tree)
+        assert not changed_pids
+
+        # the subtree mode finds the pictures of the edited tags through the tag index and the tag counts
+        database.count_tags()
+        database.init_tag_index(tag_tree)
+
+        # move a subtree under a tag of another branch, like a drag and drop in the tag manager
+        subtree_tag = max(tag_tree.get_tag_list(), key=lambda tag: len(tag_tree.get_sub_tags(tag)) < 30 and len(tag_tree.get_sub_tags(tag)))
+        subtree = {subtree_tag} | tag_tree.get_sub_tags(subtree_tag)
+        new_parent = next(
+            tag for tag in tag_tree.get_tag_list() 
+            if tag not in subtree and tag not in tag_tree.get_all_parent_tag()[subtree_tag] and tag_tree.get_all_parent_tag()[tag]
+        )
+        tag_tree.add_parent_tag(subtree_tag, new_parent)
+        changed_tags = tag_tree.get_changed_tags()
+        subtree_time, subtree_pids = measure(lambda: database.complete_tag(tag_tree, affected_tags=changed_tags))
+        subtree_completed_tags = get_completed_tags(database)
+
+        # undo the edit, then time a full recompletion of the same edit
+        tag_tree.delete_tag(subtree_tag, new_parent)
+        database.complete_tag(tag_tree)
+        tag_tree.add_parent_tag(subtree_tag, new_parent)
+        full_time, full_pids = measure(database.complete_tag, tag_tree)
+        assert subtree_pids and sorted(subtree_pids) == sorted(full_pids)
+        assert get_completed_tags(database) == subtree_completed_tags
+
+        print(f"{ROW_COUNT} pictures, {len(tag_tree.tag_dict)} tree tags")
+        print(f"per pid completion: {per_pid_time:.3f} s")
+        print(f"batched completion: {batched_time:.3f} s ({per_pid_time / batched_time:.1f}x)")
+        print(f"batched completion without changes: {unchanged_time:.3f} s")
+        print(f"moving {subtree_tag} with {len(changed_tags)} tags and synonyms changes {len(full_pids)} pictures")
+        print(f"full recompletion: {full_time:.3f} s")
+        print(f"subtree recompletion: {subtree_time:.3f} s ({full_time / subtree_time:.1f}x)")
+        database.database.close()
+        os.chdir(os.path.dirname(directory))
@@ -0,0 +1,79 @@
+import os
+import sys
+import random
+import sqlite3
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from service.database import PicDatabase, PicMetadata, PicFile, METADATA_GRID_FIELDS
+
+ROW_COUNT = 100_000
+QUERY_SIZE = 40_000
+
+def build_database(database: PicDatabase, row_count: int) -> None:
+    """Fill the database with synthetic metadata and image data rows"""
+    tags = [f"#tag{i}" for i in range(500)]
+    metadata_rows = []
+    image_rows = []
+    for pid in range(1, row_count + 1):
+        pic_tags = database.tag_dictionary.encode(random.sample(tags, 8), database.cursor)
+        metadata_rows.append((pid, f"title {pid}", pic_tags, pic_tags, "", f"user {pid % 1000}", pid % 1000, "2024-01-01", "allAges", 0, 0, 0, 0))
+        for num in range(random.randint(1, 3)):
+            image_rows.append((pid, num, "/pics", f"{pid}_p{num}.jpg", "jpg", 1000, 1500, 500_000, 1000 / 1500))
+
+    database.cursor.executemany("INSERT INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", metadata_rows)
+    database.cursor.executemany("INSERT INTO imageData VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", image_rows)
+    database.database.commit()
+
+def fetch_per_pid(cursor: sqlite3.Cursor, pids: list[int]) -> tuple[dict, list]:
+    """The previous fetch path, one query per pid"""
+    metadata_dict = {}
+    for pid in pids:
+        cursor.execute("SELECT * FROM metadata WHERE pid = ?", (pid,))
+        metadata = cursor.fetchone()
+        if metadata:
+            metadata_dict[pid] = PicMetadata(*metadata)
+
+    file_list = []
+    for pid in pids:
+        cursor.execute("SELECT * FROM imageData WHERE pid = ?", (pid,))
+        file_list.extend(PicFile(*data) for data in cursor.fetchall())
+
+    return metadata_dict, file_list
+
+def fetch_batched(database: PicDatabase, pids: list[int]) -> tuple[dict, list]:
+    """The chunked set-based fetch path"""
+    return database.get_metadata_dict(pids), database.get_file_list(pids)
+
+def fetch_grid_metadata(database: PicDatabase, pids: list[int]) -> dict:
+    """The metadata fetched for a page of the picture grid, only the shown fields"""
+    return database.get_metadata_dict(pids, fields=METADATA_GRID_FIELDS)
+
+def measure(func, *args) -> tuple[float, object]:
+    start_time = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start_time, result
+
+if __name__ == "__main__":
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory) # PicDatabase always opens pic_data.db in the working directory
+        database = PicDatabase()
+        build_database(database, ROW_COUNT)
+        pids = random.sample(range(1, ROW_COUNT + 1), QUERY_SIZE)
+
+        per_pid_time, (per_pid_metadata, per_pid_files) = measure(fetch_per_pid, database.cursor, pids)
+        batched_time, (batched_metadata, batched_files) = measure(fetch_batched, database, pids)
+        assert per_pid_metadata.keys() == batched_metadata.keys()
+        assert len(per_pid_files) == len(batched_files)
+        grid_time, grid_metadata = measure(fetch_grid_metadata, database, pids)
+        assert all(grid_metadata[pid].title == batched_metadata[pid].title for pid in pids)
+
+        print(f"{ROW_COUNT} rows, fetching {QUERY_SIZE} pids")
+        print(f"per pid queries: {per_pid_time:.3f} s")
+        print(f"batched queries: {batched_time:.3f} s ({per_pid_time / batched_time:.1f}x)")
+        print(f"grid fields metadata: {grid_time:.3f} s")
+        database.database.close()
+        os.chdir(os.path.dirname(directory))
@@ -0,0 +1,39 @@
+import os
+import sys
+import random
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.pid_set import PidSet, set_nbytes
+
+PID_RANGE = 130_000_000 # pixiv illustration ids
+LIBRARY_SIZE = 300_000
+ROUNDS = 20
+
+def measure(operation, argument) -> float:
+    start_time = time.perf_counter()
+    for _ in range(ROUNDS):
+        operation(argument)
+    return (time.perf_counter() - start_time) / ROUNDS
+
+if __name__ == "__main__":
+    random.seed(0)
+    library = random.sample(range(PID_RANGE), LIBRARY_SIZE)
+    # newer illustrations are denser in a real library, mix a uniform part with a recent dense part
+    library += random.sample(range(PID_RANGE - 2_000_000, PID_RANGE), LIBRARY_SIZE // 2)
+
+    # a cached posting is built once from the rows of tagPosting, every search using it turns it into a frozenset
+    print(f"{len(set(library))} pids in the library, {ROUNDS} rounds per operation")
+    print(f"{'pids':>8} | {'set MB':>7} | {'PidSet MB':>9} | {'build set ms':>12} | {'build PidSet ms':>15} | {'to set ms':>9}")
+    for size in (1_000, 40_000, 200_000):
+        posting = sorted(set(random.sample(library, size)))
+        pids = frozenset(posting)
+        pid_set = PidSet(posting)
+        assert pid_set == pids and list(pid_set) == posting
+
+        print(
+            f"{size:>8} | {set_nbytes(pids) / 1024**2:>7.2f} | {pid_set.nbytes() / 1024**2:>9.2f} | "
+            f"{measure(frozenset, posting) * 1000:>12.2f} | {measure(PidSet, posting) * 1000:>15.2f} | "
+            f"{measure(frozenset, pid_set) * 1000:>9.2f}"
+        )
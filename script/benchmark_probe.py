@@ -0,0 +1,59 @@
+import os
+import sys
+import random
+import tempfile
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from utils.image_size import probe_image_size, read_image_size_with_pil
+
+FILE_COUNT = 2000
+
+def create_pictures(directory: str, count: int) -> list[str]:
+    """Create small pictures of every probed format, including progressive and EXIF JPEGs"""
+    file_paths = []
+    for i in range(count):
+        width, height = random.randint(16, 400), random.randint(16, 400)
+        image = Image.new("RGB", (width, height), (i % 256, 0, 0))
+        kind = i % 5
+        if kind == 0:
+            file_path = os.path.join(directory, f"{i}_p0.png")
+            image.save(file_path)
+        elif kind == 1:
+            file_path = os.path.join(directory, f"{i}_p0.gif")
+            image.save(file_path)
+        elif kind == 2:
+            file_path = os.path.join(directory, f"{i}_p0.jpg")
+            image.save(file_path, progressive=True)
+        elif kind == 3:
+            file_path = os.path.join(directory, f"{i}_p0.jpg")
+            exif = Image.Exif()
+            exif[0x010E] = "x" * 20000 # a large APP1 segment before the frame header
+            image.save(file_path, exif=exif)
+        else:
+            file_path = os.path.join(directory, f"{i}_p0.jpg")
+            image.save(file_path)
+
+        file_paths.append(file_path)
+
+    return file_paths
+
+def measure(probe, file_paths: list[str]) -> tuple[float, list]:
+    start_time = time.perf_counter()
+    result = [probe(file_path) for file_path in file_paths]
+    return time.perf_counter() - start_time, result
+
+if __name__ == "__main__":
+    random.seed(0)
+    with tempfile.TemporaryDirectory() as directory:
+        file_paths = create_pictures(directory, FILE_COUNT)
+        pil_time, pil_sizes = measure(read_image_size_with_pil, file_paths)
+        probe_time, probe_sizes = measure(probe_image_size, file_paths)
+        assert [tuple(size) for size in pil_sizes] == [tuple(size) for size in probe_sizes]
+
+        print(f"{FILE_COUNT} pictures")
+        print(f"PIL:          {pil_time:.3f} s")
+        print(f"header probe: {probe_time:.3f} s ({pil_time / probe_time:.1f}x)")
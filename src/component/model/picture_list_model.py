@@ -0,0 +1,163 @@
+from PySide6.QtCore import QAbstractListModel, QModelIndex, QPersistentModelIndex, Qt, Signal
+from PySide6.QtGui import QImage, QPixmap
+
+from service.database import PicFile, PicMetadata, ResultCursor
+from utils.cache import LRUCache
+
+# role returning the texts shown under a picture: title, illustrator, resolution, pid and file info
+PIC_INFO_ROLE = Qt.ItemDataRole.UserRole + 1
+
+class PictureListModel(QAbstractListModel):
+    """
+    List model of the pictures shown in the picture browser.
+
+    A row is either a PicMetadata, shown with the cover file of the pid, or a single PicFile.
+    Rows are read from a ResultCursor a page at a time, the view asks for the next page with fetchMore
+    when it is scrolled to the last row, so only the pages scrolled to are ever loaded.
+    Thumbnails missing from the cache are requested with thumbnail_requested whenever a row is painted
+    and handed back with set_thumbnail, the loader ignores requests that are already in flight.
+    Decoded thumbnails are kept in a bounded cache keyed by pid and num, so memory does not grow with the rows
+    scrolled past and thumbnails are reused when a picture shows up again in another query.
+    """
+    thumbnail_requested = Signal(object)
+
+    def __init__(self, max_thumbnails: int, page_size: int, parent=None):
+        super().__init__(parent)
+        self.page_size = page_size
+        self.result_cursor: ResultCursor | None = None
+        self.pics: list[PicFile | PicMetadata] = []
+        self.pic_file_dict: dict[int, list[PicFile]] = {}
+        self.cover_files: list[PicFile | None] = []
+        self.key_rows: dict[tuple[int, int], int] = {}
+        self.thumbnails = LRUCache(max_thumbnails)
+
+    def set_cursor(self, result_cursor: ResultCursor) -> None:
+        """
+        Replace the rows of the model with the rows of a result, the first page is fetched right away.
+        The cursor of the previous result is closed.
+        """
+        self.beginResetModel()
+        if self.result_cursor is not None:
+            self.result_cursor.close()
+        self.result_cursor = result_cursor
+        self.pics = []
+        self.pic_file_dict = {}
+        self.cover_files = []
+        self.key_rows = {}
+        self._append_pics(*result_cursor.fetch(self.page_size))
+        self.endResetModel()
+
+    def canFetchMore(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> bool:
+        if parent.isValid() or self.result_cursor is None:
+            return False
+        return not self.result_cursor.exhausted
+
+    def fetchMore(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> None:
+        if not self.canFetchMore(parent):
+            return
+        
+        first_row = len(self.pics)
+        pics, pic_file_dict = self.result_cursor.fetch(self.page_size)
+        if not pics:
+            return
+        
+        self.beginInsertRows(QModelIndex(), first_row, first_row + len(pics) - 1)
+        self._append_pics(pics, pic_file_dict)
+        self.endInsertRows()
+
+    def _append_pics(self, pics: list[PicFile | PicMetadata], pic_file_dict: dict[int, list[PicFile]]) -> None:
+        """
+        Append rows to the model.
+
+        Parameters:
+        pics (list): The pictures to show, in display order.
+        pic_file_dict (dict): The files of each pid, needed for PicMetadata rows.
+        """
+        self.pic_file_dict.update(pic_file_dict)
+        for pic in pics:
+            if isinstance(pic, PicMetadata):
+                pic_files = self.pic_file_dict.get(pic.pid)
+                cover_file = pic_files[0] if pic_files else None # files are ordered by num
+            else:
+                cover_file = pic
+            
+            if cover_file is not None:
+                self.key_rows[(cover_file.pid, cover_file.num)] = len(self.pics)
+            self.pics.append(pic)
+            self.cover_files.append(cover_file)
+
+    def set_thumbnail(self, key: tuple[int, int], image: QImage) -> None:
+        """
+        Store a loaded thumbnail and repaint its row, a null image marks a picture that could not be read.
+        """
+        self.thumbnails.put(key, QPixmap.fromImage(image))
+        row = self.key_rows.get(key)
+        if row is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index, [Qt.ItemDataRole.DecorationRole])
+
+    def clear_thumbnails(self) -> None:
+        self.thumbnails.clear()
+
+    def get_uncached_files(self, rows: range) -> list[PicFile]:
+        """
+        Get the cover files of rows whose thumbnails are not in the cache, in row order.
+        """
+        pic_files = []
+        for row in range(max(rows.start, 0), min(rows.stop, len(self.pics))):
+            cover_file = self.cover_files[row]
+            if cover_file is not None and (cover_file.pid, cover_file.num) not in self.thumbnails:
+                pic_files.append(cover_file)
+        
+        return pic_files
+
+    def rowCount(self, parent: QModelIndex | QPersistentModelIndex = QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self.pics)
+
+    def data(self, index: QModelIndex | QPersistentModelIndex, role: int = Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        
+        row = index.row()
+        if role == Qt.ItemDataRole.DecorationRole:
+            return self._get_thumbnail(row)
+        elif role == PIC_INFO_ROLE:
+            return self._get_pic_info(row)
+        elif role == Qt.ItemDataRole.DisplayRole:
+            return self._get_pic_info(row)[0]
+        
+        return None
+
+    def _get_thumbnail(self, row: int) -> QPixmap | None:
+        cover_file = self.cover_files[row]
+        if cover_file is None:
+            return None
+        
+        key = (cover_file.pid, cover_file.num)
+        thumbnail = self.thumbnails.get(key)
+        if thumbnail is None:
+            self.thumbnail_requested.emit(cover_file)
+        
+        return thumbnail
+
+    def _get_pic_info(self, row: int) -> tuple[str, str, str, str, str]:
+        pic = self.pics[row]
+        if isinstance(pic, PicMetadata):
+            pic_files = self.pic_file_dict.get(pic.pid, [])
+            if len(pic_files) > 1:
+                return pic.title, pic.user, "", str(pic.pid), f"{len(pic_files)} pics"
+            elif pic_files:
+                return pic.title, pic.user, *self._get_file_info(pic_files[0])
+            return pic.title, pic.user, "", str(pic.pid), ""
+        
+        return f"{pic.pid} - {pic.num}", "", *self._get_file_info(pic)
+
+    @staticmethod
+    def _get_file_info(pic_file: PicFile) -> tuple[str, str, str]:
+        return (
+            f"{pic_file.width}x{pic_file.height}", 
+            str(pic_file.pid), 
+            f"{pic_file.file_type} | {pic_file.size / 1024**2:.2f} MB"
+        )
@@ -0,0 +1,94 @@
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyleOptionViewItem, QAbstractItemView, QStyle
+from PySide6.QtGui import QPainter, QPalette
+from PySide6.QtCore import QModelIndex, QPersistentModelIndex, QRect, QSize, Qt
+
+from component.model.picture_list_model import PIC_INFO_ROLE
+from tools.setting import THUMBNAIL_SIZE
+
+CARD_SIZE = QSize(250, 325)
+CARD_MARGIN = 9
+TITLE_HEIGHT = 35
+INFO_LINE_HEIGHT = 20
+
+class PictureDelegate(QStyledItemDelegate):
+    """Paint a picture card: the thumbnail, the title and two lines of picture info"""
+    def sizeHint(self, option: QStyleOptionViewItem, index: QModelIndex | QPersistentModelIndex) -> QSize:
+        return CARD_SIZE
+
+    def paint(self, painter: QPainter, option: QStyleOptionViewItem, index: QModelIndex | QPersistentModelIndex) -> None:
+        painter.save()
+        card_rect = option.rect.adjusted(2, 2, -3, -3)
+        if option.state & QStyle.StateFlag.State_MouseOver:
+            painter.fillRect(card_rect, option.palette.color(QPalette.ColorRole.AlternateBase))
+        painter.setPen(option.palette.color(QPalette.ColorRole.Mid))
+        painter.drawRect(card_rect)
+
+        image_rect = QRect(0, 0, *THUMBNAIL_SIZE)
+        image_rect.moveTop(card_rect.top() + CARD_MARGIN)
+        image_rect.moveLeft(card_rect.left() + (card_rect.width() - image_rect.width()) // 2)
+        thumbnail = index.data(Qt.ItemDataRole.DecorationRole)
+        if thumbnail is not None and not thumbnail.isNull():
+            target_rect = QRect(image_rect.topLeft(), thumbnail.size().boundedTo(image_rect.size()))
+            if target_rect.size() != thumbnail.size():
+                target_rect.setSize(thumbnail.size().scaled(image_rect.size(), Qt.AspectRatioMode.KeepAspectRatio))
+            target_rect.moveCenter(image_rect.center())
+            painter.drawPixmap(target_rect, thumbnail)
+        else:
+            painter.fillRect(image_rect, option.palette.color(QPalette.ColorRole.Midlight))
+
+        title, illustrator, resolution, pid, file_info = index.data(PIC_INFO_ROLE)
+        painter.setPen(option.palette.color(QPalette.ColorRole.Text))
+        text_left = card_rect.left() + CARD_MARGIN
+        text_width = card_rect.width() - 2 * CARD_MARGIN
+        title_rect = QRect(text_left, image_rect.bottom() + 1, text_width, TITLE_HEIGHT)
+        painter.drawText(
+            title_rect, 
+            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, 
+            option.fontMetrics.elidedText(title, Qt.TextElideMode.ElideRight, text_width)
+        )
+        self._draw_info_line(painter, option, QRect(text_left, title_rect.bottom() + 1, text_width, INFO_LINE_HEIGHT), illustrator, resolution)
+        self._draw_info_line(painter, option, QRect(text_left, title_rect.bottom() + 1 + INFO_LINE_HEIGHT, text_width, INFO_LINE_HEIGHT), pid, file_info)
+        painter.restore()
+
+    def _draw_info_line(self, painter: QPainter, option: QStyleOptionViewItem, rect: QRect, left_text: str, right_text: str) -> None:
+        """Draw a left and a right aligned text on one line, the left text is elided if they overlap"""
+        right_width = option.fontMetrics.horizontalAdvance(right_text)
+        painter.drawText(rect, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter, right_text)
+        painter.drawText(
+            rect, 
+            Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter, 
+            option.fontMetrics.elidedText(left_text, Qt.TextElideMode.ElideRight, max(0, rect.width() - right_width - CARD_MARGIN))
+        )
+
+class PictureGridView(QListView):
+    """
+    Grid of picture cards.
+
+    Cards are painted by PictureDelegate instead of being widgets, so only the visible rows are painted
+    and a resize only lays out fixed size grid cells again.
+    """
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setMovement(QListView.Movement.Static)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setUniformItemSizes(True)
+        self.setGridSize(CARD_SIZE)
+        self.setDragEnabled(False)
+        self.setSelectionMode(QAbstractItemView.SelectionMode.NoSelection)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollMode.ScrollPerPixel)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.verticalScrollBar().setSingleStep(CARD_SIZE.height() // 4)
+        self.setMouseTracking(True)
+        self.setItemDelegate(PictureDelegate(self))
+
+    def get_visible_rows(self) -> range:
+        """
+        Get the rows in the viewport, computed from the scroll position since all grid cells have the same size.
+        The range may run past the last row.
+        """
+        columns = max(1, self.viewport().width() // CARD_SIZE.width())
+        first_line = self.verticalScrollBar().value() // CARD_SIZE.height()
+        line_count = -(-self.viewport().height() // CARD_SIZE.height()) + 1 # a partly visible line at the top and bottom
+        return range(first_line * columns, (first_line + line_count) * columns)
@@ -1,16 +1,31 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any, Callable
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from functools import partial
+import sqlite3
 import os
 
-from PySide6.QtWidgets import QTreeWidgetItem, QAbstractItemView, QLayout, QFileDialog, QGridLayout
+from PySide6.QtWidgets import QTreeWidgetItem, QAbstractItemView, QFileDialog, QHeaderView
 from PySide6.QtCore import Qt, QTimer
-from PySide6.QtGui import QBrush, QPalette, QPixmap
-from PySide6.QtCore import QThread, Signal
+from PySide6.QtGui import QBrush, QPalette, QImage
+from PySide6.QtCore import QObject, QThread, Signal
 
 from service.tag_tree import TagTree, Tag
-from service.database import PicDatabase, PicFile, PicMetadata
-from tools.log import log_execution
+from service.database import PicDatabase, PicFile, FileQuery, ResultCursor
+from service.catalog import FileCatalog
+from service.thumbnail_cache import ThumbnailCache
+from utils.pid_set import PidSet, set_nbytes
+from utils.tag_bitmap import TagBitmapIndex
+from utils.cache import LRUCache
+from utils.image_reader import read_scaled_image
+from tools.log import Log, log_execution
+from tools.setting import (
+    INGEST_WORKERS, INGEST_VERIFY_HASH, TAG_INDEX_CACHE_MAX_ENTRIES, TAG_INDEX_CACHE_MAX_BYTES, 
+    PICTURE_LOADER_WORKERS, PICTURE_GRID_THUMBNAIL_ENTRIES, PICTURE_GRID_PAGE_SIZE, PICTURE_GRID_PREFETCH_SCREENS, 
+    THUMBNAIL_SIZE
+)
 from component.widget.tag_widget import TagWidget
-from component.widget.picture_frame import PictureFrame
+from component.model.picture_list_model import PictureListModel
 from component.dialog.data_collect_progress_message_box import DataCollectProcessMessageBox
 
 if TYPE_CHECKING:
@@ -21,8 +36,12 @@ class PictureManagerController:
         self.view = view
         self.view.setup_controller(self)
         self._init_ui()
-        self.tag_index_cache = {}
+        self.tag_index_cache = LRUCache(TAG_INDEX_CACHE_MAX_ENTRIES, TAG_INDEX_CACHE_MAX_BYTES, PidSet.nbytes)
         self.database = PicDatabase()
+        self.thumbnail_cache = ThumbnailCache()
+        self.picture_loader_pool = ThreadPoolExecutor(max_workers=PICTURE_LOADER_WORKERS)
+        self.search_executor = SearchExecutor(self.database)
+        self._init_picture_grid()
         self._init_context()
         self._init_tag_tree()
         self._init_tag_search()
@@ -32,20 +51,34 @@ class PictureManagerController:
         self.timer = QTimer(self.view)
         self.timer.setSingleShot(True)
         self.timer.timeout.connect(self.add_include_tag)
+        for tree_widget in (self.view.characterTagTree, self.view.attributeTagTree):
+            # the second column shows how many pictures of the current result are under a tag
+            tree_widget.setColumnCount(2)
+            tree_widget.header().setStretchLastSection(False)
+            tree_widget.header().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+            tree_widget.header().setSectionResizeMode(1, QHeaderView.ResizeMode.ResizeToContents)
+        
+    def _init_picture_grid(self):
+        self.thumbnail_loader = ThumbnailLoader(self.thumbnail_cache, self.picture_loader_pool)
+        self.picture_list_model = PictureListModel(PICTURE_GRID_THUMBNAIL_ENTRIES, PICTURE_GRID_PAGE_SIZE, self.view)
+        self.picture_list_model.thumbnail_requested.connect(self.thumbnail_loader.request)
+        self.thumbnail_loader.loaded.connect(self.picture_list_model.set_thumbnail)
+        self.view.picBrowseListView.setModel(self.picture_list_model)
+        self.prefetch_timer = QTimer(self.view)
+        self.prefetch_timer.setSingleShot(True)
+        self.prefetch_timer.timeout.connect(self.prefetch_thumbnails)
         
     def _init_context(self):
-        self.displayed_widget = []
-        self.refresh_browse_area_width()
-        self.display_index = 0
-        self.display_row = 0
-        self.display_column = 0
         self.show_restricted = False
         self.include_tag_set = set()
         self.exclude_tag_set = set()
-        self.tag_filtered_pids: set[int] = []
-        self.pic_metadata_dict: dict[int, PicMetadata] = {}
-        self.pic_file_list: list[PicFile] = []
-        self.display_pic_list: list[PicFile | PicMetadata] = []
+        self.tag_filtered_pids: frozenset[int] = frozenset()
+        self.untagged_result = True
+        self.tag_bitmap_index: TagBitmapIndex = None
+        self.restricted_pids: tuple[int, frozenset[int]] = None # the database generation and the restricted pids read at it
+        self.search_file_catalog: FileCatalog = None # used by the search executor thread only
+        self.file_catalog = FileCatalog(())
+        self.tag_counts: dict[str, int] = {}
         self.last_file_type_filter = {
             'jpg': True,
             'png': True,
@@ -59,13 +92,13 @@ class PictureManagerController:
         self.slider_edited = False
         self.spin_box_edited = False
         self.current_sort = 'id'
-        self.loading_pics = False
-        self.load_pic_thread = None
         
     def _init_tag_tree(self):
+        # a running search keeps the TagTreeSnapshot it was submitted with, the tree and cache are replaced, not changed
         self.tag_tree = TagTree()
+        self.descendant_pids_cache = LRUCache(TAG_INDEX_CACHE_MAX_ENTRIES, TAG_INDEX_CACHE_MAX_BYTES, set_nbytes)
         self.tag_item_dict: dict[str, set[QTreeWidgetItem]] = {}
-        self.highlighted_tags: set[str] = set()
+        self.highlighted_tags: dict[str, int] = {}
         self.default_background_color = self.view.characterTagTree.palette().color(QPalette.ColorRole.Base)
         for top_tag in self.tag_tree.root.sub_tags.values():
             if top_tag.tag_type == '__CHARACTER__':
@@ -174,109 +207,216 @@ class PictureManagerController:
         tree_widget.scrollToItem(tag_item, QAbstractItemView.ScrollHint.PositionAtCenter)
 
     def display_pic_without_tags(self):
-        self.display_pic_list = []
-        pids = self.database.get_pids_without_tags()
-        for pid in pids:
-            self.display_pic_list.extend(self.database.get_file_list([pid]))
+        self.search_executor.submit(self._search_pics_without_tags, self._show_pics_without_tags)
 
-        self._clear_highlighted_tags()
-        self._refresh_pic_display()
+    def _search_pics_without_tags(self, cursor: sqlite3.Cursor, check_cancelled: Callable[[], None]) -> 'SearchResult':
+        # the pictures are selected by the result cursor, going through the executor still supersedes a running tag search
+        return SearchResult(untagged=True, file_catalog=self._get_file_catalog(cursor))
+    
+    def _show_pics_without_tags(self, result: 'SearchResult') -> None:
+        self._set_search_result(result)
+        self._highlight_available_tags()
+        self._show_result(FileQuery(include_restricted=self.show_restricted, untagged_only=True))
         
     def _pic_tag_search(self) -> None:
         """
         Search for pictures with tags.
         the search will return a set of picture ids that have all the tags in includeTags and none of the tags in excludeTags.
-        """
-        def find_pids(tag: str) -> set:
-            related_tags = {tag} | self.tag_tree.get_sub_tags(tag)
-            pids = set()
-            for related_tag in related_tags:
-                if related_tag in self.tag_index_cache:
-                    pids.update(self.tag_index_cache[related_tag])
-                else:
-                    tag_pids = self.database.get_pids_by_tag(related_tag)
-                    self.tag_index_cache[related_tag] = tag_pids
-                    pids.update(tag_pids)
 
-            return pids
-        
+        The search runs on the search executor and supersedes any search still running, 
+        the result is shown by _show_tag_search_result.
+        """
         if not self.include_tag_set and not self.exclude_tag_set:
             self.display_pic_without_tags()
             return
         
+        search = partial(
+            self._search_pics_by_tags, 
+            set(self.include_tag_set), 
+            set(self.exclude_tag_set), 
+            self.show_restricted, 
+            TagTreeSnapshot(self.tag_tree, self.descendant_pids_cache)
+        )
+        self.search_executor.submit(search, self._show_tag_search_result)
+
+    def _search_pics_by_tags(
+            self, 
+            include_tags: set[str], 
+            exclude_tags: set[str], 
+            include_restricted: bool,
+            tree: 'TagTreeSnapshot',
+            cursor: sqlite3.Cursor, 
+            check_cancelled: Callable[[], None]
+        ) -> 'SearchResult':
+        """
+        Resolve a tag search and fetch its pictures, runs on the search executor thread.
+        Without include_restricted the restricted pictures are dropped like the grid drops them, so the facet counts match the grid.
+        The tag tree is only read through tree, the GUI thread may replace self.tag_tree while the search runs.
+        """
         included_pids = None
-        for tag in self.include_tag_set:
+        for tag in include_tags:
             if included_pids is None:
-                included_pids = find_pids(tag)
+                included_pids = self._get_descendant_pids(tag, tree, cursor)
             else:
-                included_pids &= find_pids(tag)
+                included_pids &= self._get_descendant_pids(tag, tree, cursor)
+            check_cancelled()
 
-        excluded_pids = set()
-        for tag in self.exclude_tag_set:
-            excluded_pids.update(find_pids(tag))
+        excluded_pids = frozenset().union(*(self._get_descendant_pids(tag, tree, cursor) for tag in exclude_tags))
+        tag_filtered_pids = included_pids - excluded_pids if included_pids else frozenset()
+        if not include_restricted:
+            tag_filtered_pids -= self._get_restricted_pids(cursor)
+        check_cancelled()
+        tag_counts = self._count_tag_facets(tag_filtered_pids, tree, cursor, check_cancelled)
         
-        self.tag_filtered_pids = included_pids - excluded_pids if included_pids else set()
-        self.pic_metadata_dict = self.database.get_metadata_dict(self.tag_filtered_pids)
-        self.pic_file_list = self.database.get_file_list(self.tag_filtered_pids)
-        self.display_pic_list = [i for i in self.pic_metadata_dict.values()]
-        self._clear_highlighted_tags()
+        return SearchResult(tag_filtered_pids, tag_counts, file_catalog=self._get_file_catalog(cursor))
+    
+    def _show_tag_search_result(self, result: 'SearchResult') -> None:
+        Log.debug(f"Tag index cache {self.tag_index_cache.stats()}, descendant pids cache {self.descendant_pids_cache.stats()}")
+        self._set_search_result(result)
         self._highlight_available_tags()
-        self._refresh_pic_display()
-        
-    def _highlight_available_tags(self) -> None:
-        def highlight_item(tag: str) -> None:
-            if tag in self.tag_item_dict:
-                self.highlighted_tags.add(tag)
-                for item in self.tag_item_dict[tag]:
-                    font = item.font(0)
-                    font.setBold(True)
-                    item.setFont(0, font)
-                    item.setBackground(0, QBrush('#808080'))
-                    parent_item = item.parent()
-                    if parent_item:
-                        parent_tag = parent_item.text(0)
-                        if parent_tag not in self.highlighted_tags:
-                            highlight_item(parent_tag)
-                        
-        available_tags = set()
-        for data in self.pic_metadata_dict.values():
-            available_tags.update(data.tags)
-        
-        for available_tag in available_tags:
-            if available_tag in self.tag_item_dict:
-                highlight_item(available_tag)
-                
-    def _clear_highlighted_tags(self) -> None:
-        for tag in self.tag_item_dict:
-            for item in self.tag_item_dict[tag]:
-                font = item.font(0)
-                font.setBold(False)
-                item.setFont(0, font)
-                item.setBackground(0, QBrush(self.default_background_color))
-                
-        self.highlighted_tags.clear()            
+        self._show_result(FileQuery(include_restricted=self.show_restricted), by_pid=True)
+        
+    def _set_search_result(self, result: 'SearchResult') -> None:
+        self.tag_filtered_pids = result.pids
+        self.untagged_result = result.untagged
+        self.tag_counts = result.tag_counts
+        self.file_catalog = result.file_catalog
+
+    def _count_tag_facets(
+            self, 
+            pids: frozenset[int], 
+            tree: 'TagTreeSnapshot', 
+            cursor: sqlite3.Cursor, 
+            check_cancelled: Callable[[], None]
+        ) -> dict[str, int]:
+        """
+        Count the pictures of a result under every tag of the tag tree, tags without pictures of the result are left out.
 
-    def _is_match_file_type(self, pic_file: PicFile) -> bool:
-        return self.last_file_type_filter.get(pic_file.file_type, False)
-    
-    def _is_match_resolution(self, pic_file: PicFile) -> bool:
-        min_width, max_width = self.last_resolution_filter['width']
-        min_height, max_height = self.last_resolution_filter['height']
+        The count of a tag is the size of the intersection of the result and the memoized pids of the tag and its sub tags,
+        built by frozenset in time linear in the smaller of the two.
+        Only tags indexed for the result and the nodes above them can have pictures, so the other tags of the tree
+        are never counted. The indexed tags are found by or-ing the tag bitmaps of every pid of the result.
+        """
+        available_tags = self._get_tag_bitmap_index(cursor).get_tags(pids)
+        candidate_tags = set(available_tags)
+        for tag in available_tags:
+            candidate_tags.update(tree.tag_tree.get_ancestors(tag))
+        # the root and the tag type nodes are not shown in the tree
+        candidate_tags.discard(tree.tag_tree.root.name)
+        candidate_tags.difference_update(tree.tag_tree.root.sub_tags)
+        
+        tag_counts = {}
+        for tag in candidate_tags:
+            if not tree.tag_tree.is_in_tree(tag):
+                continue # indexed tags that were deleted from the tree since the last import
+            count = len(pids & self._get_descendant_pids(tag, tree, cursor))
+            if count:
+                tag_counts[tag] = count
+        check_cancelled()
+        
+        return tag_counts
     
-        if min_width != -1 and pic_file.width < min_width:
-            return False
+    def _get_descendant_pids(self, tag: str, tree: 'TagTreeSnapshot', cursor: sqlite3.Cursor = None) -> frozenset[int]:
+        """
+        Get the pids of a tag and all of its sub tags.
+
+        The result of every tree node is memoized and built from the results of its sub tags,
+        so a query for a broad parent tag is a single cached lookup after the first time.
+        Results are keyed by the tag tree version and the database generation, so they go stale 
+        as soon as the tree is edited or new pictures are imported.
+        """
+        key = (tag, tree.tag_tree.version, self.database.generation)
+        pids = tree.descendant_pids_cache.get(key)
+        if pids is not None:
+            return pids
         
-        if max_width != -1 and pic_file.width > max_width:
-            return False
+        generation = self.database.generation
+        uncached_tags = [
+            related_tag for related_tag in {tag} | tree.tag_tree.get_sub_tags(tag) 
+            if self.tag_index_cache.get((related_tag, generation)) is None # counts the misses in the cache stats
+        ]
+        if uncached_tags:
+            for related_tag, tag_pids in self.database.get_pids_by_tags(uncached_tags, cursor).items():
+                self.tag_index_cache.put((related_tag, generation), tag_pids)
+        
+        # the postings are cached as compact PidSets, searches combine the memoized results as frozensets, which is faster
+        pids = frozenset(self._get_tag_pids(tag, cursor)).union(
+            *(self._get_descendant_pids(sub_tag, tree, cursor) for sub_tag in tree.tag_tree.get_tag(tag).sub_tags)
+        )
+        tree.descendant_pids_cache.put(key, pids)
+        return pids
+    
+    def _get_tag_bitmap_index(self, cursor: sqlite3.Cursor = None) -> TagBitmapIndex:
+        """
+        Get the per-pid tag bitmaps of the tag index, they are rebuilt once the database generation changes.
+        """
+        generation = self.database.generation
+        if self.tag_bitmap_index is None or self.tag_bitmap_index.generation != generation:
+            self.tag_bitmap_index = TagBitmapIndex(
+                self.database.get_tag_posting_counts(cursor), 
+                self.database.iter_tag_postings(cursor), 
+                generation
+            )
+        
+        return self.tag_bitmap_index
+    
+    def _get_file_catalog(self, cursor: sqlite3.Cursor = None) -> FileCatalog:
+        """
+        Get the columnar catalog of imageData, it is reloaded once the database generation changes.
+        """
+        generation = self.database.generation
+        if self.search_file_catalog is None or self.search_file_catalog.generation != generation:
+            self.search_file_catalog = FileCatalog(self.database.iter_file_rows(cursor), generation)
         
-        if min_height != -1 and pic_file.height < min_height:
-            return False
+        return self.search_file_catalog
+
+    def _get_restricted_pids(self, cursor: sqlite3.Cursor = None) -> frozenset[int]:
+        """
+        Get the pids of restricted pictures, they are read again once the database generation changes.
+        """
+        generation = self.database.generation
+        if self.restricted_pids is None or self.restricted_pids[0] != generation:
+            self.restricted_pids = (generation, self.database.get_restricted_pids(cursor))
         
-        if max_height != -1 and pic_file.height > max_height:
-            return False
+        return self.restricted_pids[1]
     
-        return True
+    def _get_tag_pids(self, tag: str, cursor: sqlite3.Cursor = None) -> PidSet:
+        """
+        Get the pids indexed under a tag itself.
+        """
+        key = (tag, self.database.generation)
+        pids = self.tag_index_cache.get(key)
+        if pids is None:
+            pids = self.database.get_pids_by_tag(tag, cursor)
+            self.tag_index_cache.put(key, pids)
+            
+        return pids
+        
+    def _highlight_available_tags(self) -> None:
+        """
+        Highlight the tags with pictures in the current result and show their counts in the tag trees.
+        Only the items whose highlight or count changed since the last search are touched.
+        """
+        highlighted_tags = {tag: count for tag, count in self.tag_counts.items() if tag in self.tag_item_dict}
+        for tag in self.highlighted_tags.keys() - highlighted_tags.keys():
+            self._set_tag_highlighted(tag, None)
+        for tag, count in highlighted_tags.items():
+            if self.highlighted_tags.get(tag) != count:
+                self._set_tag_highlighted(tag, count)
+        self.highlighted_tags = highlighted_tags
     
+    def _set_tag_highlighted(self, tag: str, count: int | None) -> None:
+        """Highlight a tag with its picture count, or remove the highlight if count is None"""
+        background = QBrush('#808080') if count is not None else QBrush(self.default_background_color)
+        for item in self.tag_item_dict[tag]:
+            font = item.font(0)
+            font.setBold(count is not None)
+            item.setFont(0, font)
+            item.setBackground(0, background)
+            item.setBackground(1, background)
+            item.setText(1, str(count) if count is not None else "")
+            item.setTextAlignment(1, Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+
     def _parse_resolution_range(self, resolution_range: str) -> tuple[int, int]:
         try:
             if resolution_range.startswith('>'):
@@ -302,30 +442,20 @@ class PictureManagerController:
             'width': self._parse_resolution_range(self.view.resolutionWidthEdit.text()),
             'height': self._parse_resolution_range(self.view.resolutionHeightEdit.text())
         }
-        
-        if self.last_file_type_filter == file_type_filter:
-            filt_file_type = False
-        else:
-            filt_file_type = True
-            self.last_file_type_filter = file_type_filter
-
-        if self.last_resolution_filter == resolution_filter:
-            filt_resolution = False
-        else:
-            filt_resolution = True
-            self.last_resolution_filter = resolution_filter
-        
-        self.display_pic_list = []
-        for pic_file in self.pic_file_list:
-            if filt_file_type and not self._is_match_file_type(pic_file):
-                continue
-
-            if filt_resolution and not self._is_match_resolution(pic_file):
-                continue
-            
-            self.display_pic_list.append(pic_file)
-        
-        self._sort_display_pic()
+        self.last_file_type_filter = file_type_filter
+        self.last_resolution_filter = resolution_filter
+        self._show_result(self._get_file_query())
+
+    def _get_file_query(self) -> FileQuery:
+        """Translate the current file type, resolution and ratio settings into a FileQuery"""
+        return FileQuery(
+            frozenset(file_type for file_type, checked in self.last_file_type_filter.items() if not checked), 
+            self.last_resolution_filter['width'], 
+            self.last_resolution_filter['height'], 
+            self.sort_ratio if self.view.enableRatioCheckBox.isChecked() else None, 
+            self.show_restricted, 
+            self.untagged_result
+        )
 
     def clear_resolution_filter(self) -> None:
         self.view.resolutionWidthEdit.clear()
@@ -369,14 +499,6 @@ class PictureManagerController:
         self.sort_ratio = ratio
         self.filt_and_sort_pic_files()
 
-    def _sort_display_pic(self) -> None:
-        if self.view.enableRatioCheckBox.isChecked():
-            self.display_pic_list.sort(key=lambda pic_file: abs(pic_file.ratio - self.sort_ratio))
-        elif self.current_sort == 'id':
-            self.display_pic_list.sort(key=lambda pic_file: pic_file.pid)
-        
-        self._refresh_pic_display()
-            
     def _convert_to_slider_value(self, ratio: float) -> int:
         if ratio <= 0:
             return 40
@@ -388,113 +510,31 @@ class PictureManagerController:
         else:
             return int((1 - ratio) * 20)
 
-    def _is_restricted(self, data: PicMetadata | PicFile) -> bool:
-        if isinstance(data, PicMetadata):
-            if data.x_restrict != 'allAges':
-                return True
-        elif isinstance(data, PicFile):
-            metadata = self.pic_metadata_dict.get(data.pid)
-            if metadata and metadata.x_restrict != 'allAges':
-                return True
-
-        return False
-    
-    def refresh_browse_area_width(self) -> None:
-        current_width = self.view.picBrowseScrollArea.width()
-        self.max_widgets_per_row = current_width // 250 if current_width >= 250 else 1
-        for i, widget in enumerate(self.displayed_widget):
-            row = i // self.max_widgets_per_row
-            column = i % self.max_widgets_per_row
-            self.view.picDisplayLayout.addWidget(widget, row, column)
-    
-    def _refresh_pic_display(self) -> None:
-        self.displayed_widget.clear()
-        self.refresh_browse_area_width()
-        self._clear_all_widgets(self.view.picDisplayLayout)
-        self.view.picBrowseScrollArea.verticalScrollBar().setValue(0)
-        self.display_row = 0
-        self.display_column = 0
-        self.load_more_pics(0)
-            
-    def _clear_all_widgets(self, layout: 'QLayout') -> None:
-        while layout.count():
-            child = layout.takeAt(0)
-            if child.widget():
-                child.widget().deleteLater()
-            elif child.layout():
-                self._clear_all_widgets(child.layout())
-        
-        layout.update()
-
-    def display_loaded_pics(self, images: list[QPixmap]) -> None:
-        pic_frames = []
-        if self.displaying_metadata:
-            for i in range(len(images)):
-                pic_frame = PictureFrame(self.view.picBrowseContentWidget, images[i], self.pic_files_for_each_metadata[i], pic_data=self.display_pic_list[i])
-                pic_frames.append(pic_frame)
-        else:
-            for i in range(len(images)):
-                pic_frame = PictureFrame(self.view.picBrowseContentWidget, images[i], [self.display_pic_list[i]])
-                pic_frames.append(pic_frame)
-        
-        for pic_frame in pic_frames:
-            self.displayed_widget.append(pic_frame)
-            self.view.picDisplayLayout.addWidget(pic_frame, self.display_row, self.display_column)
-            self.display_column += 1
-            if self.display_column == self.max_widgets_per_row:
-                self.display_column = 0
-                self.display_row += 1
-
-        self.load_pic_thread = None
-        self.loading_pics = False
-        
-    def load_more_pics(self, current_index: int = None) -> None:
-        self.loading_pics = True
-        
-        if current_index is None:
-            current_index = self.display_index
-        else:
-            self.display_index = current_index
-            
-        if current_index >= len(self.display_pic_list):
-            self.loading_pics = False
-            return
-        
-        load_amount = self.max_widgets_per_row * 3
+    def _show_result(self, query: FileQuery, by_pid: bool = False) -> None:
+        """
+        Show the pictures of the current search result matching a query in the grid, see ResultCursor.
+        """
+        pids = None if self.untagged_result else self.tag_filtered_pids
+        self.thumbnail_loader.cancel() # thumbnails of the last result that are still queued will not be shown
+        self.picture_list_model.set_cursor(ResultCursor(self.database, self.file_catalog, query, pids, by_pid))
+        self.view.picBrowseListView.scrollToTop()
+        self.schedule_thumbnail_prefetch()
 
-        to_be_displayed_pics: list[PicFile | PicMetadata] = []
-        
-        while current_index < len(self.display_pic_list) and load_amount > 0:
-            if self._is_restricted(self.display_pic_list[current_index]) and not self.show_restricted:
-                current_index += 1
-                continue
-            
-            to_be_displayed_pics.append(self.display_pic_list[current_index])
-            current_index += 1
-            load_amount -= 1
-        
-        self.display_index = current_index
-        
-        if isinstance(to_be_displayed_pics[0], PicMetadata):
-            self.displaying_metadata = True
-            self.pic_files_for_each_metadata = []
-            for pic_metadata in to_be_displayed_pics:
-                self.pic_files_for_each_metadata.append(self.database.get_file_list([pic_metadata.pid]))
-
-            display_pic_files = []
-            for pic_files in self.pic_files_for_each_metadata:
-                for pic_file in pic_files:
-                    if pic_file.num == 0:
-                        display_pic_files.append(pic_file)
-        else:
-            self.displaying_metadata = False
-            display_pic_files = to_be_displayed_pics
-            
+    def schedule_thumbnail_prefetch(self) -> None:
+        # coalesce the scroll events of one scroll gesture into one prefetch
+        self.prefetch_timer.start(50)
 
-        self.load_pic_thread = PictureLoaderThread(display_pic_files)
-        self.load_pic_thread.return_result.connect(self.display_loaded_pics)
-        self.load_pic_thread.start()
-        
+    def prefetch_thumbnails(self) -> None:
+        """
+        Load the thumbnails of the visible rows and of PICTURE_GRID_PREFETCH_SCREENS screens below them.
+        Queued loads of rows that left this window are cancelled, so fast scrolling does not pile up work.
+        """
+        visible_rows = self.view.picBrowseListView.get_visible_rows()
+        prefetch_rows = range(
+            visible_rows.start, 
+            visible_rows.stop + len(visible_rows) * PICTURE_GRID_PREFETCH_SCREENS
+        )
+        self.thumbnail_loader.schedule(self.picture_list_model.get_uncached_files(prefetch_rows))
             
     @log_execution("Info", "Adding new pictures from directory {args[1]}", "new pictures added")
     def add_new_pics(self, directory: str) -> None:
@@ -506,12 +546,14 @@ class PictureManagerController:
         def close_message_box():
             message_box.done(0)
 
-        thread = DataCollectThread(self.database, self.tag_tree, directory)
+        thread = DataCollectThread(self.database, self.tag_tree, directory, self.thumbnail_cache)
         thread.status_update.connect(update_status)
         thread.finished.connect(close_message_box)
         thread.start()
 
         message_box.exec_()
+        self.picture_list_model.clear_thumbnails() # re-imported pictures keep their pid and num but may have changed
+        self._pic_tag_search() # cached results are keyed by the database generation and went stale with the import
         
     def select_directory_for_new_pics(self) -> None:
         dialog = QFileDialog()
@@ -538,33 +580,164 @@ class DataCollectThread(QThread):
     status_update = Signal(str)
     finished = Signal()
 
-    def __init__(self, database: PicDatabase, tag_tree: TagTree, directory):
+    def __init__(self, database: PicDatabase, tag_tree: TagTree, directory, thumbnail_cache: ThumbnailCache):
         super().__init__()
         self.database = database
         self.tag_tree = tag_tree
         self.directory = directory
+        self.thumbnail_cache = thumbnail_cache
 
     def run(self):
         self.connection = self.database.get_new_connection()
-        new_pics_id = self.database.collect_data(self.directory, thread=self, connection=self.connection)
+        new_pics_id = self.database.collect_data(
+            self.directory, 
+            thread=self, 
+            connection=self.connection, 
+            workers=INGEST_WORKERS, 
+            verify_hash=INGEST_VERIFY_HASH
+        )
         self.status_update.emit("补全标签...")
         self.database.complete_tag(self.tag_tree, new_pics_id, self.connection)
         self.status_update.emit("建立标签索引...")
         self.database.init_tag_index(self.tag_tree, new_pics_id, self.connection)
+        self.status_update.emit("生成缩略图...")
+        pic_files = self.database.get_file_list(new_pics_id, self.connection.cursor())
+        self.thumbnail_cache.generate(pic_files, workers=INGEST_WORKERS)
         self.finished.emit()
 
-class PictureLoaderThread(QThread):
-    return_result = Signal(list)
-    finished = Signal()
-
-    def __init__(self, to_be_loaded_pics: list[PicFile]):
+@dataclass
+class SearchResult:
+    """A picture search result, built on the search executor thread, its pictures are read by a ResultCursor"""
+    pids: frozenset[int] = frozenset()
+    tag_counts: dict[str, int] = field(default_factory=dict)
+    untagged: bool = False # the result is every picture without tags, pids is not filled
+    file_catalog: FileCatalog = None # the files of the database when the search ran
+
+@dataclass(frozen=True)
+class TagTreeSnapshot:
+    """
+    The tag tree and the memoized descendant pids of its tags a search was submitted with.
+    Searches read the tree only through the snapshot, so replacing the tree on the GUI thread cannot mix two trees in one search.
+    """
+    tag_tree: TagTree
+    descendant_pids_cache: LRUCache
+
+class SearchCancelled(Exception):
+    """Raised inside a search that was superseded by a newer one"""
+
+class SearchExecutor(QObject):
+    """
+    Run picture searches off the GUI thread.
+
+    Searches run one at a time on a single worker thread with its own database connection.
+    Every submitted search gets a generation number, submitting a new search makes all older ones stale:
+    a stale search that has not started is skipped, a running one stops at its next check_cancelled call,
+    and a result that still arrives late is dropped, so only the result of the latest search is delivered.
+    """
+    _finished = Signal(int, object)
+
+    def __init__(self, database: PicDatabase):
         super().__init__()
-        self.to_be_loaded_pics = to_be_loaded_pics
+        self.database = database
+        self.pool = ThreadPoolExecutor(max_workers=1)
+        self.connection: sqlite3.Connection = None
+        self.generation = 0
+        self.callbacks: dict[int, Callable[[Any], None]] = {}
+        self._finished.connect(self._on_finished)
+
+    def submit(
+            self, 
+            search: Callable[[sqlite3.Cursor, Callable[[], None]], Any], 
+            callback: Callable[[Any], None]
+        ) -> int:
+        """
+        Submit a search, callback is called with its result in the GUI thread unless a newer search is submitted first.
 
-    def run(self):
-        result = []
-        for pic_file in self.to_be_loaded_pics:
-            result.append(QPixmap(os.path.join(pic_file.directory, pic_file.file_name)))
+        Parameters:
+        search (Callable): Called with a cursor of the worker connection and a function raising SearchCancelled once the search is stale.
+        callback (Callable): Called with the result of search.
+
+        Returns:
+        int: The generation of the search.
+        """
+        self.generation += 1
+        self.callbacks = {self.generation: callback}
+        self.pool.submit(self._run, search, self.generation)
+        return self.generation
+
+    def _run(self, search: Callable[[sqlite3.Cursor, Callable[[], None]], Any], generation: int) -> None:
+        def check_cancelled() -> None:
+            if generation != self.generation:
+                raise SearchCancelled()
+        
+        try:
+            check_cancelled()
+            if self.connection is None: # sqlite connections can only be used by the thread that created them
+                self.connection = self.database.get_new_connection()
+            # caches are keyed by the database generation, pick up imports and reindexes of other processes
+            self.database.read_generation(self.connection.cursor())
+            result = search(self.connection.cursor(), check_cancelled)
+            check_cancelled()
+        except SearchCancelled:
+            return
+        except Exception as e:
+            Log.error(f"Search failed: {e}")
+            return
         
-        self.return_result.emit(result)
-        self.finished.emit()
\ No newline at end of file
+        self._finished.emit(generation, result)
+
+    def _on_finished(self, generation: int, result: Any) -> None:
+        callback = self.callbacks.pop(generation, None)
+        if callback is not None and generation == self.generation:
+            callback(result)
+
+class ThumbnailLoader(QObject):
+    """
+    Load thumbnails of the picture grid in a thread pool.
+
+    Images are decoded at thumbnail size in the pool and handed back with the loaded signal,
+    which is queued to the GUI thread, so the GUI thread only converts them to pixmaps.
+    Every queued load is tracked until it finishes, so duplicate requests are ignored and loads
+    that are no longer needed can be cancelled before a worker picks them up.
+    """
+    loaded = Signal(object, QImage)
+    _finished = Signal(object, QImage)
+
+    def __init__(self, thumbnail_cache: ThumbnailCache, pool: ThreadPoolExecutor):
+        super().__init__()
+        self.thumbnail_cache = thumbnail_cache
+        self.pool = pool
+        self.pending: dict[tuple[int, int], Future] = {}
+        self._finished.connect(self._on_finished)
+
+    def request(self, pic_file: PicFile) -> None:
+        key = (pic_file.pid, pic_file.num)
+        if key not in self.pending:
+            self.pending[key] = self.pool.submit(self._load, pic_file)
+
+    def schedule(self, pic_files: list[PicFile]) -> None:
+        """
+        Make pic_files, in order, the only queued loads.
+        """
+        keys = {(pic_file.pid, pic_file.num) for pic_file in pic_files}
+        self.cancel(keep=keys)
+        for pic_file in pic_files:
+            self.request(pic_file)
+
+    def cancel(self, keep: set[tuple[int, int]] = None) -> None:
+        """
+        Cancel the queued loads that are not in keep, loads a worker already started still finish.
+        """
+        for key, future in list(self.pending.items()):
+            if (keep is None or key not in keep) and future.cancel():
+                del self.pending[key]
+
+    def _on_finished(self, key: tuple[int, int], image: QImage) -> None:
+        self.pending.pop(key, None)
+        self.loaded.emit(key, image)
+
+    def _load(self, pic_file: PicFile) -> None:
+        thumbnail_path = self.thumbnail_cache.get(pic_file)
+        if thumbnail_path is None: # fall back to the picture itself if no thumbnail could be created
+            thumbnail_path = os.path.join(pic_file.directory, pic_file.file_name)
+        self._finished.emit((pic_file.pid, pic_file.num), read_scaled_image(thumbnail_path, THUMBNAIL_SIZE))
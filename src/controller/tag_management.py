@@ -1,7 +1,7 @@
 from typing import TYPE_CHECKING
 
 from PySide6.QtWidgets import QTreeWidget, QTreeWidgetItem, QAbstractItemView, QLineEdit, QListWidgetItem, QDialog
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QThread, Signal
 from PySide6.QtGui import QDropEvent, QBrush
 
 from service.tag_tree import TagTree, Tag
@@ -9,7 +9,7 @@ from service.database import PicDatabase
 from utils.json import load_json, write_json
 from component.dialog.tag_delete_dialog import DeleteDialog
 from component.dialog.tag_edit_dialog import TagEditDialog
-from tools.log import log_execution
+from tools.log import Log, log_execution
 
 if TYPE_CHECKING:
     from view.tag_management import MainWindow
@@ -34,6 +34,9 @@ class TagManagementController:
 
         self.undo_stack = []
         self.redo_stack = [] #TODO: implement redo
+        
+        self.reindex_thread: ReindexThread = None
+        self.pending_reindex_tags: set[str] = set()
     
     def search_tree(
             self,
@@ -106,8 +109,34 @@ class TagManagementController:
     def save_tree(self):
         self.tag_tree.save_tree()
         self.view.outputTextEdit.append("标签树已保存")
+        self.pending_reindex_tags.update(self.tag_tree.get_changed_tags())
+        self.tag_tree.clear_changes()
+        self._start_reindex()
         return
 
+    def _start_reindex(self):
+        """
+        Reindex the pictures affected by the saved tree edits in the background,
+        edits saved while a reindex is running are reindexed once it finished.
+        """
+        if not self.pending_reindex_tags or self.reindex_thread is not None:
+            return
+        
+        self.reindex_thread = ReindexThread(self.database, self.tag_tree.file_path, self.pending_reindex_tags)
+        self.pending_reindex_tags = set()
+        self.reindex_thread.reindexed.connect(self._finish_reindex)
+        self.reindex_thread.start()
+        self.view.outputTextEdit.append("正在更新标签索引...")
+
+    def _finish_reindex(self, pid_count: int):
+        self.reindex_thread.wait()
+        self.reindex_thread = None
+        if pid_count >= 0:
+            self.view.outputTextEdit.append(f"已更新 {pid_count} 张图片的标签索引")
+        else:
+            self.view.outputTextEdit.append("<b><span style='color: red;'>标签索引更新失败</span></b>")
+        self._start_reindex()
+
     def main_tree_drop_event(self, event: QDropEvent):
         """handle drop event and make changes to the tag tree"""
         target_item = self.view.mainTree.itemAt(event.pos())
@@ -215,7 +244,7 @@ class TagManagementController:
                 self.tag_tree.tag_dict[tag_name].tag_type = type_input
             
             edited = {i for i in synonyms_input if i.startswith("#")}
-            self.tag_tree.tag_dict[tag_name].synonyms = edited
+            self.tag_tree.set_synonyms(tag_name, edited)
 
     def undo(self):
         if not self.undo_stack:
@@ -232,7 +261,7 @@ class TagManagementController:
             )
         
         elif operation[0] == "add_synonym":
-            self.tag_tree.tag_dict[operation[2]].remove_synonym(operation[1])
+            self.tag_tree.remove_synonym(operation[2], operation[1])
             self.view.newTagOriginalList.findItems(operation[1], Qt.MatchFlag.MatchExactly)[0].setForeground(QBrush())
             self.view.outputTextEdit.append(
                 f"撤销添加同义标签 <b>{operation[1]}</b> 到 <b>{operation[2]}</b>"
@@ -310,7 +339,6 @@ class TagManagementController:
     @log_execution("Info", None, "New tag loaded")
     def _load_new_tag(self):
         """load new tag file and show it in the new tag lst"""
-        self.database.count_tags()
         self.new_tag_list = self.database.get_tag_count_list()
         existing_tags = self._get_existing_tags()
         new_tag_count = 0
@@ -368,7 +396,7 @@ class TagManagementController:
     
     def _add_synonym(self, sub_tag: str, parent_tag: str):
         """Add a synonym"""        
-        self.tag_tree.tag_dict[parent_tag].add_synonym(sub_tag)
+        self.tag_tree.add_synonym(parent_tag, sub_tag)
     
     def _delete_tag(self, sub_item: QTreeWidgetItem):
         """Delete a tag"""
@@ -449,4 +477,31 @@ class TagManagementController:
         self.undo_stack.append(operation)
         if len(self.undo_stack) > 10:
             self.undo_stack.pop(0)
-                
\ No newline at end of file
+                
+
+
+class ReindexThread(QThread):
+    """
+    Recomplete and reindex the pictures carrying the changed tags of saved tree edits, see PicDatabase.reindex_tags.
+    The saved tag tree is loaded again, so the tree being edited is not read from the thread.
+    """
+    reindexed = Signal(int) # number of reindexed pictures, -1 on failure
+
+    def __init__(self, database: PicDatabase, tag_tree_file: str, changed_tags: set[str]):
+        super().__init__()
+        self.database = database
+        self.tag_tree_file = tag_tree_file
+        self.changed_tags = changed_tags
+
+    def run(self):
+        connection = self.database.get_new_connection()
+        try:
+            pid_list = self.database.reindex_tags(TagTree(self.tag_tree_file), self.changed_tags, connection)
+        except Exception as e:
+            Log.error(f"Reindexing {len(self.changed_tags)} changed tags failed: {e}")
+            self.reindexed.emit(-1)
+        else:
+            Log.info(f"Reindexed {len(pid_list)} pictures for {len(self.changed_tags)} changed tags")
+            self.reindexed.emit(len(pid_list))
+        finally:
+            connection.close()
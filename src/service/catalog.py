@@ -0,0 +1,192 @@
+from typing import Callable, Container, Iterable, Iterator
+from bisect import bisect_left
+from heapq import merge
+from itertools import chain, starmap
+import sys
+
+from service.database import PicFile, FileQuery
+
+class FileCatalog:
+    """
+    Columnar in-memory copy of the imageData table.
+
+    Every column is a list indexed by row number and rows are ordered by pid and num, so the files of a pid are
+    a contiguous row range and the row order is the pid order. Filters and sorts work on row numbers and read
+    the columns instead of PicFile attributes, PicFile objects are only built for the rows that end up displayed.
+    The catalog is immutable, it is rebuilt when the database generation changes.
+
+    Columns are lists rather than arrays, reading an array element allocates a new int or float every time,
+    which makes row-wise access about three times slower.
+    """
+    def __init__(self, rows: Iterable[tuple], generation: int = 0):
+        """
+        Parameters:
+        rows (Iterable): imageData rows ordered by pid and num.
+        generation (int): The database generation the rows were read at.
+        """
+        self.generation = generation
+        self.pid: list[int] = []
+        self.num: list[int] = []
+        self.width: list[int] = []
+        self.height: list[int] = []
+        self.size: list[int] = []
+        self.ratio: list[float] = []
+        self.file_type: list[int] = []
+        self.file_types: list[str] = []
+        self.directory: list[str] = []
+        self.file_name: list[str] = []
+        self.pid_ranges: dict[int, tuple[int, int]] = {}
+        self.ratio_order: list[int] = None # the rows sorted by ratio and row, built by the first ratio walk
+        self.sorted_ratios: list[float] = None
+
+        file_type_codes: dict[str, int] = {}
+        directories: dict[str, str] = {} # share one string per directory
+        for row, (pid, num, directory, file_name, file_type, width, height, size, ratio) in enumerate(rows):
+            self.pid.append(pid)
+            self.num.append(num)
+            self.width.append(width)
+            self.height.append(height)
+            self.size.append(size)
+            self.ratio.append(ratio)
+            if file_type not in file_type_codes:
+                file_type_codes[file_type] = len(self.file_types)
+                self.file_types.append(file_type)
+            self.file_type.append(file_type_codes[file_type])
+            self.directory.append(directories.setdefault(directory, directory))
+            self.file_name.append(file_name)
+
+            start = self.pid_ranges.get(pid, (row, row))[0]
+            self.pid_ranges[pid] = (start, row + 1)
+        
+        self.file_type_codes = file_type_codes
+
+    def __len__(self) -> int:
+        return len(self.pid)
+
+    def get_rows(self, pids: Iterable[int]) -> list[int]:
+        """Get the rows of the files of pids, in pid and num order if pids are sorted"""
+        pid_ranges = self.pid_ranges
+        return list(chain.from_iterable(starmap(range, [pid_ranges[pid] for pid in pids if pid in pid_ranges])))
+
+    def get_pic_file(self, row: int) -> PicFile:
+        return PicFile(
+            self.pid[row], 
+            self.num[row], 
+            self.directory[row], 
+            self.file_name[row], 
+            self.file_types[self.file_type[row]], 
+            self.width[row], 
+            self.height[row], 
+            self.size[row], 
+            self.ratio[row]
+        )
+
+    def get_pic_files(self, rows: Iterable[int]) -> list[PicFile]:
+        return [self.get_pic_file(row) for row in rows]
+
+    def get_file_dict(self, pids: Iterable[int]) -> dict[int, list[PicFile]]:
+        """Get the files of pids grouped by pid, like PicDatabase.get_file_dict"""
+        pid_ranges = self.pid_ranges
+        return {
+            pid: [self.get_pic_file(row) for row in range(*pid_ranges[pid])] if pid in pid_ranges else [] 
+            for pid in pids
+        }
+
+    def _get_filter_limits(
+            self, 
+            excluded_file_types: Iterable[str], 
+            width_range: tuple[int, int], 
+            height_range: tuple[int, int]
+        ) -> tuple[set[int], int, int, int, int]:
+        """Translate the file type and resolution filters into excluded file type codes and inclusive width and height limits"""
+        excluded_codes = {self.file_type_codes[file_type] for file_type in excluded_file_types if file_type in self.file_type_codes}
+        min_width, max_width = (limit if limit != -1 else default for limit, default in zip(width_range, (0, sys.maxsize)))
+        min_height, max_height = (limit if limit != -1 else default for limit, default in zip(height_range, (0, sys.maxsize)))
+        return excluded_codes, min_width, max_width, min_height, max_height
+
+    def _get_row_filter(self, query: FileQuery, excluded_pids: Container[int] = None) -> Callable[[int], bool] | None:
+        """
+        Get a predicate telling whether a row matches the file filters of a query and is not a file of excluded_pids,
+        None if every row matches.
+        """
+        excluded_codes, min_width, max_width, min_height, max_height = self._get_filter_limits(
+            query.excluded_file_types, query.width_range, query.height_range
+        )
+        unlimited = (min_width, min_height, max_width, max_height) == (0, 0, sys.maxsize, sys.maxsize)
+        if not excluded_codes and not excluded_pids and unlimited:
+            return None
+        
+        file_type, width, height, pid = self.file_type, self.width, self.height, self.pid
+        if not excluded_pids:
+            excluded_pids = ()
+        return lambda row: (
+            file_type[row] not in excluded_codes 
+            and min_width <= width[row] <= max_width 
+            and min_height <= height[row] <= max_height
+            and pid[row] not in excluded_pids
+        )
+
+    def sort_rows_by_ratio(self, rows: list[int], ratio: float) -> list[int]:
+        """Sort rows by the distance of their aspect ratio to ratio, the sort is stable"""
+        column = self.ratio
+        return sorted(rows, key=lambda row: abs(column[row] - ratio))
+
+    def iter_rows_by_ratio(self, ratio: float) -> Iterator[int]:
+        """
+        Iterate every row by the distance of its aspect ratio to ratio, then by row.
+
+        The rows are sorted by ratio once per catalog, a walk starts at the target ratio and merges the rows above it
+        in ascending and the rows below it in descending ratio order, so only the rows that are consumed are visited.
+        """
+        if self.ratio_order is None:
+            column = self.ratio
+            self.ratio_order = sorted(range(len(self)), key=lambda row: (column[row], row))
+            self.sorted_ratios = [column[row] for row in self.ratio_order]
+        
+        order, ratios = self.ratio_order, self.sorted_ratios
+        middle = bisect_left(ratios, ratio)
+
+        def iter_down() -> Iterator[int]:
+            # rows with the same ratio keep their ascending row order
+            end = middle
+            while end > 0:
+                start = end - 1
+                while start > 0 and ratios[start - 1] == ratios[end - 1]:
+                    start -= 1
+                yield from order[start:end]
+                end = start
+        
+        column = self.ratio
+        yield from merge(
+            (order[i] for i in range(middle, len(order))), 
+            iter_down(), 
+            key=lambda row: (abs(column[row] - ratio), row)
+        )
+
+    def iter_query_rows(
+            self, 
+            query: FileQuery, 
+            pids: Iterable[int] = None, 
+            excluded_pids: Container[int] = None
+        ) -> Iterator[int]:
+        """
+        Iterate the rows matching a query in its sort order, the order of PicDatabase.get_filtered_file_list.
+
+        Rows are filtered as they are consumed, so the first page of a listing of all files only visits the rows before it,
+        a listing in ratio order walks the ratio order of the catalog. The files of a pid collection are filtered first
+        and the remaining rows sorted directly.
+
+        Parameters:
+        query (FileQuery): The file type and resolution filters and the sort order, the picture level filters are given by excluded_pids.
+        pids (Iterable, optional): Only list the files of these pids. Defaults to all files.
+        excluded_pids (Container, optional): Leave out the files of these pids. Defaults to None.
+        """
+        matches = self._get_row_filter(query, excluded_pids)
+        if pids is not None:
+            rows = self.get_rows(sorted(pids))
+            if matches is not None:
+                rows = list(filter(matches, rows))
+            return iter(rows if query.ratio is None else self.sort_rows_by_ratio(rows, query.ratio))
+        
+        rows = range(len(self)) if query.ratio is None else self.iter_rows_by_ratio(query.ratio)
+        return iter(rows) if matches is None else filter(matches, rows)
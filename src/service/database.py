@@ -1,17 +1,77 @@
 from dataclasses import dataclass, field
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, ClassVar, Iterable, Iterator
+from collections import Counter
+from heapq import merge
+from itertools import count, islice
 import json
 import sqlite3
 import os
 
-from utils.parser import parse_metadata, parse_picture, parse_csv
-from tools.log import log_execution
+from utils.parser import parse_metadata, parse_picture, parse_csv, parse_file_name, IMAGE_EXTENSIONS, PARSABLE_EXTENSIONS
+from service.ingest import IngestPipeline
+from service.manifest import FileManifest
+from service.tag_dictionary import TagDictionary
+from utils.pid_set import PidSet
+from utils.tag_completion import TagCompleter
+from tools.log import Log, log_execution
 if TYPE_CHECKING:
     from tag_tree import TagTree
+    from service.catalog import FileCatalog
     from controller.picture_manager import DataCollectThread
 
+DATABASE_VERSION = 6
+SQLITE_VARIABLE_LIMIT = 900 # stay below the default SQLITE_MAX_VARIABLE_NUMBER of old sqlite builds
+METADATA_GRID_FIELDS = ("pid", "title", "user") # the PicMetadata fields shown by the picture grid
+FETCH_CHUNK_SIZE = 10_000 # rows fetched at once by scans of the whole metadata table
+INSTR_SCAN_LIMIT = 8 # get_pids_with_tags matches up to this many tag ids with instr in sqlite, more in Python
+
+def _chunks(items: list, size: int = SQLITE_VARIABLE_LIMIT):
+    """
+    Split a list into chunks that fit into a single parameterized statement.
+    """
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
 class PicDatabase:
     _instance = None
+    _INSERT_IMAGE_DATA_SQL = "INSERT OR REPLACE INTO imageData VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    _UPSERT_METADATA_SQL = """
+        INSERT INTO metadata (
+            pid, 
+            title, 
+            tags, 
+            description, 
+            user, 
+            userId, 
+            date, 
+            xRestrict, 
+            bookmarkCount, 
+            likeCount, 
+            viewCount, 
+            commentCount
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(pid) DO UPDATE SET
+        title=excluded.title, 
+        tags=excluded.tags, 
+        description=excluded.description, 
+        user=excluded.user, 
+        userId=excluded.userId,
+        date=excluded.date, 
+        xRestrict=excluded.xRestrict, 
+        bookmarkCount=excluded.bookmarkCount, 
+        likeCount=excluded.likeCount,
+        viewCount=excluded.viewCount, 
+        commentCount=excluded.commentCount
+    """
+    _INSERT_TAG_TRANSLATION_SQL = """
+        INSERT INTO tags VALUES (?, ?, ?)
+        ON CONFLICT(originalTag) DO UPDATE SET translatedTag=excluded.translatedTag
+    """
+    _ADD_TAG_COUNT_SQL = """
+        INSERT INTO tags (originalTag, appearanceCount) VALUES (?, ?)
+        ON CONFLICT(originalTag) DO UPDATE SET appearanceCount=coalesce(appearanceCount, 0) + excluded.appearanceCount
+    """
 
     def __new__(cls, *args, **kwargs):
         if not cls._instance:
@@ -22,6 +82,8 @@ class PicDatabase:
         if not hasattr(self, 'initialized'):
             self.database = None
             self.cursor = None
+            self.generation = 0 # the database generation read last by read_generation, used to invalidate caches
+            self.tag_dictionary: TagDictionary = None
             self._load_database()
             self.initialized = True
 
@@ -37,10 +99,14 @@ class PicDatabase:
         if os.path.exists("pic_data.db"):
             self.database = sqlite3.connect("pic_data.db")
             self.cursor = self.database.cursor()
+            version = self.cursor.execute("PRAGMA user_version").fetchone()[0]
+            if version < DATABASE_VERSION:
+                self._migrate_database(version)
         else:
             self.database = sqlite3.connect("pic_data.db")
             self.cursor = self.database.cursor()
             self._initialize_database()
+        self.tag_dictionary = TagDictionary(self.cursor, self.get_new_connection)
     
     def get_new_connection(self):
         return sqlite3.connect("pic_data.db")
@@ -65,8 +131,8 @@ class PicDatabase:
             '''CREATE TABLE metadata (
                 pid INT, 
                 title TEXT, 
-                tags TEXT,
-                completedTags TEXT,
+                tags BLOB,
+                completedTags BLOB,
                 description TEXT,
                 user TEXT,
                 userId INT,
@@ -79,13 +145,9 @@ class PicDatabase:
                 PRIMARY KEY (pid)
             )'''
         )
-        self.cursor.execute(
-            '''CREATE TABLE tagIndex (
-                tag TEXT,
-                pids TEXT,
-                PRIMARY KEY (tag)
-            )'''
-        )
+        TagDictionary.create_table(self.cursor)
+        self._create_tag_posting_table(self.cursor)
+        self._create_file_manifest_table(self.cursor)
         self.cursor.execute(
             '''CREATE TABLE tags (
                 originalTag TEXT,
@@ -94,9 +156,143 @@ class PicDatabase:
                 PRIMARY KEY (originalTag)
             )'''
         )
-        self.cursor.execute('''CREATE INDEX tag ON tagIndex (tag)''')
         self.cursor.execute('''CREATE INDEX dataPid ON metadata (pid)''')
         self.cursor.execute('''CREATE INDEX filePid ON imageData (pid)''')
+        self._create_file_filter_indexes(self.cursor)
+        self._create_generation_table(self.cursor)
+        self.cursor.execute(f"PRAGMA user_version = {DATABASE_VERSION}")
+        self.database.commit()
+
+    def _create_tag_posting_table(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Create the (tag id, pid) posting table of the tag index.
+
+        The primary key doubles as a covering index for tag lookups,
+        the pid index is used when the postings of a picture are rebuilt.
+        """
+        cursor.execute(
+            '''CREATE TABLE tagPosting (
+                tagId INT,
+                pid INT,
+                PRIMARY KEY (tagId, pid)
+            ) WITHOUT ROWID'''
+        )
+        cursor.execute('''CREATE INDEX postingPid ON tagPosting (pid)''')
+
+    def _create_file_manifest_table(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Create the table recording the state of every imported file, see FileManifest.
+        """
+        cursor.execute(
+            '''CREATE TABLE fileManifest (
+                path TEXT,
+                size INT,
+                mtime REAL,
+                hash TEXT,
+                PRIMARY KEY (path)
+            )'''
+        )
+
+    def _create_file_filter_indexes(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Create the imageData indexes used by the filters of FileQuery.
+        """
+        cursor.execute('''CREATE INDEX fileResolution ON imageData (width, height)''')
+        cursor.execute('''CREATE INDEX fileType ON imageData (fileType)''')
+        cursor.execute('''CREATE INDEX fileRatio ON imageData (ratio)''')
+
+    def _create_generation_table(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Create the one row table holding the database generation, see read_generation.
+        """
+        cursor.execute('''CREATE TABLE databaseGeneration (generation INT)''')
+        cursor.execute('''INSERT INTO databaseGeneration VALUES (0)''')
+
+    def _increase_generation(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Increase the database generation, called in the transaction changing pictures or the tag index.
+        """
+        cursor.execute("UPDATE databaseGeneration SET generation = generation + 1")
+
+    def read_generation(self, cursor: sqlite3.Cursor = None) -> int:
+        """
+        Read the database generation into generation and return it.
+
+        The generation is stored in the database and increased whenever pictures or the tag index change, 
+        so changes made by another process, like the reindex of the tag manager, invalidate the caches of this one.
+        """
+        if cursor is None:
+            cursor = self.cursor
+        
+        self.generation = cursor.execute("SELECT generation FROM databaseGeneration").fetchone()[0]
+        return self.generation
+
+    @log_execution("Info", "Migrating database", "Database migrated")
+    def _migrate_database(self, version: int):
+        """
+        Upgrade an existing database from the given schema version to the current one.
+        """
+        if version < 1:
+            # tagIndex stored the pids of every tag as a JSON list, move them to tagPosting, its tags become ids in version 5
+            self.cursor.execute("CREATE TABLE tagPosting (tag TEXT, pid INT, PRIMARY KEY (tag, pid)) WITHOUT ROWID")
+            self.cursor.execute("CREATE INDEX postingPid ON tagPosting (pid)")
+            self.cursor.execute(
+                """
+                    INSERT OR IGNORE INTO tagPosting (tag, pid)
+                    SELECT tagIndex.tag, json_each.value FROM tagIndex, json_each(tagIndex.pids)
+                    WHERE json_valid(tagIndex.pids)
+                """
+            )
+            self.cursor.execute("DROP TABLE tagIndex")
+            
+        if version < 2:
+            self._create_file_manifest_table(self.cursor)
+            
+        if version < 4:
+            self._create_file_filter_indexes(self.cursor)
+        
+        if version < 5:
+            self._migrate_tags_to_ids()
+            
+        if version < 3:
+            # tag counts are maintained incrementally from version 3, start from an exact count of the tag ids
+            self.count_tags()
+        
+        if version < 6:
+            self._create_generation_table(self.cursor)
+
+        self.cursor.execute(f"PRAGMA user_version = {DATABASE_VERSION}")
+        self.database.commit()
+        if version < 5:
+            # the packed tag ids leave most metadata and posting pages partly empty, give the space back
+            self.cursor.execute("VACUUM")
+
+    def _migrate_tags_to_ids(self) -> None:
+        """
+        Replace the JSON tag lists of the metadata and the tag strings of the tag index with tag ids.
+        """
+        TagDictionary.create_table(self.cursor)
+        self.tag_dictionary = TagDictionary(self.cursor, self.get_new_connection)
+        rows = self.cursor.execute("SELECT pid, tags, completedTags FROM metadata").fetchall()
+        def encode(tags_json: str | None) -> bytes | None:
+            return self.tag_dictionary.encode(json.loads(tags_json), self.cursor) if tags_json is not None else None
+        
+        self.cursor.executemany(
+            "UPDATE metadata SET tags = ?, completedTags = ? WHERE pid = ?",
+            ((encode(tags_json), encode(completed_tags_json), pid) for pid, tags_json, completed_tags_json in rows)
+        )
+
+        self.tag_dictionary.intern([row[0] for row in self.cursor.execute("SELECT DISTINCT tag FROM tagPosting").fetchall()], self.cursor)
+        self.cursor.execute("ALTER TABLE tagPosting RENAME TO tagPostingText")
+        self.cursor.execute("DROP INDEX postingPid")
+        self._create_tag_posting_table(self.cursor)
+        self.cursor.execute(
+            """
+                INSERT INTO tagPosting (tagId, pid)
+                SELECT tagDictionary.id, tagPostingText.pid FROM tagPostingText JOIN tagDictionary ON tagDictionary.tag = tagPostingText.tag
+            """
+        )
+        self.cursor.execute("DROP TABLE tagPostingText")
     
     def _insert_image_data(
             self, 
@@ -118,10 +314,75 @@ class PicDatabase:
             cursor = self.cursor
             
         cursor.execute(
-            "INSERT OR IGNORE INTO imageData VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            self._INSERT_IMAGE_DATA_SQL,
             (pid, num, directory, file_name, file_type, width, height, size, ratio)
         )
+    
+    def _insert_image_data_many(self, image_data_list: list[tuple], cursor: sqlite3.Cursor = None) -> None:
+        """
+        Insert rows of image data into the database in one statement.
+
+        Each row has the same layout as the arguments of _insert_image_data.
+        """
+        if not cursor:
+            cursor = self.cursor
+            
+        cursor.executemany(self._INSERT_IMAGE_DATA_SQL, image_data_list)
+    
+    def _delete_image_data_by_path(self, file_paths: list[str], cursor: sqlite3.Cursor = None) -> None:
+        """
+        Delete the image data of deleted picture files.
+
+        A row is only deleted if it still points into the directory of the deleted file, 
+        a file moved to another folder of the library has already replaced the row with its new path.
+        The paths are normalized like the paths of FileManifest before they are compared.
+        """
+        if not cursor:
+            cursor = self.cursor
+            
+        rows = []
+        for file_path in file_paths:
+            file_name = os.path.basename(file_path)
+            if not file_name.endswith(IMAGE_EXTENSIONS):
+                continue
+            
+            pid, num, file_type = parse_file_name(file_name)
+            directory = os.path.dirname(FileManifest.normalize_path(file_path))
+            cursor.execute("SELECT directory FROM imageData WHERE pid = ? AND num = ? AND fileName = ?", (pid, num, file_name))
+            for (row_directory,) in cursor.fetchall():
+                if FileManifest.normalize_path(row_directory) == directory:
+                    rows.append((pid, num, file_name, row_directory))
         
+        cursor.executemany("DELETE FROM imageData WHERE pid = ? AND num = ? AND fileName = ? AND directory = ?", rows)
+
+    def _delete_metadata_by_path(self, file_paths: list[str], cursor: sqlite3.Cursor = None) -> None:
+        """
+        Delete the metadata, tag counts and tag index postings of deleted {pid}.txt metadata files.
+
+        The metadata is kept if a file of the same name is still recorded in another folder of the library,
+        a metadata file moved there has already replaced the row when that folder was imported.
+        Data read from .csv files is kept, a csv file does not tell which pictures it described.
+        """
+        if not cursor:
+            cursor = self.cursor
+
+        deleted_paths = set(file_paths)
+        file_names = {os.path.basename(file_path) for file_path in file_paths if file_path.endswith(".txt")}
+        if not file_names:
+            return
+
+        cursor.execute("SELECT path FROM fileManifest WHERE path LIKE '%.txt'")
+        for (path,) in cursor.fetchall():
+            if path not in deleted_paths:
+                file_names.discard(os.path.basename(path))
+
+        pids = [int(file_name[:-4]) for file_name in file_names if file_name[:-4].isdigit()]
+        tag_delta = Counter()
+        self._count_tag_delta(dict.fromkeys(pids, ()), tag_delta, cursor=cursor)
+        self._apply_tag_count_delta(tag_delta, cursor=cursor)
+        self._clear_tag_index(pids, cursor=cursor)
+        cursor.executemany("DELETE FROM metadata WHERE pid = ?", ((pid,) for pid in pids))
+
     def _insert_metadata(
             self, 
             pid: int, 
@@ -145,39 +406,11 @@ class PicDatabase:
             cursor = self.cursor
         
         cursor.execute(
-            """
-                INSERT INTO metadata (
-                    pid, 
-                    title, 
-                    tags, 
-                    description, 
-                    user, 
-                    userId, 
-                    date, 
-                    xRestrict, 
-                    bookmarkCount, 
-                    likeCount, 
-                    viewCount, 
-                    commentCount
-                )
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ON CONFLICT(pid) DO UPDATE SET
-                title=excluded.title, 
-                tags=excluded.tags, 
-                description=excluded.description, 
-                user=excluded.user, 
-                userId=excluded.userId,
-                date=excluded.date, 
-                xRestrict=excluded.xRestrict, 
-                bookmarkCount=excluded.bookmarkCount, 
-                likeCount=excluded.likeCount,
-                viewCount=excluded.viewCount, 
-                commentCount=excluded.commentCount
-            """,
-            (
+            self._UPSERT_METADATA_SQL,
+            self._get_metadata_row(
                 pid, 
                 title, 
-                json.dumps(tags, ensure_ascii=False), 
+                tags, 
                 description, 
                 user, 
                 user_id, 
@@ -186,10 +419,56 @@ class PicDatabase:
                 bookmark_count, 
                 like_count, 
                 view_count, 
-                comment_count
+                comment_count,
+                cursor=cursor
             )
         )
     
+    def _insert_metadata_many(self, metadata_list: list[tuple], cursor: sqlite3.Cursor = None) -> None:
+        """
+        Insert rows of metadata into the database in one statement.
+
+        Each row has the same layout as the arguments of _insert_metadata, the counts are optional.
+        """
+        if not cursor:
+            cursor = self.cursor
+            
+        cursor.executemany(self._UPSERT_METADATA_SQL, (self._get_metadata_row(*metadata, cursor=cursor) for metadata in metadata_list))
+        
+    def _get_metadata_row(
+            self,
+            pid: int, 
+            title: str, 
+            tags: list[str], 
+            description: str, 
+            user: str, 
+            user_id: int, 
+            date: str,
+            xRestrict: str, 
+            bookmark_count: int = None, 
+            like_count: int = None, 
+            view_count: int = None, 
+            comment_count: int = None,
+            cursor: sqlite3.Cursor = None
+        ) -> tuple:
+        """
+        Convert metadata to the parameters of _UPSERT_METADATA_SQL, new tags are added to the tag dictionary with cursor.
+        """
+        return (
+            pid, 
+            title, 
+            self.tag_dictionary.encode(tags, cursor or self.cursor), 
+            description, 
+            user, 
+            user_id, 
+            date,
+            xRestrict, 
+            bookmark_count, 
+            like_count, 
+            view_count, 
+            comment_count
+        )
+    
     def _update_tag_index(self, tag_index_dict: dict[str, set[int]], cursor: sqlite3.Cursor = None) -> None:
         """
         Insert tag index dictionary into the database.
@@ -197,14 +476,30 @@ class PicDatabase:
         if not cursor:
             cursor = self.cursor
             
-        existing_tags_set = {i[0] for i in cursor.execute("SELECT tag FROM tagIndex").fetchall()}
-        for tag, pids in tag_index_dict.items():
-            if tag in existing_tags_set:
-                current_pids = self.get_pids_by_tag(tag, cursor=cursor)
-                current_pids.update(pids)
-                cursor.execute("UPDATE tagIndex SET pids = ? WHERE tag = ?", (json.dumps(list(current_pids), ensure_ascii=False), tag))
-            else:
-               cursor.execute("INSERT INTO tagIndex (tag, pids) VALUES (?, ?)", (tag, json.dumps(list(pids), ensure_ascii=False)))
+        tag_ids = self.tag_dictionary.intern(tag_index_dict.keys(), cursor)
+        cursor.executemany(
+            "INSERT OR IGNORE INTO tagPosting (tagId, pid) VALUES (?, ?)",
+            ((tag_id, pid) for tag_id, pids in zip(tag_ids, tag_index_dict.values()) for pid in pids)
+        )
+    
+    def _clear_tag_index(self, pid_list: list[int], cursor: sqlite3.Cursor = None) -> None:
+        """
+        Remove the tag index postings of the given pids.
+        """
+        if not cursor:
+            cursor = self.cursor
+            
+        cursor.executemany("DELETE FROM tagPosting WHERE pid = ?", ((pid,) for pid in pid_list))
+    
+    def get_restricted_pids(self, cursor: sqlite3.Cursor = None) -> frozenset[int]:
+        """
+        Get the pids whose metadata is not rated allAges, the pictures hidden by FileQuery.include_restricted.
+        """
+        if not cursor:
+            cursor = self.cursor
+        
+        cursor.execute("SELECT pid FROM metadata WHERE xRestrict != 'allAges'")
+        return frozenset(row[0] for row in cursor.fetchall())
     
     def get_pids_without_tags(self, cursor: sqlite3.Cursor = None) -> list[int]:
         """
@@ -214,25 +509,71 @@ class PicDatabase:
             cursor = self.cursor
         
         result = set()    
-        cursor.execute("SELECT pid FROM metadata WHERE completedTags = '[]'")
+        cursor.execute("SELECT pid FROM metadata WHERE completedTags = x''")
         result.update([i[0] for i in cursor.fetchall()])
         cursor.execute("SELECT pid FROM imageData WHERE pid NOT IN (SELECT pid FROM metadata)")
         result.update([i[0] for i in cursor.fetchall()])
         return list(result)
     
-    def get_pids_by_tag(self, tag: str, cursor: sqlite3.Cursor = None) -> set[int]:
+    def get_pids_by_tag(self, tag: str, cursor: sqlite3.Cursor = None) -> PidSet:
         """
         Get pids by tag.
         """
         if not cursor:
             cursor = self.cursor
             
-        cursor.execute("SELECT pids FROM tagIndex WHERE tag = ?", (tag,))
-        pids_json = cursor.fetchone()
-        if pids_json and pids_json[0]:
-            return set(json.loads(pids_json[0]))
-        else:
-            return set()
+        tag_id = self.tag_dictionary.get_id(tag, cursor)
+        if tag_id is None:
+            return PidSet()
+        
+        cursor.execute("SELECT pid FROM tagPosting WHERE tagId = ?", (tag_id,))
+        return PidSet(row[0] for row in cursor.fetchall())
+    
+    def get_pids_by_tags(self, tags: list | set[str], cursor: sqlite3.Cursor = None) -> dict[str, PidSet]:
+        """
+        Get pids of several tags in one query.
+
+        Returns:
+        dict: A dictionary of tag and the set of pids of the tag, tags without pictures map to an empty set.
+        """
+        if not cursor:
+            cursor = self.cursor
+        
+        tag_pids: dict[str, list[int]] = {tag: [] for tag in tags}
+        id_pids = {tag_id: tag_pids[tag] for tag, tag_id in self.tag_dictionary.get_ids(tag_pids, cursor).items()}
+        
+        for chunk in _chunks(list(id_pids)):
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT tagId, pid FROM tagPosting WHERE tagId IN ({placeholders})", chunk)
+            for tag_id, pid in cursor.fetchall():
+                id_pids[tag_id].append(pid)
+            
+        return {tag: PidSet(pids) for tag, pids in tag_pids.items()}
+    
+    def get_tag_posting_counts(self, cursor: sqlite3.Cursor = None) -> list[tuple[str, int]]:
+        """
+        Get every tag of the tag index with its number of pids.
+        """
+        if not cursor:
+            cursor = self.cursor
+        
+        cursor.execute("SELECT tagId, count(*) FROM tagPosting GROUP BY tagId")
+        get_tag = self.tag_dictionary.get_tag
+        return [(get_tag(tag_id, cursor), pid_count) for tag_id, pid_count in cursor.fetchall()]
+    
+    def iter_tag_postings(self, cursor: sqlite3.Cursor = None) -> Iterator[tuple[int, str]]:
+        """
+        Iterate the (pid, tag) pairs of the tag index ordered by pid, without loading them all at once.
+        """
+        if not cursor:
+            cursor = self.cursor
+        
+        tags = self.tag_dictionary.tags
+        get_tag = self.tag_dictionary.get_tag
+        cursor.execute("SELECT pid, tagId FROM tagPosting ORDER BY pid")
+        for pid, tag_id in cursor:
+            tag = tags.get(tag_id)
+            yield pid, tag if tag is not None else get_tag(tag_id, cursor)
     
     def _get_tags(self, pid: int, cursor: sqlite3.Cursor = None) -> set[str]:
         """
@@ -242,25 +583,48 @@ class PicDatabase:
             cursor = self.cursor
             
         cursor.execute("SELECT tags FROM metadata WHERE pid = ?", (pid,))
-        tags_json = cursor.fetchone()
-        if tags_json:
-            return set(json.loads(tags_json[0]))
+        tags_blob = cursor.fetchone()
+        if tags_blob:
+            return set(self.tag_dictionary.decode(tags_blob[0], cursor))
         else:
             return set()
     
-    def _get_completed_tags(self, pid: int, cursor: sqlite3.Cursor = None) -> set[str]:
+    def _get_completed_tags_dict(self, pids: list | set[int] | None, cursor: sqlite3.Cursor = None) -> dict[int, set[str]]:
         """
-        Get completed tags of a picture.
+        Get completed tags of several pictures, all pictures if pids is None, pids without metadata are left out.
+        """
+        if not cursor:
+            cursor = self.cursor
+        
+        decode = self.tag_dictionary.decode
+        if pids is None:
+            cursor.execute("SELECT pid, completedTags FROM metadata")
+            return {pid: set(decode(tags_blob, cursor)) for pid, tags_blob in cursor.fetchall()}
+        
+        completed_tags_dict = {}
+        for chunk in _chunks(list(pids)):
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT pid, completedTags FROM metadata WHERE pid IN ({placeholders})", chunk)
+            for pid, tags_blob in cursor.fetchall():
+                completed_tags_dict[pid] = set(decode(tags_blob, cursor))
+        
+        return completed_tags_dict
+        
+    def _get_tags_dict(self, pids: list | set[int], cursor: sqlite3.Cursor = None) -> dict[int, list[str]]:
+        """
+        Get tags of several pictures, pids without metadata are left out.
         """
         if not cursor:
             cursor = self.cursor
             
-        cursor.execute("SELECT completedTags FROM metadata WHERE pid = ?", (pid,))
-        tags_json = cursor.fetchone()
-        if tags_json:
-            return set(json.loads(tags_json[0]))
-        else:
-            return set()
+        tags_dict = {}
+        for chunk in _chunks(list(pids)):
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT pid, tags FROM metadata WHERE pid IN ({placeholders})", chunk)
+            for pid, tags_blob in cursor.fetchall():
+                tags_dict[pid] = self.tag_dictionary.decode(tags_blob, cursor)
+                
+        return tags_dict
         
     def _get_pid_list(self, cursor: sqlite3.Cursor = None) -> list[int]:
         """
@@ -301,7 +665,7 @@ class PicDatabase:
         if cursor is None:
             cursor = self.cursor
 
-        cursor.execute("UPDATE metadata SET tags = ? WHERE pid = ?", (json.dumps(tags, ensure_ascii=False), pid))
+        cursor.execute("UPDATE metadata SET tags = ? WHERE pid = ?", (self.tag_dictionary.encode(tags, cursor), pid))
         
     def overwrite_completed_tags(self, pid: str, tags: list, cursor: sqlite3.Cursor = None) -> None:
         """
@@ -319,7 +683,7 @@ class PicDatabase:
         if cursor is None:
             cursor = self.cursor
             
-        cursor.execute("UPDATE metadata SET completedTags = ? WHERE pid = ?", (json.dumps(tags, ensure_ascii=False), pid))
+        cursor.execute("UPDATE metadata SET completedTags = ? WHERE pid = ?", (self.tag_dictionary.encode(tags, cursor), pid))
     
     def add_tags(self, pid: int, tags: set, connection: sqlite3.Connection = None) -> None:
         """
@@ -393,7 +757,7 @@ class PicDatabase:
             
         tag_pairs = list(zip(tags, tags_transl))
         for tag, tag_transl in tag_pairs:
-            cursor.execute("INSERT OR REPLACE INTO tags VALUES (?, ?, ?)", (tag, tag_transl, 0))
+            cursor.execute(self._INSERT_TAG_TRANSLATION_SQL, (tag, tag_transl, 0))
         
         tags_list = [tag for tag in tags]
         self._insert_metadata(
@@ -411,22 +775,52 @@ class PicDatabase:
             comment_count=comment,
             cursor=cursor
         )
+        
+    def insert_csv_data_many(self, csv_data_list: list[tuple], cursor: sqlite3.Cursor = None) -> None:
+        """
+        Insert rows parsed from CSV files into the database in batched statements.
+
+        Each row has the same layout as the arguments of insert_csv_data.
+        """
+        if not cursor:
+            cursor = self.cursor
+            
+        cursor.executemany(
+            self._INSERT_TAG_TRANSLATION_SQL,
+            ((tag, tag_transl, 0) for data in csv_data_list for tag, tag_transl in zip(data[1], data[2]))
+        )
+        self._insert_metadata_many(
+            [
+                (pid, title, tags, description, user, user_id, date, xRestrict, bookmarks, like, view, comment)
+                for pid, tags, tags_transl, user, user_id, title, description, bookmarks, like, view, comment, xRestrict, date in csv_data_list
+            ],
+            cursor=cursor
+        )
 
     @log_execution(
         "Info", 
         "Collecting data from directroy {args[1]}", 
         "Collected data from directory {args[1]}, used {execution_time} seconds"
     )
-    def collect_data(self, directory: str, thread: 'DataCollectThread' = None, connection: sqlite3.Connection = None) -> list[int]:
+    def collect_data(
+            self, 
+            directory: str, 
+            thread: 'DataCollectThread' = None, 
+            connection: sqlite3.Connection = None, 
+            workers: int = 1,
+            verify_hash: bool = False
+        ) -> list[int]:
         """
         Collects data from a directory and stores it in a database.
 
-        This function reads all files in a directory and processes them. 
+        This function reads all new or modified files in a directory and processes them. 
         It reads metadata from .txt files, image data from image files, and CSV data from .csv files. 
-        It then stores the data in the database.
+        It then stores the data in the database and removes the image data and metadata of deleted files.
 
         Parameters:
         directory (str): The directory to read data from.
+        workers (int): The number of processes parsing files, more than one worker uses the pipelined IngestPipeline.
+        verify_hash (bool): Compare content hashes of files whose mtime changed but size did not.
 
         Returns:
         list: A list containing the metadata ids of the processed files.
@@ -434,6 +828,38 @@ class PicDatabase:
         if not connection:
             connection = self.database
             
+        manifest = FileManifest(directory, connection.cursor(), verify_hash)
+        if workers > 1:
+            pipeline = IngestPipeline(self, connection, workers, manifest, thread=thread)
+            processed_metadata_ids = pipeline.run(directory)
+        else:
+            tag_delta = Counter()
+            processed_metadata_ids = self._collect_data_sequentially(directory, manifest, tag_delta, thread, connection)
+            self._apply_tag_count_delta(tag_delta, cursor=connection.cursor())
+        
+        deleted_paths = manifest.get_deleted_paths()
+        if deleted_paths:
+            Log.info(f"{len(deleted_paths)} files were deleted from {directory}")
+            self._delete_image_data_by_path(deleted_paths, cursor=connection.cursor())
+            self._delete_metadata_by_path(deleted_paths, cursor=connection.cursor())
+            manifest.remove(deleted_paths, cursor=connection.cursor())
+            
+        self._increase_generation(connection.cursor())
+        connection.commit()
+        return processed_metadata_ids
+    
+    def _collect_data_sequentially(
+            self, 
+            directory: str, 
+            manifest: FileManifest, 
+            tag_delta: Counter,
+            thread: 'DataCollectThread', 
+            connection: sqlite3.Connection
+        ) -> list[int]:
+        """
+        Parse and insert the new or modified files of a directory one by one.
+        The change of tag counts is accumulated in tag_delta.
+        """
         processed_files = 0
         processed_metadata_ids = set()
         for root, dirs, files in os.walk(directory):
@@ -442,96 +868,150 @@ class PicDatabase:
                 if thread:
                     thread.status_update.emit(f"处理了 {processed_files} 个文件")
 
+                if not file.endswith(PARSABLE_EXTENSIONS): # webp files are ignored because they cannot be processed
+                    continue
+                
                 file_path = os.path.join(root, file)
+                try:
+                    file_state = manifest.check(file_path)
+                except OSError as e: # deleted or moved while the directory is walked
+                    Log.warning(f"Skipped {file_path}: {e}")
+                    continue
+                if file_state is None:
+                    continue
+                
                 if file.endswith(".txt"):
                     metadata = parse_metadata(file_path)
                     processed_metadata_ids.add(metadata[0])
+                    self._count_tag_delta({metadata[0]: metadata[2]}, tag_delta, cursor=connection.cursor())
                     self._insert_metadata(*metadata, cursor=connection.cursor())
                     
                 elif file.endswith(".csv"):
                     csv_data = parse_csv(file_path)
                     for data in csv_data:
                         processed_metadata_ids.add(data[0])
+                        self._count_tag_delta({data[0]: data[1]}, tag_delta, cursor=connection.cursor())
                         self.insert_csv_data(*data, cursor=connection.cursor())
 
-                elif file.endswith(".jpg") or file.endswith(".png") or file.endswith(".jpeg") or file.endswith(".gif"):
+                elif file.endswith(IMAGE_EXTENSIONS):
                     image_data = parse_picture(file_path)
                     self._insert_image_data(*image_data, cursor=connection.cursor())
                 
-                elif file.endswith(".webp"): # ignore webp files because they cannot be processed
-                    continue
+                manifest.update([file_state], cursor=connection.cursor())
         
-        processed_metadata_ids = list(processed_metadata_ids)
-        self.count_tags(cursor=connection.cursor())
-        connection.commit()
-        return processed_metadata_ids
+        return list(processed_metadata_ids)
 
     def count_tags(self, pid_list: list[int] = None, cursor: sqlite3.Cursor = None) -> None:
         """
         Count the number of appearances of each tag in the metadata.
+
+        Without pid_list all counts are recounted, otherwise the tags of the given, newly inserted pids are added to the counts.
+        The tags are fetched in chunks, the blobs of a chunk are unpacked at once and counted by Counter in C,
+        only the counts are held in memory. The counts are written once per tag.
         """
         if cursor is None:
             cursor = self.cursor
 
+        tag_counts = Counter()
         if pid_list is None:
-            update_existing = False
-            cursor.execute("UPDATE tags SET appearanceCount = 0")
             cursor.execute("SELECT tags FROM metadata")
-            pic_tags = cursor.fetchall()
-        else:
-            update_existing = True
-            for pid in pid_list:
-                cursor.execute("SELECT tags FROM metadata WHERE pid = ?", (pid,))
-                pic_tags = cursor.fetchall()
-        
-        tag_count = {}
-        
-        for tags in pic_tags:
-            tags_list = json.loads(tags[0])
-            for tag in tags_list:
-                if tag in tag_count:
-                    tag_count[tag] += 1
-                else:
-                    tag_count[tag] = 1
-
-        if update_existing:
-            for tag, count in tag_count.items():
-                cursor.execute("SELECT appearanceCount FROM tags WHERE originalTag = ?", (tag,)).fetchone()
-                result = cursor.fetchone()
-                if result:
-                    current_count = result[0]
-                    cursor.execute("UPDATE tags SET appearanceCount = ? WHERE originalTag = ?", (current_count + count, tag))
-                else:
-                    cursor.execute("INSERT INTO tags (originalTag, appearanceCount) VALUES (?, ?)", (tag, count))
+            self._count_tag_ids(cursor, tag_counts)
+            cursor.execute("UPDATE tags SET appearanceCount = 0")
         else:
-            for tag, count in tag_count.items():
-                cursor.execute("INSERT OR IGNORE INTO tags (originalTag, appearanceCount) VALUES (?, ?)", (tag, count))
-                cursor.execute("UPDATE tags SET appearanceCount = ? WHERE originalTag = ?", (count, tag))
+            for chunk in _chunks(list(pid_list)):
+                placeholders = ", ".join("?" * len(chunk))
+                cursor.execute(f"SELECT tags FROM metadata WHERE pid IN ({placeholders})", chunk)
+                self._count_tag_ids(cursor, tag_counts)
+        
+        get_tag = self.tag_dictionary.get_tag
+        cursor.executemany(self._ADD_TAG_COUNT_SQL, ((get_tag(tag_id, cursor), tag_count) for tag_id, tag_count in tag_counts.items()))
+    
+    def _count_tag_ids(self, cursor: sqlite3.Cursor, tag_counts: Counter) -> None:
+        """
+        Add the tag ids of the tags blobs selected by cursor to tag_counts, fetching FETCH_CHUNK_SIZE rows at a time.
+        """
+        unpack = self.tag_dictionary.unpack
+        while rows := cursor.fetchmany(FETCH_CHUNK_SIZE):
+            tag_counts.update(unpack(b"".join(blob for (blob,) in rows if blob)))
+
+    def _count_tag_delta(self, pic_tags: dict[int, list[str]], tag_delta: Counter, cursor: sqlite3.Cursor = None) -> None:
+        """
+        Add the change of tag counts caused by overwriting the tags of pictures to tag_delta.
+
+        Must be called before the new tags are written, the current tags are read from the database.
+
+        Parameters:
+        pic_tags (dict): A dictionary of pid and the new tags of the picture.
+        tag_delta (Counter): The accumulated change of each tag count.
+        """
+        for pid, tags in self._get_tags_dict(pic_tags.keys(), cursor=cursor).items():
+            tag_delta.subtract(tags)
+
+        for tags in pic_tags.values():
+            tag_delta.update(tags)
 
-    def get_metadata_list(self, pids: list | set[int], cursor: sqlite3.Cursor = None) -> list['PicMetadata']:
+    def _apply_tag_count_delta(self, tag_delta: Counter, cursor: sqlite3.Cursor = None) -> None:
+        """
+        Apply the accumulated change of tag counts.
+        """
+        if cursor is None:
+            cursor = self.cursor
+            
+        cursor.executemany(self._ADD_TAG_COUNT_SQL, ((tag, count) for tag, count in tag_delta.items() if count != 0))
+
+    def get_metadata_list(
+            self, 
+            pids: list | set[int], 
+            cursor: sqlite3.Cursor = None, 
+            fields: Iterable[str] = None
+        ) -> list['PicMetadata']:
         """
         Get metadata of a list of pids.
 
-        This function gets the metadata of a list of pids.
+        This function gets the metadata of a list of pids, the pids are fetched in chunks with one query per chunk.
 
         Parameters:
         pid_list (set): A set of pids.
+        fields (Iterable, optional): The PicMetadata fields to fetch, e.g. METADATA_GRID_FIELDS,
+            pid is always fetched and the other fields are left None. Defaults to all fields.
 
         Returns:
         list: A list of PicMetadata objects.
         """
         if cursor is None:
             cursor = self.cursor
+        
+        tag_dictionary = self.tag_dictionary
+        if fields is None:
+            select = "*"
+            
+            def to_metadata(row: tuple) -> PicMetadata:
+                return PicMetadata(*row, tag_dictionary)
+        else:
+            fields = ["pid", *(field_name for field_name in fields if field_name != "pid")]
+            unknown_fields = [field_name for field_name in fields if field_name not in PicMetadata.COLUMNS]
+            if unknown_fields:
+                raise ValueError(f"Unknown metadata fields: {', '.join(unknown_fields)}")
+            
+            select = ", ".join(PicMetadata.COLUMNS[field_name] for field_name in fields)
+            
+            def to_metadata(row: tuple) -> PicMetadata:
+                return PicMetadata(**dict(zip(fields, row)), tag_dictionary=tag_dictionary)
+        
         metadata_list = []
-        for pid in pids:
-            cursor.execute("SELECT * FROM metadata WHERE pid = ?", (pid,))
-            metadata = self.cursor.fetchone()
-            if metadata:
-                metadata_list.append(PicMetadata(*metadata))
+        for chunk in _chunks(list(pids)):
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT {select} FROM metadata WHERE pid IN ({placeholders})", chunk)
+            metadata_list.extend(map(to_metadata, cursor.fetchall()))
     
         return metadata_list
 
-    def get_metadata_dict(self, pids: list | set[int]) -> dict[int, 'PicMetadata']:
+    def get_metadata_dict(
+            self, 
+            pids: list | set[int], 
+            cursor: sqlite3.Cursor = None, 
+            fields: Iterable[str] = None
+        ) -> dict[int, 'PicMetadata']:
         """
         Get metadata of a list of pids as a dictionary.
 
@@ -539,24 +1019,18 @@ class PicDatabase:
 
         Parameters:
         pid_list (set): A set of pids.
+        fields (Iterable, optional): The PicMetadata fields to fetch, see get_metadata_list. Defaults to all fields.
 
         Returns:
         dict: A dictionary of PicMetadata objects.
         """
-        metadata_dict = {}
-        for pid in pids:
-            self.cursor.execute("SELECT * FROM metadata WHERE pid = ?", (pid,))
-            metadata = self.cursor.fetchone()
-            if metadata:
-                metadata_dict[pid] = PicMetadata(*metadata)
-        
-        return metadata_dict
+        return {metadata.pid: metadata for metadata in self.get_metadata_list(pids, cursor=cursor, fields=fields)}
     
-    def get_file_list(self, pids: list | set[int]) -> list['PicFile']:
+    def get_file_list(self, pids: list | set[int], cursor: sqlite3.Cursor = None) -> list['PicFile']:
         """
         Get file data of a list of pids.
 
-        This function gets the file data of a list of pids.
+        This function gets the file data of a list of pids, the pids are fetched in chunks with one query per chunk.
 
         Parameters:
         pid_list (list): A list of pids.
@@ -564,14 +1038,191 @@ class PicDatabase:
         Returns:
         list: A list of PicFile objects.
         """
+        if cursor is None:
+            cursor = self.cursor
+            
         file_list = []
-        for pid in pids:
-            self.cursor.execute("SELECT * FROM imageData WHERE pid = ?", (pid,))
-            file_data = self.cursor.fetchall()
-            for data in file_data:
-                file_list.append(PicFile(*data))
+        for chunk in _chunks(list(pids)):
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT * FROM imageData WHERE pid IN ({placeholders}) ORDER BY pid, num", chunk)
+            file_list.extend(PicFile(*data) for data in cursor.fetchall())
         
         return file_list
+    
+    def _get_excluded_pid_statements(self, query: 'FileQuery') -> list[str]:
+        """
+        Get the statements selecting the pids left out by the picture level filters of a FileQuery.
+        """
+        statements = []
+        if not query.include_restricted:
+            statements.append("SELECT pid FROM metadata WHERE xRestrict != 'allAges'")
+        if query.untagged_only:
+            # same pictures as get_pids_without_tags
+            statements.append("SELECT pid FROM metadata WHERE completedTags != x''")
+        return statements
+
+    def get_excluded_pids(self, query: 'FileQuery', cursor: sqlite3.Cursor = None) -> frozenset[int] | None:
+        """
+        Get the pids left out by the picture level filters of a FileQuery, None if the query has none.
+        """
+        statements = self._get_excluded_pid_statements(query)
+        if not statements:
+            return None
+        if cursor is None:
+            cursor = self.cursor
+        
+        cursor.execute(" UNION ".join(statements))
+        return frozenset(row[0] for row in cursor.fetchall())
+
+    def _get_pid_conditions(self, query: 'FileQuery') -> list[str]:
+        """
+        Translate the picture level filters of a FileQuery into SQL conditions on a pid column, they take no parameters.
+        """
+        return [f"pid NOT IN ({statement})" for statement in self._get_excluded_pid_statements(query)]
+
+    def _get_file_conditions(self, query: 'FileQuery') -> tuple[list[str], list]:
+        """
+        Translate a FileQuery into SQL conditions on imageData and their parameters.
+        """
+        conditions, params = self._get_pid_conditions(query), []
+        if query.excluded_file_types:
+            excluded_file_types = sorted(query.excluded_file_types)
+            conditions.append(f"fileType NOT IN ({', '.join('?' * len(excluded_file_types))})")
+            params.extend(excluded_file_types)
+        
+        for column, (minimum, maximum) in (("width", query.width_range), ("height", query.height_range)):
+            if minimum != -1:
+                conditions.append(f"{column} >= ?")
+                params.append(minimum)
+            if maximum != -1:
+                conditions.append(f"{column} <= ?")
+                params.append(maximum)
+        
+        return conditions, params
+
+    def _build_file_query(
+            self, 
+            query: 'FileQuery', 
+            pids: Iterable[int] | None, 
+            select: str, 
+            ratio_bound: str = None
+        ) -> tuple[str, list]:
+        """
+        Translate a FileQuery into a statement on imageData and its parameters.
+
+        The pid restriction is passed as a single JSON array parameter, so it is not limited by the number of variables.
+        ratio_bound is a comparison operator restricting the ratio against query.ratio, ">=" lists the files at or above it.
+        """
+        conditions, params = self._get_file_conditions(query)
+        if pids is not None:
+            conditions.append("pid IN (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(pids)))
+        if ratio_bound is not None:
+            conditions.append(f"ratio {ratio_bound} ?")
+            params.append(query.ratio)
+        
+        sql = f"SELECT {select} FROM imageData"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        return sql, params
+    
+    def get_filtered_file_list(
+            self, 
+            query: 'FileQuery', 
+            pids: Iterable[int] = None, 
+            limit: int = None, 
+            offset: int = 0, 
+            cursor: sqlite3.Cursor = None
+        ) -> list['PicFile']:
+        """
+        Get the files matching a FileQuery in its sort order, filtered and sorted by sqlite.
+
+        Parameters:
+        query (FileQuery): The filters and sort order.
+        pids (Iterable, optional): Only return files of these pids. Defaults to all pids.
+        limit (int, optional): Return at most this many files, a page of the grid. Defaults to no limit.
+        offset (int, optional): Skip this many files first. Defaults to 0.
+
+        Returns:
+        list: A list of PicFile objects.
+        """
+        if cursor is None:
+            cursor = self.cursor
+        if query.ratio is not None:
+            return self._get_files_by_ratio(query, pids, limit, offset, cursor)
+        
+        sql, params = self._build_file_query(query, pids, "*")
+        sql += " ORDER BY pid, num"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend((limit if limit is not None else -1, offset))
+        
+        cursor.execute(sql, params)
+        return [PicFile(*data) for data in cursor.fetchall()]
+    
+    def _get_files_by_ratio(
+            self, 
+            query: 'FileQuery', 
+            pids: Iterable[int] | None, 
+            limit: int | None, 
+            offset: int, 
+            cursor: sqlite3.Cursor
+        ) -> list['PicFile']:
+        """
+        Get the files matching a FileQuery ordered by the distance of their ratio to query.ratio, then by pid and num.
+
+        The fileRatio index cannot serve ORDER BY abs(ratio - ?), which sorts every matching file.
+        Instead the files at or above and below the target ratio are read with two range scans of the index walking away from it,
+        each already in distance order, and merged, so a page reads at most offset + limit files of each side.
+        """
+        if pids is not None:
+            pids = list(pids)
+        end = offset + limit if limit is not None else -1
+        sides = []
+        for ratio_bound, order in ((">=", "ratio"), ("<", "ratio DESC")):
+            sql, params = self._build_file_query(query, pids, "*", ratio_bound)
+            cursor.execute(f"{sql} ORDER BY {order}, pid, num LIMIT ?", (*params, end))
+            sides.append([PicFile(*data) for data in cursor.fetchall()])
+        
+        ratio = query.ratio
+        pic_files = merge(*sides, key=lambda pic_file: (abs(pic_file.ratio - ratio), pic_file.pid, pic_file.num))
+        return list(islice(pic_files, offset, end if end != -1 else None))
+    
+    def count_filtered_files(self, query: 'FileQuery', pids: Iterable[int] = None, cursor: sqlite3.Cursor = None) -> int:
+        """
+        Count the files matching a FileQuery.
+        """
+        if cursor is None:
+            cursor = self.cursor
+        
+        cursor.execute(*self._build_file_query(query, pids, "count(*)"))
+        return cursor.fetchone()[0]
+    
+    def iter_file_rows(self, cursor: sqlite3.Cursor = None) -> Iterator[tuple]:
+        """
+        Iterate every row of imageData ordered by pid and num, without loading them all at once.
+        """
+        if cursor is None:
+            cursor = self.cursor
+        
+        cursor.execute("SELECT * FROM imageData ORDER BY pid, num")
+        yield from cursor
+    
+    def get_file_dict(self, pids: list | set[int], cursor: sqlite3.Cursor = None) -> dict[int, list['PicFile']]:
+        """
+        Get file data of a list of pids grouped by pid.
+
+        Parameters:
+        pid_list (list): A list of pids.
+
+        Returns:
+        dict: A dictionary of pid and the PicFile objects of the pid, pids without files map to an empty list.
+        """
+        file_dict = {pid: [] for pid in pids}
+        for pic_file in self.get_file_list(file_dict.keys(), cursor=cursor):
+            file_dict[pic_file.pid].append(pic_file)
+            
+        return file_dict
 
     def get_tag_count_list(self, cursor: sqlite3.Cursor = None) -> list[tuple[str, str, int]]:
         """
@@ -588,38 +1239,112 @@ class PicDatabase:
         cursor.execute("SELECT * FROM tags")
         return cursor.fetchall()
     
-    def complete_tag(self, tag_tree: 'TagTree', pid_list: list[int] = None, connection: sqlite3.Connection = None) -> None:
+    def complete_tag(
+            self, 
+            tag_tree: 'TagTree', 
+            pid_list: list[int] = None, 
+            connection: sqlite3.Connection = None, 
+            affected_tags: Iterable[str] = None
+        ) -> list[int]:
         """
-        iterate through the picture tags and complete the tags with parent tags.
-        this function will overwrite the completed tags of the pictures.
+        Complete the tags of pictures with their parent tags and overwrite their completed tags.
+
+        Pictures are read and written in chunks, the tags are expanded with a TagCompleter
+        and each chunk is written with one executemany, pictures whose completed tags did not change are not written.
 
         Args:
-            pid_list (list[int], optional): a list of picture ids to complete the tags. If None, all picture tags will be completed. Defaults to None.
+            tag_tree (TagTree): The tag tree to complete with.
+            pid_list (list[int], optional): The pictures to complete. If None, all pictures are completed. Defaults to None.
+            affected_tags (Iterable[str], optional): Only complete pictures carrying at least one of these tags,
+                e.g. the tags and synonyms of a subtree edited in the tag manager. The pictures are found with
+                get_pids_with_tags, which relies on the tag index and the tag counts. Defaults to None.
 
         Returns:
-            None
+            list[int]: The pids whose completed tags changed.
         """
         if not connection:
             connection = self.database
+        cursor = connection.cursor()
 
-        all_parent_tag_dict = tag_tree.get_all_parent_tag(include_synonyms=True)
-
-        if pid_list is None:
-            pid_list = self._get_pid_list(cursor=connection.cursor())
+        if affected_tags is not None:
+            affected_pids = set(self.get_pids_with_tags(affected_tags, cursor))
+            pid_list = affected_pids if pid_list is None else [pid for pid in pid_list if pid in affected_pids]
+        elif pid_list is None:
+            pid_list = self._get_pid_list(cursor=cursor)
 
-        for pid in pid_list:
-            tags = self._get_tags(pid, cursor=connection.cursor())
-            completed_tags = set()
-            for tag in tags:
-                if tag in all_parent_tag_dict:
-                    completed_tags.update(all_parent_tag_dict[tag])
-                
-                if tag_tree.is_in_tree(tag):
-                    completed_tags.add(tag)
+        completer = TagCompleter(tag_tree, self.tag_dictionary, cursor)
+        changed_pids = []
+        for chunk in _chunks(list(pid_list)):
+            placeholders = ", ".join("?" * len(chunk))
+            cursor.execute(f"SELECT pid, tags, completedTags FROM metadata WHERE pid IN ({placeholders})", chunk)
+            updates = []
+            for pid, tags_blob, completed_tags_blob in cursor.fetchall():
+                new_completed_tags_blob = completer.complete_blob(tags_blob)
+                if new_completed_tags_blob != completed_tags_blob:
+                    updates.append((new_completed_tags_blob, pid))
             
-            self.overwrite_completed_tags(pid, list(completed_tags), cursor=connection.cursor())
+            cursor.executemany("UPDATE metadata SET completedTags = ? WHERE pid = ?", updates)
+            changed_pids.extend(pid for _, pid in updates)
         
         connection.commit()
+        return changed_pids
+
+    def get_pids_with_tags(self, tags: Iterable[str], cursor: sqlite3.Cursor = None) -> list[int]:
+        """
+        Get the pids of pictures carrying at least one of tags, matched against the original tags of the metadata.
+        Pictures indexed under one of tags are included as well, e.g. a picture carrying a synonym of the tag.
+
+        Pictures are found through the tag index: a picture is indexed under each of its completed tags that is not
+        a parent of another of them, so a picture carrying an indexed tag is found through the postings of the tag
+        or of one of its sub tags, which the tags of a subtree edit include, see TagTree.get_changed_tags.
+        A tag without postings may still be carried by pictures that were never indexed under it, 
+        a synonym or a tag that was not in the tree when they were indexed. Of those tags only the ones some picture carries, 
+        by the tag counts, are matched against the metadata: for a few tags sqlite selects the rows containing 
+        their packed ids and only these rows are unpacked, more tags are matched by unpacking every row once.
+
+        This relies on the tag index of init_tag_index and the tag counts kept by collect_data being up to date,
+        pictures imported since the last init_tag_index are only found by their unindexed tags.
+        A database without a tag index matches every tag against the metadata instead.
+        """
+        if not cursor:
+            cursor = self.cursor
+        
+        tag_ids = self.tag_dictionary.get_ids(tags, cursor)
+        if not tag_ids:
+            return []
+        
+        pids = set()
+        if cursor.execute("SELECT 1 FROM tagPosting LIMIT 1").fetchone() is None:
+            carried_ids = set(tag_ids.values())
+        else:
+            indexed_ids = set()
+            for chunk in _chunks(sorted(set(tag_ids.values()))):
+                cursor.execute(f"SELECT tagId, pid FROM tagPosting WHERE tagId IN ({', '.join('?' * len(chunk))})", chunk)
+                for tag_id, pid in cursor:
+                    indexed_ids.add(tag_id)
+                    pids.add(pid)
+            
+            unindexed_tags = [tag for tag, tag_id in tag_ids.items() if tag_id not in indexed_ids]
+            carried_ids = set()
+            for chunk in _chunks(unindexed_tags):
+                cursor.execute(
+                    f"SELECT originalTag FROM tags WHERE appearanceCount > 0 AND originalTag IN ({', '.join('?' * len(chunk))})", 
+                    chunk
+                )
+                carried_ids.update(tag_ids[row[0]] for row in cursor)
+        
+        unpack = self.tag_dictionary.unpack
+        if len(carried_ids) > INSTR_SCAN_LIMIT:
+            # every instr is a pass over the row, past a few ids unpacking each row once is faster
+            cursor.execute("SELECT pid, tags FROM metadata")
+            pids.update(pid for pid, tags_blob in cursor if not carried_ids.isdisjoint(unpack(tags_blob)))
+        elif carried_ids:
+            # instr also matches the bytes of an id across two packed ids, the candidates are checked after unpacking
+            conditions = " OR ".join(["instr(tags, ?) > 0"] * len(carried_ids))
+            cursor.execute(f"SELECT pid, tags FROM metadata WHERE {conditions}", [self.tag_dictionary.pack([tag_id]) for tag_id in carried_ids])
+            pids.update(pid for pid, tags_blob in cursor if not carried_ids.isdisjoint(unpack(tags_blob)))
+        
+        return sorted(pids)
 
     def init_tag_index(self, tag_tree: 'TagTree', pid_list: list[int] = None, connection: sqlite3.Connection = None) -> None:
         """
@@ -629,14 +1354,15 @@ class PicDatabase:
             connection = self.database
         
         all_parent_tag_dict = tag_tree.get_all_parent_tag(include_synonyms=False)
+        # the completed tags are read in chunked queries instead of one query per picture
+        completed_tags_dict = self._get_completed_tags_dict(pid_list, cursor=connection.cursor())
         if pid_list is None:
-            pid_list = self._get_pid_list(cursor=connection.cursor())
+            pid_list = list(completed_tags_dict)
 
         tag_index: dict[str, set[int]] = {}
+        self._clear_tag_index(pid_list, cursor=connection.cursor())
 
-        for pid in pid_list:
-            tags = self._get_completed_tags(pid, cursor=connection.cursor())
-            
+        for pid, tags in completed_tags_dict.items():
             # remove all parent tags from the tag set to remove excessive tags
             tag_set = tags.copy()
             for tag in tags:
@@ -650,30 +1376,98 @@ class PicDatabase:
                     tag_index[tag] = {pid}
         
         self._update_tag_index(tag_index, cursor=connection.cursor())
+        self._increase_generation(connection.cursor())
         connection.commit()
 
+    def reindex_tags(self, tag_tree: 'TagTree', changed_tags: Iterable[str], connection: sqlite3.Connection = None) -> list[int]:
+        """
+        Bring the completed tags and the tag index up to date after the tag tree was edited.
 
-@dataclass
+        Only pictures carrying one of changed_tags, see TagTree.get_changed_tags, are completed and indexed again,
+        even pictures whose completed tags stay the same may lose or gain index entries when parents changed.
+
+        Returns:
+        list: The reindexed pids.
+        """
+        if connection is None:
+            connection = self.database
+        
+        pid_list = self.get_pids_with_tags(changed_tags, connection.cursor())
+        self.complete_tag(tag_tree, pid_list, connection)
+        self.init_tag_index(tag_tree, pid_list, connection)
+        return pid_list
+
+
+@dataclass(slots=True)
 class PicMetadata:
+    """
+    A metadata row, the tags are kept as the packed tag ids read from the database
+    and only decoded and cached when tags or completed_tags is first accessed.
+
+    Rows fetched with a projection, see PicDatabase.get_metadata_list, only have the requested fields set,
+    the other fields are None and their tags read as empty.
+    """
     pid: int
-    title: str
-    tags_json: str
-    completed_tags_json: str
-    description: str
-    user: str
-    user_id: int
-    date: str
-    x_restrict: str
-    bookmark_count: int
-    like_count: int
-    view_count: int
-    comment_count: int
-
-    def __post_init__(self):
-        self.tags: set[str] = set(json.loads(self.tags_json))
-        self.completed_tags: set[str] = set(json.loads(self.completed_tags_json))
+    title: str = None
+    tags_blob: bytes = None
+    completed_tags_blob: bytes = None
+    description: str = None
+    user: str = None
+    user_id: int = None
+    date: str = None
+    x_restrict: str = None
+    bookmark_count: int = None
+    like_count: int = None
+    view_count: int = None
+    comment_count: int = None
+    tag_dictionary: TagDictionary = field(default=None, repr=False, compare=False)
+    _tags: set[str] = field(default=None, init=False, repr=False, compare=False)
+    _completed_tags: set[str] = field(default=None, init=False, repr=False, compare=False)
+
+    COLUMNS: ClassVar[dict[str, str]] = {
+        "pid": "pid",
+        "title": "title",
+        "tags_blob": "tags",
+        "completed_tags_blob": "completedTags",
+        "description": "description",
+        "user": "user",
+        "user_id": "userId",
+        "date": "date",
+        "x_restrict": "xRestrict",
+        "bookmark_count": "bookmarkCount",
+        "like_count": "likeCount",
+        "view_count": "viewCount",
+        "comment_count": "commentCount",
+    } # the metadata column of every field, in table order
+
+    @property
+    def tags(self) -> set[str]:
+        if self._tags is None:
+            self._tags = set(self.tag_dictionary.decode(self.tags_blob)) if self.tags_blob else set()
+        return self._tags
+
+    @property
+    def completed_tags(self) -> set[str]:
+        if self._completed_tags is None:
+            self._completed_tags = set(self.tag_dictionary.decode(self.completed_tags_blob)) if self.completed_tags_blob else set()
+        return self._completed_tags
         
 
+@dataclass(frozen=True)
+class FileQuery:
+    """
+    The file type and resolution filters and the sort order of a file listing.
+
+    Queries are run by PicDatabase.get_filtered_file_list, and by FileCatalog.iter_query_rows for ResultCursor.
+    """
+    excluded_file_types: frozenset[str] = frozenset()
+    width_range: tuple[int, int] = (-1, -1) # minimum and maximum, -1 means no limit
+    height_range: tuple[int, int] = (-1, -1)
+    ratio: float | None = None # sort by the distance of the aspect ratio to this ratio, None sorts by pid and num
+    include_restricted: bool = True # False drops pictures whose metadata is not rated allAges
+    untagged_only: bool = False # only list pictures without completed tags, like get_pids_without_tags
+
+
 @dataclass
 class PicFile:
     pid: int
@@ -685,4 +1479,91 @@ class PicFile:
     height: int
     size: int
     ratio: float
-    
\ No newline at end of file
+    
+
+class ResultCursor:
+    """
+    A search result listed one page at a time, the picture grid fetches the next page when it is scrolled to the end.
+
+    Rows are either the files matching the query in its sort order, or with by_pid the pictures in pid order 
+    with their metadata and files, where only the picture level filters of the query apply.
+    Only fetched pages are built, the time to the first page does not depend on the result size.
+
+    Files are listed from the FileCatalog, filtered and sorted as the pages are consumed, see FileCatalog.iter_query_rows.
+    Pictures are paged with keyset pagination: a page continues after the last pid of the previous page
+    instead of skipping rows with OFFSET, so every page costs the same however far the grid was scrolled.
+    The pids of a result are copied once into a temp table of the connection that every page joins against.
+    """
+    _table_ids = count()
+
+    def __init__(
+            self, 
+            database: PicDatabase, 
+            catalog: 'FileCatalog', 
+            query: FileQuery, 
+            pids: Iterable[int] = None, 
+            by_pid: bool = False
+        ):
+        """
+        Parameters:
+        database (PicDatabase): The database, pages are read with its connection.
+        catalog (FileCatalog): The files of the database, read at its current generation.
+        query (FileQuery): The filters and sort order of the rows.
+        pids (Iterable, optional): Only list these pids. Defaults to all pictures.
+        by_pid (bool, optional): List pictures instead of files. Defaults to False.
+        """
+        self.database = database
+        self.catalog = catalog
+        self.query = query
+        self.by_pid = by_pid
+        self.cursor = database.database.cursor()
+        self.exhausted = False
+        self.pid_table = None
+        if not by_pid:
+            self.rows = catalog.iter_query_rows(query, pids, database.get_excluded_pids(query, self.cursor))
+            return
+        
+        if pids is not None:
+            self.pid_table = f"resultPid{next(self._table_ids)}"
+            self.cursor.execute(f"CREATE TEMP TABLE {self.pid_table} (pid INTEGER PRIMARY KEY)")
+            self.cursor.executemany(f"INSERT INTO temp.{self.pid_table} VALUES (?)", ((pid,) for pid in pids))
+            database.database.commit() # the inserts opened a transaction, do not keep it open between pages
+        self.last_pid = -1
+
+    def fetch(self, size: int) -> tuple[list['PicFile | PicMetadata'], dict[int, list['PicFile']]]:
+        """
+        Fetch the next page.
+
+        Returns:
+        tuple: The rows of the page, and the files of their pids if the rows are pictures.
+        """
+        if self.exhausted:
+            return [], {}
+        
+        if self.by_pid:
+            pids = self._fetch_pids(size)
+            self.exhausted = len(pids) < size
+            if pids:
+                self.last_pid = pids[-1]
+            metadata_dict = self.database.get_metadata_dict(pids, self.cursor, METADATA_GRID_FIELDS)
+            pic_file_dict = self.catalog.get_file_dict(pids)
+            return [metadata_dict[pid] for pid in pids if pid in metadata_dict], pic_file_dict
+        
+        pic_files = self.catalog.get_pic_files(islice(self.rows, size))
+        self.exhausted = len(pic_files) < size
+        return pic_files, {}
+    
+    def _fetch_pids(self, size: int) -> list[int]:
+        conditions = self.database._get_pid_conditions(self.query)
+        conditions.append("pid > ?")
+        params = (self.last_pid, size)
+        source = f"temp.{self.pid_table}" if self.pid_table else "metadata"
+        self.cursor.execute(f"SELECT pid FROM {source} WHERE {' AND '.join(conditions)} ORDER BY pid LIMIT ?", params)
+        return [row[0] for row in self.cursor.fetchall()]
+
+    def close(self) -> None:
+        """Drop the temp table of the result"""
+        if self.pid_table:
+            self.cursor.execute(f"DROP TABLE IF EXISTS temp.{self.pid_table}")
+            self.pid_table = None
+        self.exhausted = True
@@ -0,0 +1,174 @@
+from typing import TYPE_CHECKING
+from collections import deque, Counter
+from concurrent.futures import ProcessPoolExecutor, Future
+from queue import Queue
+from threading import Thread, Event
+import sqlite3
+import os
+
+from utils.parser import parse_file_batch, PARSABLE_EXTENSIONS
+from tools.setting import INGEST_BATCH_SIZE, INGEST_COMMIT_INTERVAL
+from tools.log import Log
+if TYPE_CHECKING:
+    from service.database import PicDatabase
+    from service.manifest import FileManifest
+    from controller.picture_manager import DataCollectThread
+
+class IngestPipeline:
+    """
+    Pipelined import of a picture directory.
+
+    A scanner thread walks the directory and queues batches of new or modified file paths,
+    a process pool parses the batches and the thread calling run() writes the parsed rows
+    with executemany, committing every commit_interval rows.
+    The path queue and the number of batches in flight are bounded so memory stays flat
+    no matter how large the directory is.
+    """
+    def __init__(
+            self, 
+            database: 'PicDatabase', 
+            connection: sqlite3.Connection, 
+            workers: int, 
+            manifest: 'FileManifest',
+            batch_size: int = INGEST_BATCH_SIZE, 
+            commit_interval: int = INGEST_COMMIT_INTERVAL,
+            thread: 'DataCollectThread' = None
+        ):
+        self.database = database
+        self.connection = connection
+        self.workers = workers
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.commit_interval = commit_interval
+        self.thread = thread
+        self.max_pending = workers * 2
+        self.path_queue: Queue[list[tuple] | None] = Queue(maxsize=self.max_pending)
+        self.stop_event = Event()
+        self._init_buffer()
+        
+    def _init_buffer(self):
+        self.image_data_buffer: list[tuple] = []
+        self.metadata_buffer: list[tuple] = []
+        self.csv_data_buffer: list[tuple] = []
+        self.file_state_buffer: list[tuple] = []
+        self.buffered_rows = 0
+    
+    def run(self, directory: str) -> list[int]:
+        """
+        Import all files in a directory.
+
+        Returns:
+        list: A list containing the metadata ids of the processed files.
+        """
+        self.processed_files = 0
+        self.processed_metadata_ids = set()
+        scanner = Thread(target=self._scan, args=(directory,), daemon=True)
+        scanner.start()
+        
+        pending: deque[tuple[Future, list[tuple]]] = deque()
+        scan_finished = False
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                while not scan_finished or pending:
+                    while not scan_finished and len(pending) < self.max_pending:
+                        batch = self.path_queue.get()
+                        if batch is None:
+                            scan_finished = True
+                        else:
+                            file_paths = [file_path for file_path, file_state in batch]
+                            pending.append((pool.submit(parse_file_batch, file_paths), batch))
+                    
+                    if pending:
+                        future, batch = pending.popleft()
+                        self._write_results(future.result(), batch)
+            
+            self._flush()
+        finally:
+            self.stop_event.set()
+            while scanner.is_alive(): # unblock the scanner if it is waiting on a full queue
+                if not self.path_queue.empty():
+                    self.path_queue.get_nowait()
+                scanner.join(0.1)
+        
+        return list(self.processed_metadata_ids)
+    
+    def _scan(self, directory: str) -> None:
+        """
+        Walk the directory and queue batches of the paths and states of new or modified parsable files.
+        """
+        batch = []
+        try:
+            for root, dirs, files in os.walk(directory):
+                for file in files:
+                    if not file.endswith(PARSABLE_EXTENSIONS):
+                        continue
+                    
+                    file_path = os.path.join(root, file)
+                    try:
+                        file_state = self.manifest.check(file_path)
+                    except OSError as e: # deleted or moved while the directory is walked
+                        Log.warning(f"Skipped {file_path}: {e}")
+                        continue
+                    if file_state is None:
+                        continue
+                    
+                    batch.append((file_path, file_state))
+                    if len(batch) == self.batch_size:
+                        self.path_queue.put(batch)
+                        batch = []
+                        
+                    if self.stop_event.is_set():
+                        return
+                    
+            if batch:
+                self.path_queue.put(batch)
+        finally:
+            self.path_queue.put(None)
+
+    def _write_results(self, results: list[tuple[str, object]], batch: list[tuple[str, tuple]]) -> None:
+        """
+        Buffer the parsed rows of a batch and write them once the buffer is full.
+        Files that failed to parse are not recorded in the manifest so they are retried on the next import.
+        """
+        failed_paths = set()
+        for kind, data in results:
+            if kind == "metadata":
+                self.processed_metadata_ids.add(data[0])
+                self.metadata_buffer.append(data)
+                self.buffered_rows += 1
+            elif kind == "csv":
+                self.processed_metadata_ids.update(row[0] for row in data)
+                self.csv_data_buffer.extend(data)
+                self.buffered_rows += len(data)
+            elif kind == "image":
+                self.image_data_buffer.append(data)
+                self.buffered_rows += 1
+            elif kind == "error":
+                failed_paths.add(data[0])
+                Log.warning(f"Failed to parse {data[0]}: {data[1]}")
+        
+        self.file_state_buffer.extend(file_state for file_path, file_state in batch if file_path not in failed_paths)
+        self.processed_files += len(results)
+        if self.thread:
+            self.thread.status_update.emit(f"处理了 {self.processed_files} 个文件")
+
+        if self.buffered_rows >= self.commit_interval:
+            self._flush()
+    
+    def _flush(self) -> None:
+        """
+        Write the buffered rows and the change of tag counts they cause in one transaction.
+        """
+        cursor = self.connection.cursor()
+        pic_tags = {metadata[0]: metadata[2] for metadata in self.metadata_buffer}
+        pic_tags.update((data[0], data[1]) for data in self.csv_data_buffer)
+        tag_delta = Counter()
+        self.database._count_tag_delta(pic_tags, tag_delta, cursor=cursor)
+        
+        self.database._insert_image_data_many(self.image_data_buffer, cursor=cursor)
+        self.database._insert_metadata_many(self.metadata_buffer, cursor=cursor)
+        self.database.insert_csv_data_many(self.csv_data_buffer, cursor=cursor)
+        self.database._apply_tag_count_delta(tag_delta, cursor=cursor)
+        self.manifest.update(self.file_state_buffer, cursor=cursor)
+        self.connection.commit()
+        self._init_buffer()
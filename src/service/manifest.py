@@ -0,0 +1,97 @@
+from threading import Lock
+import hashlib
+import sqlite3
+import os
+
+class FileManifest:
+    """
+    The state of the files imported from a directory.
+
+    Every imported file is recorded in the fileManifest table with its size, mtime
+    and optionally a content hash, so a re-import only parses new or modified files.
+    Files that are recorded but no longer found are reported as deleted.
+    """
+    def __init__(self, directory: str, cursor: sqlite3.Cursor, verify_hash: bool = False):
+        self.directory = self.normalize_path(directory)
+        self.verify_hash = verify_hash
+        self.entries: dict[str, tuple[int, float, str | None]] = {}
+        self.seen_paths: set[str] = set()
+        self.touched_states: list[tuple[str, int, float, str | None]] = []
+        self.touched_lock = Lock() # check() may run in the scanner thread of the ingest pipeline
+        self._load(cursor)
+        
+    @staticmethod
+    def normalize_path(path: str) -> str:
+        return os.path.normcase(os.path.abspath(path))
+    
+    @staticmethod
+    def hash_file(file_path: str) -> str:
+        """
+        Get the content hash of a file.
+        """
+        file_hash = hashlib.sha1()
+        with open(file_path, "rb") as file:
+            while chunk := file.read(1024 * 1024):
+                file_hash.update(chunk)
+        
+        return file_hash.hexdigest()
+    
+    def _load(self, cursor: sqlite3.Cursor) -> None:
+        """
+        Load the manifest entries of the files under the directory.
+        """
+        prefix = os.path.join(self.directory, "")
+        cursor.execute(
+            "SELECT path, size, mtime, hash FROM fileManifest WHERE substr(path, 1, ?) = ?", 
+            (len(prefix), prefix)
+        )
+        for path, size, mtime, file_hash in cursor.fetchall():
+            self.entries[path] = (size, mtime, file_hash)
+    
+    def check(self, file_path: str) -> tuple[str, int, float, str | None] | None:
+        """
+        Check whether a file is new or modified since the last import.
+
+        Returns:
+        tuple: The (path, size, mtime, hash) state to record once the file is imported, 
+        or None if the file is unchanged.
+        """
+        path = self.normalize_path(file_path)
+        stat = os.stat(file_path) # raises for a file deleted since it was listed, which then counts as deleted
+        self.seen_paths.add(path)
+        entry = self.entries.get(path)
+        if entry is not None:
+            size, mtime, file_hash = entry
+            if stat.st_size == size and stat.st_mtime == mtime:
+                return None
+            
+            if self.verify_hash and file_hash and stat.st_size == size and self.hash_file(file_path) == file_hash:
+                # only touched, record the new mtime without parsing the file again
+                with self.touched_lock:
+                    self.touched_states.append((path, stat.st_size, stat.st_mtime, file_hash))
+                return None
+            
+        file_hash = self.hash_file(file_path) if self.verify_hash else None
+        return path, stat.st_size, stat.st_mtime, file_hash
+    
+    def get_deleted_paths(self) -> list[str]:
+        """
+        Get the recorded paths that were not seen by check(), call after the directory is scanned.
+        """
+        return [path for path in self.entries if path not in self.seen_paths]
+
+    def update(self, states: list[tuple[str, int, float, str | None]], cursor: sqlite3.Cursor) -> None:
+        """
+        Record the states of imported files, including the files only touched since the last import.
+        """
+        with self.touched_lock:
+            states = states + self.touched_states
+            self.touched_states = []
+        
+        cursor.executemany("INSERT OR REPLACE INTO fileManifest VALUES (?, ?, ?, ?)", states)
+    
+    def remove(self, paths: list[str], cursor: sqlite3.Cursor) -> None:
+        """
+        Remove deleted files from the manifest.
+        """
+        cursor.executemany("DELETE FROM fileManifest WHERE path = ?", ((path,) for path in paths))
@@ -0,0 +1,225 @@
+from typing import Callable, Iterable
+from array import array
+from itertools import count
+import sqlite3
+import sys
+
+SQLITE_VARIABLE_LIMIT = 900 # the limit of service.database, which imports this module
+
+class _TransactionIds:
+    """The ids a connection read in its open transaction, see TagDictionary"""
+    __slots__ = ("token", "ids", "tags")
+
+    def __init__(self, token: int):
+        self.token = token
+        self.ids: dict[str, int] = {}
+        self.tags: dict[int, str] = {}
+
+class TagDictionary:
+    """
+    The integer ids of all tags, stored in the tagDictionary table.
+
+    The tags and completed tags of a picture are stored as BLOBs of packed little endian uint32 tag ids
+    sorted ascending, which are a fraction of the size of JSON string lists and decode without a JSON parser.
+    The tag index stores tag ids as well.
+
+    Ids are assigned by sqlite when a tag is first inserted, within the write transaction of the statement
+    that uses it, so the picture manager and the tag manager never hand out the same id for different tags.
+    The ids read so far are cached in memory and shared by every connection of the process,
+    ids and tags another process added since are looked up in the database on a miss.
+
+    Ids read by a connection with an open transaction may be rolled back, after which sqlite gives them to other tags.
+    They are kept apart for that connection and only join the shared cache once the transaction committed.
+    The transaction marks itself with a token row in a temp table, the row is gone after a rollback
+    and missing from any other connection, so the ids are never used outside of the transaction that read them.
+    """
+    _tokens = count(1)
+
+    def __init__(self, cursor: sqlite3.Cursor, connect: Callable[[], sqlite3.Connection]):
+        """
+        Parameters:
+        cursor (sqlite3.Cursor): The cursor the dictionary is loaded with.
+        connect (Callable): Opens a connection to look up ids another process added when no cursor is at hand.
+        """
+        self.ids: dict[str, int] = {}
+        self.tags: dict[int, str] = {}
+        self.transactions: dict[int, _TransactionIds] = {} # by id() of the connection, connections cannot be weakly referenced
+        self.connect = connect
+        self._add(cursor.execute("SELECT id, tag FROM tagDictionary").fetchall(), cursor.connection)
+
+    @staticmethod
+    def create_table(cursor: sqlite3.Cursor) -> None:
+        cursor.execute(
+            '''CREATE TABLE tagDictionary (
+                id INTEGER PRIMARY KEY,
+                tag TEXT UNIQUE
+            )'''
+        )
+
+    @staticmethod
+    def pack(tag_ids: Iterable[int]) -> bytes:
+        """Pack tag ids into the BLOB stored in the database"""
+        packed = array("I", tag_ids)
+        if sys.byteorder == "big":
+            packed.byteswap()
+        return packed.tobytes()
+
+    @staticmethod
+    def unpack(blob: bytes | None) -> array:
+        """Unpack a BLOB of tag ids, NULL unpacks to no ids"""
+        tag_ids = array("I")
+        if blob:
+            tag_ids.frombytes(blob)
+            if sys.byteorder == "big":
+                tag_ids.byteswap()
+        return tag_ids
+
+    def _get_transaction(self, connection: sqlite3.Connection, create: bool = False) -> _TransactionIds | None:
+        """
+        Get the ids read in the open transaction of connection.
+        The ids of a committed transaction are moved to the cache, the ids of a rolled back one are dropped.
+        """
+        transaction = self.transactions.get(id(connection))
+        if transaction is not None:
+            try:
+                marked = connection.execute("SELECT 1 FROM temp.tagDictionaryTransaction WHERE token = ?", (transaction.token,)).fetchone()
+            except sqlite3.OperationalError: # the temp table was rolled back or belongs to a closed connection with the same id()
+                marked = None
+            if marked and connection.in_transaction:
+                return transaction
+            
+            del self.transactions[id(connection)]
+            if marked:
+                self.ids.update(transaction.ids)
+                self.tags.update(transaction.tags)
+        
+        if not create or not connection.in_transaction:
+            return None
+        transaction = _TransactionIds(next(self._tokens))
+        connection.execute("CREATE TEMP TABLE IF NOT EXISTS tagDictionaryTransaction (token INTEGER PRIMARY KEY)")
+        connection.execute("INSERT INTO temp.tagDictionaryTransaction VALUES (?)", (transaction.token,))
+        self.transactions[id(connection)] = transaction
+        return transaction
+
+    def _add(self, rows: Iterable[tuple[int, str]], connection: sqlite3.Connection) -> dict[str, int]:
+        """Add the ids of rows read with connection to the cache, or to its transaction if one is open"""
+        ids = {tag: tag_id for tag_id, tag in rows}
+        if connection.in_transaction:
+            transaction = self._get_transaction(connection, create=True)
+            transaction.ids.update(ids)
+            transaction.tags.update((tag_id, tag) for tag, tag_id in ids.items())
+        else:
+            self.ids.update(ids)
+            self.tags.update((tag_id, tag) for tag, tag_id in ids.items())
+        return ids
+
+    def _select_tags(self, tags: list[str], cursor: sqlite3.Cursor) -> dict[str, int]:
+        """Read the ids of tags from the database"""
+        ids = {}
+        for i in range(0, len(tags), SQLITE_VARIABLE_LIMIT):
+            chunk = tags[i:i + SQLITE_VARIABLE_LIMIT]
+            cursor.execute(f"SELECT id, tag FROM tagDictionary WHERE tag IN ({', '.join('?' * len(chunk))})", chunk)
+            ids.update(self._add(cursor.fetchall(), cursor.connection))
+        return ids
+
+    def _select_ids(self, tag_ids: Iterable[int], cursor: sqlite3.Cursor = None) -> dict[int, str]:
+        """
+        Read the tags of ids another process or the open transaction of cursor added.
+        Tags are read with cursor, or a connection of their own without one.
+        """
+        tag_ids = sorted(set(tag_ids))
+        tags = {}
+        if cursor is not None:
+            transaction = self._get_transaction(cursor.connection)
+            if transaction is not None:
+                tags = {tag_id: transaction.tags[tag_id] for tag_id in tag_ids if tag_id in transaction.tags}
+                tag_ids = [tag_id for tag_id in tag_ids if tag_id not in tags]
+        
+        connection = self.connect() if cursor is None else cursor.connection
+        try:
+            for i in range(0, len(tag_ids), SQLITE_VARIABLE_LIMIT):
+                chunk = tag_ids[i:i + SQLITE_VARIABLE_LIMIT]
+                rows = connection.execute(f"SELECT id, tag FROM tagDictionary WHERE id IN ({', '.join('?' * len(chunk))})", chunk).fetchall()
+                tags.update((tag_id, tag) for tag, tag_id in self._add(rows, connection).items())
+        finally:
+            if cursor is None:
+                connection.close()
+        return tags
+
+    def _get_uncached_ids(self, tags: list[str], cursor: sqlite3.Cursor) -> dict[str, int]:
+        """Get the ids of tags missing from the cache, from the open transaction of cursor or the database"""
+        ids = {}
+        transaction = self._get_transaction(cursor.connection)
+        if transaction is not None:
+            ids = {tag: transaction.ids[tag] for tag in tags if tag in transaction.ids}
+            tags = [tag for tag in tags if tag not in ids]
+        if tags:
+            ids.update(self._select_tags(tags, cursor))
+        return ids
+
+    def get_id(self, tag: str, cursor: sqlite3.Cursor = None) -> int | None:
+        """Get the id of a tag, None if the tag was never stored"""
+        return self.get_ids([tag], cursor).get(tag)
+
+    def get_ids(self, tags: Iterable[str], cursor: sqlite3.Cursor = None) -> dict[str, int]:
+        """
+        Get the ids of the stored tags among tags, without adding the others.
+        Tags missing from the cache are looked up with cursor, or a connection of their own without one.
+        """
+        tags = list(tags)
+        ids = {tag: self.ids[tag] for tag in tags if tag in self.ids}
+        missing_tags = [tag for tag in tags if tag not in ids]
+        if missing_tags:
+            if cursor is None:
+                connection = self.connect()
+                try:
+                    ids.update(self._select_tags(missing_tags, connection.cursor()))
+                finally:
+                    connection.close()
+            else:
+                ids.update(self._get_uncached_ids(missing_tags, cursor.connection.cursor()))
+        
+        return ids
+
+    def intern(self, tags: Iterable[str], cursor: sqlite3.Cursor) -> list[int]:
+        """
+        Get the ids of tags, tags seen for the first time are added to the dictionary.
+        """
+        tags = list(tags)
+        tag_ids = list(map(self.ids.get, tags))
+        if None not in tag_ids:
+            return tag_ids
+
+        # a cursor of its own, cursor may be in the middle of an executemany encoding its rows.
+        # The insert takes the write lock, so the ids read back are the ones committed with the rows using them
+        dictionary_cursor = cursor.connection.cursor()
+        missing_tags = list({tag for tag, tag_id in zip(tags, tag_ids) if tag_id is None})
+        ids = self._get_uncached_ids(missing_tags, dictionary_cursor)
+        new_tags = [tag for tag in missing_tags if tag not in ids]
+        if new_tags:
+            dictionary_cursor.executemany("INSERT OR IGNORE INTO tagDictionary (tag) VALUES (?)", ((tag,) for tag in new_tags))
+            ids.update(self._select_tags(new_tags, dictionary_cursor))
+        return [ids[tag] if tag_id is None else tag_id for tag, tag_id in zip(tags, tag_ids)]
+
+    def encode(self, tags: Iterable[str], cursor: sqlite3.Cursor) -> bytes:
+        """Encode the tags of a picture as the BLOB stored in the database"""
+        return self.pack(sorted(set(self.intern(tags, cursor))))
+
+    def get_tag(self, tag_id: int, cursor: sqlite3.Cursor = None) -> str:
+        """
+        Get the tag of an id, ids added by another process are read from the database.
+        Ids added in the open transaction of a connection are only found with a cursor of that connection.
+        """
+        tag = self.tags.get(tag_id)
+        if tag is None:
+            tag = self._select_ids([tag_id], cursor)[tag_id]
+        return tag
+
+    def decode(self, blob: bytes | None, cursor: sqlite3.Cursor = None) -> list[str]:
+        """Decode a BLOB of tag ids into tags, see get_tag"""
+        tag_ids = self.unpack(blob)
+        try:
+            return list(map(self.tags.__getitem__, tag_ids))
+        except KeyError:
+            tags = self._select_ids((tag_id for tag_id in tag_ids if tag_id not in self.tags), cursor)
+            return [self.tags[tag_id] if tag_id in self.tags else tags[tag_id] for tag_id in tag_ids]
@@ -84,6 +84,9 @@ class TagTree:
         """Initialize the TagTree object from the data in tagTree.json file"""
         self.tag_dict = {} #a dictionary of all tag objects
         self.file_path = tag_tree_file
+        self.version = 0 # increased on every change of the tree structure or synonyms
+        self.changes: list[tuple] = [] # operations since the last clear_changes, see get_changed_tags
+        self.invalidate_closure()
         self.load_tag_tree(tag_tree_file)
         
     def build_tree(self, tag_tree_data: dict[str, dict], tag_data: dict[str, str|list], parent=None) -> Tag:
@@ -109,79 +112,141 @@ class TagTree:
 
         return new_tag
 
-    def get_sub_tags(self, tag: str, include_synonyoms = False) -> set[str]:
+    def invalidate_closure(self) -> None:
+        """
+        Drop the ancestor and descendant closures, they are rebuilt on the next lookup.
+        Must be called after every change of sub tags or synonyms.
+        """
+        self.version += 1
+        self._descendants: dict[str, frozenset[str]] = None
+        self._descendants_with_synonyms: dict[str, frozenset[str]] = None
+        self._parent_tag_dict: dict[str, frozenset[str]] = None
+        self._parent_tag_dict_with_synonyms: dict[str, frozenset[str]] = None
+        self._ancestors: dict[str, frozenset[str]] = None
+    
+    def _build_closure(self) -> None:
+        """
+        Build the ancestor and descendant closures of all tags in one pass over the tag DAG.
+
+        Every tag is visited once, the closure of a tag is assembled from the closures of its sub tags
+        (descendants) or its parents (ancestors), so tags with several parents are not walked repeatedly.
+        """
+        descendants = {}
+        descendants_with_synonyms = {}
+
+        def collect_descendants(tag: Tag) -> None:
+            if tag.name in descendants:
+                return
+            
+            descendants[tag.name] = frozenset() # guard against cycles
+            sub_tags = set()
+            sub_tags_with_synonyms = set(tag.synonyms)
+            for sub_tag in tag.sub_tags.values():
+                collect_descendants(sub_tag)
+                sub_tags.add(sub_tag.name)
+                sub_tags.update(descendants[sub_tag.name])
+                sub_tags_with_synonyms.add(sub_tag.name)
+                sub_tags_with_synonyms.update(descendants_with_synonyms[sub_tag.name])
+            
+            descendants[tag.name] = frozenset(sub_tags)
+            descendants_with_synonyms[tag.name] = frozenset(sub_tags_with_synonyms)
+        
+        for tag in self.tag_dict.values():
+            collect_descendants(tag)
+        
+        # parents are taken from the sub tags of the tags reachable from the root, like the tree is displayed
+        parents: dict[str, list[Tag]] = {self.root.name: []}
+        stack = [self.root]
+        while stack:
+            tag = stack.pop()
+            for sub_tag in tag.sub_tags.values():
+                if sub_tag.name not in parents:
+                    parents[sub_tag.name] = []
+                    stack.append(sub_tag)
+                parents[sub_tag.name].append(tag)
+        
+        ancestors = {}
+
+        def collect_ancestors(name: str) -> frozenset[str]:
+            if name in ancestors:
+                return ancestors[name]
+            
+            ancestors[name] = frozenset() # guard against cycles
+            parent_nodes = set()
+            for parent in parents[name]:
+                parent_nodes.update(collect_ancestors(parent.name))
+                parent_nodes.add(parent.name)
+            
+            ancestors[name] = frozenset(parent_nodes)
+            return ancestors[name]
+        
+        parent_tag_dict = {}
+        synonym_parent_dict: dict[str, set[str]] = {}
+        for name in parents:
+            tag = self.tag_dict[name]
+            collect_ancestors(name)
+            if not tag.is_tag:
+                continue
+            
+            parent_tag_dict[name] = frozenset(parent for parent in ancestors[name] if self.tag_dict[parent].is_tag)
+            for synonym in tag.synonyms: # synonyms are regarded as sub tags of the tag
+                if synonym not in synonym_parent_dict:
+                    synonym_parent_dict[synonym] = set()
+                synonym_parent_dict[synonym].update(parent_tag_dict[name])
+                synonym_parent_dict[synonym].add(name)
+        
+        parent_tag_dict_with_synonyms = parent_tag_dict.copy()
+        for synonym, parent_tags in synonym_parent_dict.items():
+            parent_tag_dict_with_synonyms[synonym] = parent_tag_dict.get(synonym, frozenset()) | parent_tags
+        
+        self._descendants = descendants
+        self._descendants_with_synonyms = descendants_with_synonyms
+        self._parent_tag_dict = parent_tag_dict
+        self._parent_tag_dict_with_synonyms = parent_tag_dict_with_synonyms
+        self._ancestors = ancestors
+
+    def get_sub_tags(self, tag: str, include_synonyoms = False) -> frozenset[str]:
         """
         Get a set of all subTags of a Tag recursively
         """
         if tag not in self.tag_dict:
             raise ValueError(f"tag {tag} not found")
 
-        sub_tags = set(self.tag_dict[tag].sub_tags.keys())
-        all_sub_tags = sub_tags.copy()
-
+        if self._descendants is None:
+            self._build_closure()
+        
         if include_synonyoms:
-            all_sub_tags.update(self.tag_dict[tag].synonyms)
-
-        for subTag in sub_tags:
-            all_sub_tags.update(self.get_sub_tags(subTag, include_synonyoms))
-
-        return all_sub_tags
+            return self._descendants_with_synonyms[tag]
+        
+        return self._descendants[tag]
     
-    def get_all_parent_tag(
-            self, 
-            tag: Tag = None, 
-            parent: set = None, 
-            parent_dict: dict[str, set] = None, 
-            include_synonyms: bool = False
-        ) -> dict[str, set[str]]:
+    def get_all_parent_tag(self, include_synonyms: bool = False) -> dict[str, frozenset[str]]:
         """
         Get all parent tags of tags in the TagTree
 
+        The returned dictionary is shared until the tree changes and must not be modified.
+
         return: (dict) 
             key: (str) tag name
-            value: (set) set of parent tags
+            value: (frozenset) set of parent tags
         """
-        if parent_dict is None:
-            parent_dict = {}
-        else:
-            parent_dict = parent_dict.copy()
+        if self._descendants is None:
+            self._build_closure()
         
-        if parent is None:
-            parent = set()
-        else:
-            parent = parent.copy()
-
-        if tag is None:
-            tag = self.root
-
-        if not tag.is_tag:
-            parent_set = parent
-        else:
-            # Add the parent tag to the parent set
-            parent_set = parent.copy()
-
-            # Add the parent set to the parent_dict
-            if tag.name in parent_dict:
-                parent_dict[tag.name].update(parent_set)
-            else:
-                parent_dict[tag.name] = parent_set.copy()
-
-            # Add the parent set to the parent_dict for each synonym
-            if include_synonyms:
-                for synonym in tag.synonyms:
-                    if synonym in parent_dict:
-                        parent_dict[synonym].update(parent_set)
-                        parent_dict[synonym].add(tag.name) # Synonyms are regarded as sub tags of the tag
-                    else:
-                        parent_dict[synonym] = parent_set.copy()
-                        parent_dict[synonym].add(tag.name)
-
-            parent_set.add(tag.name)
-
-        for sub_tag in tag.sub_tags.values():
-            parent_dict.update(self.get_all_parent_tag(sub_tag, parent_set, parent_dict, include_synonyms))
+        if include_synonyms:
+            return self._parent_tag_dict_with_synonyms
+        
+        return self._parent_tag_dict
 
-        return parent_dict
+    def get_ancestors(self, tag: str) -> frozenset[str]:
+        """
+        Get every node above a tag in the tree, unlike get_all_parent_tag this includes the category nodes and the root.
+        Tags that are not reachable from the root have no ancestors.
+        """
+        if self._descendants is None:
+            self._build_closure()
+        
+        return self._ancestors.get(tag, frozenset())
 
     def add_new_tag(self, new_tag: str, parent_tag: str) -> bool:
         """
@@ -200,6 +265,8 @@ class TagTree:
         self.tag_dict[new_tag.name] = new_tag
         self.tag_dict[parent_tag].add_sub_tag(new_tag)
         self.tag_dict[new_tag.name].add_parent_tag(parent_tag)
+        self.invalidate_closure()
+        self.changes.append(("add_new", new_tag.name, parent_tag))
         return True
 
     def delete_tag(self, tag: str, parent_tag: str) -> bool:
@@ -212,6 +279,8 @@ class TagTree:
         
         self.tag_dict[parent_tag].sub_tags.pop(tag)
         self.tag_dict[tag].parent.remove(parent_tag)
+        self.invalidate_closure()
+        self.changes.append(("delete", tag, parent_tag))
 
         return True
 
@@ -236,22 +305,61 @@ class TagTree:
         
         self.tag_dict[tag].add_parent_tag(parent_tag)
         self.tag_dict[parent_tag].add_sub_tag(self.tag_dict[tag])
+        self.invalidate_closure()
+        self.changes.append(("add_parent", tag, parent_tag))
         return True
+    
+    def add_synonym(self, tag: str, synonym: str) -> None:
+        """Add a synonym to a existing tag, tag must be in the TagTree"""
+        self.tag_dict[tag].add_synonym(synonym)
+        self.invalidate_closure()
+        self.changes.append(("add_synonym", tag, synonym))
+        
+    def remove_synonym(self, tag: str, synonym: str) -> None:
+        """Remove a synonym from a existing tag, tag must be in the TagTree"""
+        self.tag_dict[tag].remove_synonym(synonym)
+        self.invalidate_closure()
+        self.changes.append(("remove_synonym", tag, synonym))
+        
+    def set_synonyms(self, tag: str, synonyms: set[str]) -> None:
+        """Replace the synonyms of a existing tag, tag must be in the TagTree"""
+        old_synonyms = self.tag_dict[tag].synonyms
+        self.tag_dict[tag].synonyms = synonyms
+        self.invalidate_closure()
+        self.changes.append(("set_synonyms", tag, frozenset(old_synonyms ^ synonyms)))
+
+    def get_changed_tags(self) -> set[str]:
+        """
+        Get the tags whose completion may have changed by the operations in the change log.
+
+        Adding, deleting or moving a tag under a parent (a move is logged as add_parent and delete) changes the parents
+        of the tag and of everything below it, so the tag, its sub tags and all of their synonyms are changed.
+        A synonym edit only changes the synonyms that were added or removed.
+        Pictures carrying none of these tags keep their completed tags and tag index entries.
+        """
+        changed_tags = set()
+        for operation, tag, argument in self.changes:
+            if operation in ("add_synonym", "remove_synonym"):
+                changed_tags.add(argument)
+            elif operation == "set_synonyms":
+                changed_tags.update(argument)
+            else:
+                changed_tags.add(tag)
+                if tag in self.tag_dict:
+                    changed_tags.update(self.get_sub_tags(tag, include_synonyoms=True))
+
+        return changed_tags
+
+    def clear_changes(self) -> None:
+        """Clear the change log, called once the changes were reindexed"""
+        self.changes = []
 
     def is_sub_tag(self, tag: str, sub_tag: str) -> bool:
         """Check if subTag is a sub tag of tag"""
         if tag not in self.tag_dict:
             return False
 
-        if sub_tag in self.tag_dict[tag].sub_tags:
-            return True
-
-        sub_tags = self.tag_dict[tag].sub_tags.keys()
-        for sub_tag_name in sub_tags:
-            if self.is_sub_tag(sub_tag_name, sub_tag):
-                return True
-
-        return False
+        return sub_tag in self.get_sub_tags(tag)
     
     def to_dict(self) -> dict:
         """Convert the TagTree object to a json serializable dictionary"""
@@ -274,6 +382,7 @@ class TagTree:
         """
         tag_tree_data = load_json(tag_tree_file)
         self.root = self.build_tree(tag_tree_data, tag_tree_data[root])
+        self.invalidate_closure()
         
     def save_tree(self) -> None:
         """Save the TagTree object to the original file"""
@@ -0,0 +1,184 @@
+from typing import TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor
+import threading
+import hashlib
+import os
+
+from PIL import Image
+
+from tools.setting import THUMBNAIL_CACHE_DIRECTORY, THUMBNAIL_CACHE_MAX_BYTES, THUMBNAIL_CACHE_EVICT_BYTES, THUMBNAIL_SIZE
+from tools.log import Log
+if TYPE_CHECKING:
+    from service.database import PicFile
+
+def create_thumbnail(source_path: str, thumbnail_path: str, size: tuple[int, int]) -> bool:
+    """
+    Create a JPEG thumbnail fitting into size.
+
+    JPEGs are decoded at a reduced scale with draft(), so large pictures are never decoded at full resolution.
+
+    Returns:
+    bool: Whether the thumbnail was created.
+    """
+    try:
+        with Image.open(source_path) as img:
+            img.draft("RGB", size)
+            img.thumbnail(size, Image.Resampling.LANCZOS)
+            if img.mode != "RGB":
+                img = img.convert("RGB")
+            
+            os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+            temp_path = thumbnail_path + ".tmp"
+            img.save(temp_path, "JPEG", quality=85)
+            os.replace(temp_path, thumbnail_path) # never leave a half written thumbnail behind
+        return True
+    except Exception:
+        return False
+
+class ThumbnailCache:
+    """
+    Persistent store of picture thumbnails.
+
+    Thumbnails are addressed by pid, num and the mtime of the picture file, so a modified picture gets a new thumbnail
+    and the old one is eventually evicted. The cache is kept below max_bytes by deleting the least recently read thumbnails,
+    reading a thumbnail refreshes its mtime.
+
+    Eviction walks the whole cache directory, it runs after every import and, for thumbnails created on demand
+    by the picture browser threads, once evict_bytes were written since the last eviction.
+    """
+    def __init__(
+            self, 
+            directory: str = THUMBNAIL_CACHE_DIRECTORY, 
+            max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES, 
+            size: tuple[int, int] = THUMBNAIL_SIZE,
+            evict_bytes: int = THUMBNAIL_CACHE_EVICT_BYTES
+        ):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = size
+        self.evict_bytes = evict_bytes
+        self.written_bytes = 0 # bytes of thumbnails created on demand since the last eviction
+        self.written_lock = threading.Lock()
+        self.evict_lock = threading.Lock()
+    
+    def get_thumbnail_path(self, pic_file: 'PicFile') -> str:
+        """
+        Get the path the thumbnail of a picture is stored at.
+        """
+        mtime = os.stat(os.path.join(pic_file.directory, pic_file.file_name)).st_mtime_ns
+        key = hashlib.sha1(f"{pic_file.pid}_{pic_file.num}_{mtime}_{self.size[0]}x{self.size[1]}".encode()).hexdigest()
+        return os.path.join(self.directory, key[:2], key + ".jpg")
+    
+    def get(self, pic_file: 'PicFile', create: bool = True) -> str | None:
+        """
+        Get the thumbnail of a picture, creating it if it is missing and create is True.
+
+        Returns:
+        str: The path to the thumbnail, or None if the picture has no thumbnail and none could be created.
+        """
+        try:
+            thumbnail_path = self.get_thumbnail_path(pic_file)
+        except OSError: # the picture file is gone
+            return None
+        
+        try:
+            os.utime(thumbnail_path)
+            return thumbnail_path
+        except FileNotFoundError: # not created yet or just evicted
+            pass
+        
+        source_path = os.path.join(pic_file.directory, pic_file.file_name)
+        if create and create_thumbnail(source_path, thumbnail_path, self.size):
+            self._add_written_bytes(thumbnail_path)
+            return thumbnail_path
+        
+        return None
+    
+    def _add_written_bytes(self, thumbnail_path: str) -> None:
+        """Count a thumbnail created on demand and evict once evict_bytes were written since the last eviction"""
+        try:
+            size = os.path.getsize(thumbnail_path)
+        except OSError:
+            return
+        
+        with self.written_lock:
+            self.written_bytes += size
+            if self.written_bytes < self.evict_bytes:
+                return
+            self.written_bytes = 0
+        
+        # one thread evicts, the others keep loading thumbnails instead of waiting for the walk
+        if self.evict_lock.acquire(blocking=False):
+            try:
+                self.evict()
+            finally:
+                self.evict_lock.release()
+    
+    def generate(self, pic_files: list['PicFile'], workers: int = 1) -> int:
+        """
+        Create the missing thumbnails of pictures in a process pool, then evict old thumbnails.
+
+        Returns:
+        int: The number of created thumbnails.
+        """
+        jobs = []
+        for pic_file in pic_files:
+            try:
+                thumbnail_path = self.get_thumbnail_path(pic_file)
+            except OSError:
+                continue
+            
+            if not os.path.exists(thumbnail_path):
+                jobs.append((os.path.join(pic_file.directory, pic_file.file_name), thumbnail_path))
+        
+        created = 0
+        if jobs:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                results = pool.map(
+                    create_thumbnail, 
+                    [source for source, target in jobs], 
+                    [target for source, target in jobs], 
+                    [self.size] * len(jobs),
+                    chunksize=32
+                )
+                created = sum(results)
+        
+        self.evict()
+        return created
+    
+    def evict(self) -> None:
+        """
+        Delete the least recently read thumbnails until the cache is smaller than max_bytes.
+        """
+        if not os.path.exists(self.directory):
+            return
+        
+        thumbnails = []
+        total_bytes = 0
+        for root, dirs, files in os.walk(self.directory):
+            for file in files:
+                try:
+                    stat = os.stat(os.path.join(root, file))
+                except FileNotFoundError: # a temp file renamed by a thread creating a thumbnail
+                    continue
+                thumbnails.append((stat.st_mtime, stat.st_size, os.path.join(root, file)))
+                total_bytes += stat.st_size
+        
+        if total_bytes <= self.max_bytes:
+            return
+        
+        thumbnails.sort()
+        evicted = 0
+        target_bytes = self.max_bytes * 0.9 # leave some room so the next import does not evict again right away
+        for mtime, size, thumbnail_path in thumbnails:
+            if total_bytes <= target_bytes:
+                break
+            
+            try:
+                os.remove(thumbnail_path)
+            except FileNotFoundError:
+                pass
+            total_bytes -= size
+            evicted += 1
+        
+        Log.info(f"Evicted {evicted} thumbnails")
@@ -0,0 +1,27 @@
+import os
+
+# number of processes parsing files when importing pictures
+INGEST_WORKERS = max(1, (os.cpu_count() or 1) - 1)
+# number of files handed to a worker process at once
+INGEST_BATCH_SIZE = 64
+# number of rows written before the import transaction is committed
+INGEST_COMMIT_INTERVAL = 5000
+# compare content hashes of files whose mtime changed but size did not when re-importing
+INGEST_VERIFY_HASH = False
+# bounds of the tag pid caches of the picture browser
+TAG_INDEX_CACHE_MAX_ENTRIES = 4096
+TAG_INDEX_CACHE_MAX_BYTES = 64 * 1024**2
+# persistent thumbnail store of the picture browser, thumbnails fit into the image label of a picture frame
+THUMBNAIL_CACHE_DIRECTORY = "thumbnail_cache"
+THUMBNAIL_CACHE_MAX_BYTES = 2 * 1024**3
+THUMBNAIL_SIZE = (232, 218)
+# thumbnails created while browsing are evicted once this many bytes were written since the last eviction
+THUMBNAIL_CACHE_EVICT_BYTES = 64 * 1024**2
+# number of threads decoding thumbnails for the picture browser
+PICTURE_LOADER_WORKERS = 4
+# number of decoded thumbnails the picture grid keeps in memory
+PICTURE_GRID_THUMBNAIL_ENTRIES = 512
+# number of pictures read from the database per page of the picture grid
+PICTURE_GRID_PAGE_SIZE = 120
+# number of screens below the visible rows of the picture grid whose thumbnails are loaded ahead
+PICTURE_GRID_PREFETCH_SCREENS = 2
@@ -17,12 +17,14 @@ from PySide6.QtGui import (QAction, QBrush, QColor, QConicalGradient,
     QPainter, QPalette, QPixmap, QRadialGradient,
     QTransform)
 from PySide6.QtWidgets import (QApplication, QCheckBox, QComboBox, QDoubleSpinBox,
-    QFrame, QGridLayout, QGroupBox, QHBoxLayout,
-    QHeaderView, QLabel, QLineEdit, QMainWindow,
-    QMenu, QMenuBar, QPushButton, QScrollArea,
-    QSizePolicy, QSlider, QSpacerItem, QStatusBar,
-    QTabWidget, QToolBox, QTreeWidget, QTreeWidgetItem,
-    QVBoxLayout, QWidget)
+    QFrame, QGroupBox, QHBoxLayout, QHeaderView,
+    QLabel, QLineEdit, QMainWindow, QMenu,
+    QMenuBar, QPushButton, QScrollArea, QSizePolicy,
+    QSlider, QSpacerItem, QStatusBar, QTabWidget,
+    QToolBox, QTreeWidget, QTreeWidgetItem, QVBoxLayout,
+    QWidget)
+
+from component.widget.picture_grid_view import PictureGridView
 
 class Ui_MainWindow(object):
     def setupUi(self, MainWindow):
@@ -389,20 +391,10 @@ class Ui_MainWindow(object):
 
         self.verticalLayout_2.addWidget(self.scrollArea)
 
-        self.picBrowseScrollArea = QScrollArea(self.centralwidget)
-        self.picBrowseScrollArea.setObjectName(u"picBrowseScrollArea")
-        self.picBrowseScrollArea.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
-        self.picBrowseScrollArea.setWidgetResizable(True)
-        self.picBrowseContentWidget = QWidget()
-        self.picBrowseContentWidget.setObjectName(u"picBrowseContentWidget")
-        self.picBrowseContentWidget.setGeometry(QRect(0, 0, 662, 513))
-        sizePolicy.setHeightForWidth(self.picBrowseContentWidget.sizePolicy().hasHeightForWidth())
-        self.picBrowseContentWidget.setSizePolicy(sizePolicy)
-        self.picDisplayLayout = QGridLayout(self.picBrowseContentWidget)
-        self.picDisplayLayout.setObjectName(u"picDisplayLayout")
-        self.picBrowseScrollArea.setWidget(self.picBrowseContentWidget)
-
-        self.verticalLayout_2.addWidget(self.picBrowseScrollArea)
+        self.picBrowseListView = PictureGridView(self.centralwidget)
+        self.picBrowseListView.setObjectName(u"picBrowseListView")
+
+        self.verticalLayout_2.addWidget(self.picBrowseListView)
 
 
         self.horizontalLayout_4.addLayout(self.verticalLayout_2)
@@ -0,0 +1,64 @@
+from typing import Any, Callable, Hashable
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    A least recently used cache bounded by number of entries and by memory.
+
+    The memory of an entry is measured with sizeof when it is put,
+    the least recently used entries are evicted until both bounds hold again.
+    """
+    def __init__(self, max_entries: int, max_bytes: int = None, sizeof: Callable[[Any], int] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.entries: OrderedDict[Hashable, tuple[Any, int]] = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        """Check for a key without counting a hit or miss or refreshing the entry"""
+        return key in self.entries
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Get a value and mark it as most recently used"""
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Insert or replace a value, then evict entries over the bounds"""
+        size = self.sizeof(value) if self.sizeof else 0
+        if key in self.entries:
+            self.nbytes -= self.entries.pop(key)[1]
+
+        self.entries[key] = (value, size)
+        self.nbytes += size
+        while len(self.entries) > self.max_entries or (self.max_bytes is not None and self.nbytes > self.max_bytes and len(self.entries) > 1):
+            evicted_key, (evicted_value, evicted_size) = self.entries.popitem(last=False)
+            self.nbytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self.entries.clear()
+        self.nbytes = 0
+
+    def stats(self) -> dict[str, int]:
+        """Get the hit, miss and eviction counts and the current size of the cache"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'entries': len(self.entries),
+            'bytes': self.nbytes
+        }
@@ -0,0 +1,26 @@
+from PySide6.QtGui import QImage, QImageReader
+from PySide6.QtCore import QSize, Qt
+
+def read_scaled_image(file_path: str, size: tuple[int, int]) -> QImage:
+    """
+    Decode a picture directly at a resolution fitting into size, keeping its aspect ratio.
+
+    QImageReader.setScaledSize lets the JPEG decoder skip most of the work for large pictures,
+    other formats are decoded at full size and scaled by the reader.
+    QImage is safe to use outside the GUI thread, so this runs in worker threads.
+
+    Parameters:
+    file_path (str): The path to the picture file.
+    size (tuple): The width and height the picture has to fit into.
+
+    Returns:
+    QImage: The decoded picture, a null QImage if the file can not be read.
+    """
+    reader = QImageReader(file_path)
+    reader.setAutoTransform(True)
+    
+    original_size = reader.size()
+    if original_size.isValid() and (original_size.width() > size[0] or original_size.height() > size[1]):
+        reader.setScaledSize(original_size.scaled(QSize(*size), Qt.AspectRatioMode.KeepAspectRatio))
+    
+    return reader.read()
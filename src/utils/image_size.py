@@ -0,0 +1,103 @@
+from typing import BinaryIO
+from PIL import Image
+import struct
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+GIF_SIGNATURES = (b"GIF87a", b"GIF89a")
+# SOFn markers carry the frame size, C4 (DHT), C8 (JPG) and CC (DAC) share the range but do not
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# markers without a length field
+JPEG_STANDALONE_MARKERS = {0x01, 0xD0, 0xD1, 0xD2, 0xD3, 0xD4, 0xD5, 0xD6, 0xD7, 0xD8}
+
+def read_image_size_with_pil(file_path: str) -> tuple[int, int]:
+    """
+    Get the resolution of a picture by opening it with PIL.
+    """
+    with Image.open(file_path) as img:
+        return img.size
+
+def probe_image_size(file_path: str) -> tuple[int, int]:
+    """
+    Get the resolution of a picture from its header.
+
+    PNG, JPEG and GIF headers are parsed directly, which only reads the first few KB of the file.
+    Unknown formats and files with a corrupt header fall back to PIL.
+
+    Parameters:
+    file_path (str): The path to the picture file.
+
+    Returns:
+    tuple: The width and height of the picture.
+    """
+    with open(file_path, "rb") as file:
+        header = file.read(26)
+        try:
+            if header.startswith(PNG_SIGNATURE):
+                resolution = _read_png_size(header)
+            elif header.startswith(b"\xff\xd8"):
+                file.seek(2)
+                resolution = _read_jpeg_size(file)
+            elif header.startswith(GIF_SIGNATURES):
+                resolution = _read_gif_size(header)
+            else:
+                resolution = None
+        except struct.error: # truncated header
+            resolution = None
+    
+    if resolution is None or resolution[0] <= 0 or resolution[1] <= 0:
+        return read_image_size_with_pil(file_path)
+    
+    return resolution
+
+def _read_png_size(header: bytes) -> tuple[int, int] | None:
+    """
+    Read the size from the IHDR chunk, which must be the first chunk after the signature.
+    """
+    if header[12:16] != b"IHDR":
+        return None
+    
+    return struct.unpack(">II", header[16:24])
+
+def _read_gif_size(header: bytes) -> tuple[int, int]:
+    """
+    Read the size from the logical screen descriptor.
+    """
+    return struct.unpack("<HH", header[6:10])
+
+def _read_jpeg_size(file: BinaryIO) -> tuple[int, int] | None:
+    """
+    Walk the JPEG segments after SOI until the first SOFn segment and read the frame size from it.
+    Segments before the frame header (APPn, DQT, ...) are skipped by their length, so the data read
+    stays small even when the file carries a large EXIF thumbnail.
+    """
+    while True:
+        byte = file.read(1)
+        if not byte:
+            return None
+        
+        if byte != b"\xff":
+            return None
+        
+        marker = file.read(1)
+        while marker == b"\xff": # fill bytes
+            marker = file.read(1)
+        
+        if not marker:
+            return None
+        
+        marker = marker[0]
+        if marker in JPEG_STANDALONE_MARKERS:
+            continue
+        
+        if marker == 0xD9: # EOI before any frame header
+            return None
+        
+        length = struct.unpack(">H", file.read(2))[0]
+        if length < 2:
+            return None
+        
+        if marker in JPEG_SOF_MARKERS:
+            precision, height, width = struct.unpack(">BHH", file.read(5))
+            return width, height
+        
+        file.seek(length - 2, 1)
@@ -1,26 +1,48 @@
-from PIL import Image
+from typing import Callable
 import os
-from linecache import getline
 import json
 import csv
 
-def parse_picture(file_path: str) -> tuple:
+from utils.image_size import probe_image_size
+
+IMAGE_EXTENSIONS = (".jpg", ".png", ".jpeg", ".gif")
+PARSABLE_EXTENSIONS = (".txt", ".csv") + IMAGE_EXTENSIONS
+
+def parse_picture(file_path: str, probe: Callable[[str], tuple[int, int]] = probe_image_size) -> tuple:
     """
     Extracts and returns information about a picture.
 
-    This function opens a picture file, extracts its information, and stores it in a PicData object.
+    This function reads the resolution of a picture file with probe, extracts its information, and stores it in a PicData object.
 
     Parameters:
     filePath (str): The path to the picture file.
+    probe (Callable): The function reading the resolution, the header parser by default.
 
     Returns:
     a tuple: A tuple containing the picture information.
     """
-    with Image.open(file_path) as img:# get resolution
-        resolution = img.size
+    resolution = probe(file_path)
 
     directory = os.path.dirname(file_path)
     file_name = os.path.basename(file_path)
+    pid, num, file_type = parse_file_name(file_name)
+    width = resolution[0]
+    height = resolution[1]
+    size = os.path.getsize(file_path)
+    ratio = width / height
+
+    return pid, num, directory, file_name, file_type, width, height, size, ratio
+
+def parse_file_name(file_name: str) -> tuple[int, int, str]:
+    """
+    Extracts the picture id, ordinal number and file type from a picture file name.
+
+    Parameters:
+    file_name (str): The picture file name, {pid}_p{num}.{type} or {pid}.{type}.
+
+    Returns:
+    tuple: A tuple containing the pid, num and file type.
+    """
     name = file_name.split(".")# seprate the file name and file extention
     file_type = name.pop()
     name = str(name[0])
@@ -30,18 +52,17 @@ def parse_picture(file_path: str) -> tuple:
         num = 0
     else:
         num = int(parts[1])
-    width = resolution[0]
-    height = resolution[1]
-    size = os.path.getsize(file_path)
-    ratio = width / height
-
-    return pid, num, directory, file_name, file_type, width, height, size, ratio
+        
+    return pid, num, file_type
 
 def parse_metadata(file_path: str) -> tuple:
     """
     Parses a metadata file and returns a tuple.
 
-    This function reads a metadata file line by line, extracts the metadata, and stores it in a PicData object.
+    This function reads a metadata file once, line by line, and extracts the metadata from its sections.
+    The file is laid out as labelled sections: id on line 2, title on line 5, user on line 8, user id on line 11,
+    tags from line 17 up to the first empty line, the date two lines after it and the description
+    from the sixth line after it to the end of the file.
 
     Parameters:
     path (str): The path to the metadata file.
@@ -49,37 +70,63 @@ def parse_metadata(file_path: str) -> tuple:
     Returns:
     tuple: A tuple containing the metadata information.
     """
-    tags = set()
-    xRestrict = "allAges"
-    pid = int(getline(file_path, 2).strip())
-    title = getline(file_path, 5).strip()
-    user = getline(file_path, 8).strip()
-    user_id = int(getline(file_path, 11).strip())
-
-    line_num = 17
-    while True: # read tags
-        if getline(file_path, line_num) != "\n":
-            tags.add(getline(file_path, line_num).strip())
-        else:
-            if "#R-18" in tags:
-                xRestrict = "R-18"
-            elif "#R-18G" in tags:
-                xRestrict = "R-18G"
-            date = getline(file_path, line_num + 2).strip()
-            description_lines = []
-            line_num += 6
-            break
+    with open(file_path, "r", encoding="utf-8-sig") as file:
+        lines = iter(file)
+        
+        def read_line(skip: int = 0) -> str:
+            for _ in range(skip):
+                next(lines, "")
+            return next(lines, "")
+        
+        pid = int(read_line(skip=1).strip())
+        title = read_line(skip=2).strip()
+        user = read_line(skip=2).strip()
+        user_id = int(read_line(skip=2).strip())
+
+        tags = set()
+        line = read_line(skip=5)
+        while line and line != "\n": # read tags
+            tags.add(line.strip())
+            line = read_line()
+        
+        xRestrict = "allAges"
+        if "#R-18" in tags:
+            xRestrict = "R-18"
+        elif "#R-18G" in tags:
+            xRestrict = "R-18G"
         
-        line_num += 1
-    while True: # read description
-        line = getline(file_path, line_num)
-        if line:
-            description_lines.append(line)
-        else:
-            description = '\n'.join(description_lines)
-            return pid, title, list(tags), description, user, user_id, date, xRestrict
+        date = read_line(skip=1).strip()
+        read_line(skip=2) # the description starts on the fourth line after the date
+        description_lines = list(lines) # read description
         
-        line_num += 1
+    # keep the trailing newline of the last line like the previous linecache based parser did
+    if description_lines and not description_lines[-1].endswith("\n"):
+        description_lines[-1] += "\n"
+    description = '\n'.join(description_lines)
+    return pid, title, list(tags), description, user, user_id, date, xRestrict
+
+def parse_metadata_files(file_paths: list[str], errors: list[tuple[str, str]] = None) -> list[tuple]:
+    """
+    Parses several metadata files.
+
+    Parameters:
+    file_paths (list): The paths to the metadata files.
+    errors (list): If given, files that fail to parse are skipped and appended to it as (path, message) tuples,
+    otherwise the first failure is raised.
+
+    Returns:
+    list: A list of the tuples returned by parse_metadata.
+    """
+    metadata_list = []
+    for file_path in file_paths:
+        try:
+            metadata_list.append(parse_metadata(file_path))
+        except Exception as e:
+            if errors is None:
+                raise
+            errors.append((file_path, str(e)))
+            
+    return metadata_list
 
 def parse_csv(file_path: str) -> list[tuple]:
     """
@@ -126,4 +173,32 @@ def parse_csv(file_path: str) -> list[tuple]:
                 xRestrict, 
                 date, 
             ))
-    return pics
\ No newline at end of file
+    return pics
+
+def parse_file_batch(file_paths: list[str]) -> list[tuple[str, object]]:
+    """
+    Parses a batch of files and returns the parsed data of each file.
+
+    This function is the unit of work of the ingest pipeline and runs in a worker process,
+    files that fail to parse are returned as errors instead of aborting the whole batch.
+
+    Parameters:
+    file_paths (list): The paths of the files to parse.
+
+    Returns:
+    list: A list of (kind, data) tuples, kind is one of "metadata", "csv", "image" or "error".
+    """
+    errors = []
+    metadata_paths = [file_path for file_path in file_paths if file_path.endswith(".txt")]
+    results = [("metadata", metadata) for metadata in parse_metadata_files(metadata_paths, errors)]
+    for file_path in file_paths:
+        try:
+            if file_path.endswith(".csv"):
+                results.append(("csv", parse_csv(file_path)))
+            elif file_path.endswith(IMAGE_EXTENSIONS):
+                results.append(("image", parse_picture(file_path)))
+        except Exception as e:
+            errors.append((file_path, str(e)))
+    
+    results.extend(("error", error) for error in errors)
+    return results
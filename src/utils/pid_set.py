@@ -0,0 +1,105 @@
+from typing import Iterable, Iterator
+from array import array
+from itertools import chain
+from bisect import bisect_left
+import sys
+
+CONTAINER_BITS = 16
+CONTAINER_SIZE = 1 << CONTAINER_BITS
+LOW_MASK = CONTAINER_SIZE - 1
+ARRAY_LIMIT = 4096 # containers with more pids are stored as bitmaps, a bitmap takes the same 8 KB as 4096 array entries
+
+def _to_bitmap(lows: array) -> int:
+    """Convert a sorted array container to a bitmap container"""
+    bitmap = bytearray(CONTAINER_SIZE // 8)
+    for low in lows:
+        bitmap[low >> 3] |= 1 << (low & 7)
+    return int.from_bytes(bitmap, "little")
+
+def _iter_bitmap(bitmap: int) -> Iterator[int]:
+    """Iterate the set bits of a bitmap container in ascending order"""
+    bits = format(bitmap, "b")[::-1]
+    position = bits.find("1")
+    while position != -1:
+        yield position
+        position = bits.find("1", position + 1)
+
+def set_nbytes(pids: frozenset[int]) -> int:
+    """Approximate memory used by a Python set of pids with its int objects, used to bound caches"""
+    return sys.getsizeof(pids) + len(pids) * 32
+
+def _array_contains(lows: array, low: int) -> bool:
+    index = bisect_left(lows, low)
+    return index < len(lows) and lows[index] == low
+
+class PidSet:
+    """
+    An immutable, compressed set of picture ids, the storage of the cached tag postings.
+
+    Pids are split by their high 16 bits into containers, like a roaring bitmap.
+    A container holding up to ARRAY_LIMIT pids is a sorted array('H') of the low 16 bits,
+    a fuller container is a Python int used as a 65536 bit bitmap.
+    A posting of a real library takes about a tenth of the memory of a frozenset, so the cache holds ten times the tags.
+
+    PidSet has no set algebra. Pids of a real library are sparse, most containers hold a few dozen pids,
+    and an operation per container in Python was several times slower than the C loop of set.
+    Searches turn the postings they use into frozensets once and combine those.
+    """
+    __slots__ = ("_containers", "_length")
+
+    def __init__(self, pids: Iterable[int] = ()):
+        self._containers: dict[int, array | int] = {}
+        pids = sorted(set(pids))
+        start = 0
+        while start < len(pids):
+            # the pids of a container are a slice of the sorted pids, found by bisecting to the next container
+            high = pids[start] >> CONTAINER_BITS
+            end = bisect_left(pids, (high + 1) << CONTAINER_BITS, start)
+            lows = array("H", map(LOW_MASK.__and__, pids[start:end]))
+            self._containers[high] = lows if len(lows) <= ARRAY_LIMIT else _to_bitmap(lows)
+            start = end
+        self._length = len(pids)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __bool__(self) -> bool:
+        return self._length > 0
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate the pids in ascending order"""
+        return chain.from_iterable(self._iter_containers())
+
+    def _iter_containers(self) -> Iterator[Iterator[int]]:
+        for high in sorted(self._containers):
+            container = self._containers[high]
+            lows = _iter_bitmap(container) if isinstance(container, int) else container
+            yield map((high << CONTAINER_BITS).__or__, lows)
+
+    def __contains__(self, pid: int) -> bool:
+        container = self._containers.get(pid >> CONTAINER_BITS)
+        if container is None:
+            return False
+
+        low = pid & LOW_MASK
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+
+        return _array_contains(container, low)
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PidSet):
+            return self._length == other._length and self._containers == other._containers
+        if isinstance(other, (set, frozenset)):
+            return self._length == len(other) and all(pid in other for pid in self)
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"PidSet({len(self)} pids)"
+
+    def nbytes(self) -> int:
+        """Approximate memory used by the set, used to bound caches"""
+        size = sys.getsizeof(self._containers)
+        for container in self._containers.values():
+            size += sys.getsizeof(container)
+        return size
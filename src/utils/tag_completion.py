@@ -0,0 +1,60 @@
+from typing import TYPE_CHECKING, Iterable
+from functools import reduce
+from itertools import repeat
+from operator import or_
+import sqlite3
+if TYPE_CHECKING:
+    from service.tag_tree import TagTree
+    from service.tag_dictionary import TagDictionary
+
+EMPTY: frozenset[int] = frozenset()
+
+class TagCompleter:
+    """
+    Complete the tags of pictures with their parent tags.
+
+    The completion of every tag, the tag itself if it is in the tree plus all of its parent tags, is precomputed
+    over tag ids both as a set and as an int bitmap. The bitmap of a picture, the or of the bitmaps of its tags,
+    identifies its completed tags, most pictures share their completed tags with others,
+    so the completed tags are only built, sorted and packed once per distinct bitmap.
+    Both steps run as map and reduce over the picture tags without a Python loop per tag.
+    """
+    __slots__ = ("tag_dictionary", "completions", "bitmaps", "packed")
+
+    def __init__(self, tag_tree: 'TagTree', tag_dictionary: 'TagDictionary', cursor: sqlite3.Cursor):
+        """
+        Parameters:
+        tag_tree (TagTree): The tag tree to complete with.
+        tag_dictionary (TagDictionary): The tag ids, parent tags no picture carries yet are added with cursor.
+        """
+        self.tag_dictionary = tag_dictionary
+        parent_tag_dict = tag_tree.get_all_parent_tag(include_synonyms=True)
+        tags = list(tag_tree.tag_dict.keys() | parent_tag_dict.keys())
+        tag_ids = dict(zip(tags, tag_dictionary.intern(tags, cursor)))
+        self.completions: dict[int, frozenset[int]] = {}
+        for tag in tags:
+            completion = frozenset(map(tag_ids.__getitem__, parent_tag_dict.get(tag, ())))
+            if tag_tree.is_in_tree(tag):
+                completion = completion | {tag_ids[tag]}
+            self.completions[tag_ids[tag]] = completion
+        
+        tag_bits = {tag_id: 1 << bit for bit, tag_id in enumerate(set().union(*self.completions.values()))}
+        self.bitmaps: dict[int, int] = {
+            tag_id: reduce(or_, map(tag_bits.__getitem__, completion), 0) for tag_id, completion in self.completions.items()
+        }
+        self.packed: dict[int, bytes] = {}
+
+    def complete(self, tag_ids: Iterable[int]) -> list[int]:
+        """Get the sorted completed tag ids of a picture, tags outside the tree and without parents complete to nothing"""
+        return sorted(EMPTY.union(*map(self.completions.get, tag_ids, repeat(EMPTY))))
+
+    def complete_blob(self, tags_blob: bytes) -> bytes:
+        """Complete the packed tag ids of a picture, returns the packed completed tag ids as stored in the database"""
+        tag_ids = self.tag_dictionary.unpack(tags_blob)
+        bitmap = reduce(or_, map(self.bitmaps.get, tag_ids, repeat(0)), 0)
+        packed = self.packed.get(bitmap)
+        if packed is None:
+            packed = self.tag_dictionary.pack(self.complete(tag_ids))
+            self.packed[bitmap] = packed
+
+        return packed
@@ -42,8 +42,8 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.heightRatioSpinBox.valueChanged.connect(self.controller.ratio_spin_box_sort)
         self.ratioSlider.valueChanged.connect(self.controller.ratio_slider_sort)
 
-        # scroll event
-        self.picBrowseScrollArea.verticalScrollBar().valueChanged.connect(self.on_scroll_pic_browse)
+        # scroll event, prefetch the thumbnails around the new position
+        self.picBrowseListView.verticalScrollBar().valueChanged.connect(self.controller.schedule_thumbnail_prefetch)
 
         # add new picture event
         self.addNewPicsAction.triggered.connect(self.controller.select_directory_for_new_pics)
@@ -60,14 +60,9 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         
         return super().eventFilter(source, event)
 
-    def on_scroll_pic_browse(self):
-        scroll_bar = self.picBrowseScrollArea.verticalScrollBar()
-        if scroll_bar.maximum() == scroll_bar.value() and not self.controller.loading_pics:
-            self.controller.load_more_pics()
-            
     def resizeEvent(self, event):
-        self.controller.refresh_browse_area_width()
-        
+        self.controller.schedule_thumbnail_prefetch()
+
         return super().resizeEvent(event)
 
     def showEvent(self, event):
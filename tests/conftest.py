@@ -0,0 +1,70 @@
+import json
+import os
+import sys
+
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+from service.database import PicDatabase
+from service.tag_tree import TagTree
+
+# 标签 - 角色 - #VOCALOID - #初音未来 (#39, #ミク)
+#                         - #KAITO
+#      - 属性 - #白发 - #初音未来
+TAG_TREE = {
+    "标签": ["", [], [], ["角色", "属性"]],
+    "角色": ["", ["标签"], [], ["#VOCALOID"]],
+    "属性": ["", ["标签"], [], ["#白发"]],
+    "#VOCALOID": ["Group", ["角色"], ["#ボーカロイド"], ["#初音未来", "#KAITO"]],
+    "#初音未来": ["Character", ["#VOCALOID", "#白发"], ["#39", "#ミク"], []],
+    "#KAITO": ["Character", ["#VOCALOID"], [], []],
+    "#白发": ["Attribute", ["属性"], [], ["#初音未来"]],
+}
+
+def write_metadata(directory: str, pid: int, tags: list[str]) -> str:
+    """Write the metadata file of a picture as the downloader saves it"""
+    file_path = os.path.join(directory, f"{pid}.txt")
+    with open(file_path, "w", encoding="utf-8") as file:
+        file.write(
+            f"ID\n{pid}\n\nTITLE\ntitle {pid}\n\nUSER\nuser\n\nUSERID\n{pid % 7}\n\nURL\nhttps://www.pixiv.net/artworks/{pid}\n\n"
+            + "TAGS\n" + "".join(f"{tag}\n" for tag in tags)
+            + "\nDATE\n2024-01-01\n\nDESC\n\n\ndescription\n"
+        )
+    return file_path
+
+def write_picture(directory: str, pid: int, num: int = 0, size: tuple[int, int] = (4, 3)) -> str:
+    """Write a picture file named {pid}_p{num}.png"""
+    file_path = os.path.join(directory, f"{pid}_p{num}.png")
+    Image.new("RGB", size).save(file_path)
+    return file_path
+
+def write_library(directory: str, library: dict[int, list[str]]) -> None:
+    """Write the metadata file and one picture of every pid"""
+    for pid, tags in library.items():
+        write_metadata(directory, pid, tags)
+        write_picture(directory, pid)
+
+@pytest.fixture
+def tag_tree(tmp_path) -> TagTree:
+    tag_tree_data = {
+        name: {"name": name, "enName": "", "parent": parent, "synonyms": synonyms, "subTags": sub_tags, "type": tag_type}
+        for name, (tag_type, parent, synonyms, sub_tags) in TAG_TREE.items()
+    }
+    file_path = tmp_path / "tag_tree.json"
+    file_path.write_text(json.dumps(tag_tree_data, ensure_ascii=False), encoding="utf-8")
+    return TagTree(str(file_path))
+
+@pytest.fixture
+def database_directory(tmp_path, monkeypatch):
+    """Run the test in an empty directory, the database singleton opens pic_data.db in the working directory"""
+    directory = tmp_path / "database"
+    directory.mkdir()
+    monkeypatch.chdir(directory)
+    PicDatabase._instance = None
+    yield directory
+    if PicDatabase._instance is not None and PicDatabase._instance.database:
+        PicDatabase._instance.database.close()
+        PicDatabase._instance.database = None
+    PicDatabase._instance = None
@@ -0,0 +1,46 @@
+import pytest
+
+from conftest import write_library, write_picture
+from service.database import PicDatabase, SQLITE_VARIABLE_LIMIT
+
+LIBRARY = {
+    8001: ["#KAITO"],
+    8002: ["#初音未来"],
+    8003: [],
+}
+
+@pytest.fixture
+def database(tmp_path, database_directory) -> PicDatabase:
+    library = tmp_path / "library"
+    library.mkdir()
+    write_library(str(library), LIBRARY)
+    write_picture(str(library), 8002, 1)
+    database = PicDatabase()
+    database.collect_data(str(library))
+    return database
+
+def count_selects(database: PicDatabase) -> list[str]:
+    statements = []
+    database.database.set_trace_callback(lambda statement: statements.append(statement) if statement.startswith("SELECT") else None)
+    return statements
+
+# the pictures are spread over chunks, between pids without data
+PIDS = [8003] + list(range(1, SQLITE_VARIABLE_LIMIT)) + [8001] + list(range(10_000, 10_000 + SQLITE_VARIABLE_LIMIT)) + [8002]
+
+def test_metadata_of_many_pids_in_chunked_queries(database):
+    statements = count_selects(database)
+    metadata_dict = database.get_metadata_dict(PIDS)
+    assert len(statements) == 3
+    assert sorted(metadata_dict) == [8001, 8002, 8003]
+    assert metadata_dict[8001].title == "title 8001"
+    assert metadata_dict[8001].tags == {"#KAITO"}
+
+def test_files_of_many_pids_in_chunked_queries(database):
+    statements = count_selects(database)
+    file_list = database.get_file_list(PIDS)
+    assert len(statements) == 3
+    assert [(pic_file.pid, pic_file.num) for pic_file in file_list] == [(8003, 0), (8001, 0), (8002, 0), (8002, 1)]
+
+    file_dict = database.get_file_dict([8002, 1, 8001])
+    assert {pid: [pic_file.num for pic_file in files] for pid, files in file_dict.items()} == {8002: [0, 1], 1: [], 8001: [0]}
+    assert database.get_file_list([]) == [] and database.get_metadata_dict([]) == {}
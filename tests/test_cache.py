@@ -0,0 +1,34 @@
+from utils.cache import LRUCache
+
+def test_least_recently_used_entries_are_evicted():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1 # b is now the least recently used
+    cache.put("c", 3)
+    assert "b" not in cache and "a" in cache and "c" in cache
+    assert cache.get("b", "missing") == "missing"
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'evictions': 1, 'entries': 2, 'bytes': 0}
+
+def test_memory_bound():
+    cache = LRUCache(10, max_bytes=10, sizeof=len)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    cache.put("a", "xx") # replacing an entry releases its old size
+    assert cache.nbytes == 6 and len(cache) == 2
+    cache.put("c", "xxxxxx")
+    assert "b" not in cache and cache.nbytes == 8 # b was used least recently, replacing a refreshed it
+    # an entry larger than the bound is kept on its own rather than evicting itself
+    cache.put("d", "x" * 20)
+    assert list(cache.entries) == ["d"] and cache.nbytes == 20
+
+def test_contains_does_not_refresh_or_count():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert "a" in cache
+    cache.put("c", 3)
+    assert "a" not in cache
+    assert cache.stats()["hits"] == cache.stats()["misses"] == 0
+    cache.clear()
+    assert len(cache) == 0 and cache.nbytes == 0
@@ -0,0 +1,57 @@
+import pytest
+from PIL import Image
+
+from conftest import write_metadata, write_picture
+from service.catalog import FileCatalog
+from service.database import PicDatabase, FileQuery
+
+# pid: sizes of its pictures, pictures of the same ratio keep their pid and num order
+FILES = {
+    4001: [(4, 3), (3, 4)],
+    4002: [(8, 2)],
+    4003: [(4, 4), (6, 3), (4, 3)],
+    4004: [(2, 8)],
+    4005: [(5, 5)],
+}
+
+QUERIES = [
+    FileQuery(),
+    FileQuery(ratio=1.0),
+    FileQuery(ratio=0.75),
+    FileQuery(excluded_file_types=frozenset({"jpg"})),
+    FileQuery(width_range=(4, -1), height_range=(-1, 4), ratio=1.3),
+    FileQuery(width_range=(-1, 5)),
+]
+
+@pytest.fixture
+def database(tmp_path, database_directory) -> PicDatabase:
+    library = tmp_path / "library"
+    library.mkdir()
+    for pid, sizes in FILES.items():
+        write_metadata(str(library), pid, [])
+        for num, size in enumerate(sizes):
+            write_picture(str(library), pid, num, size)
+    Image.new("RGB", (7, 7)).save(library / "4002_p1.jpg")
+
+    database = PicDatabase()
+    database.collect_data(str(library))
+    return database
+
+@pytest.fixture
+def catalog(database) -> FileCatalog:
+    return FileCatalog(database.iter_file_rows())
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("pids", [None, [4003, 4001, 4009], []])
+def test_query_rows_match_the_sql_listing(database, catalog, query, pids):
+    rows = catalog.iter_query_rows(query, pids)
+    assert catalog.get_pic_files(rows) == database.get_filtered_file_list(query, pids)
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_query_rows_leave_out_excluded_pids(database, catalog, query):
+    expected = [pic_file for pic_file in database.get_filtered_file_list(query) if pic_file.pid not in {4002, 4005}]
+    assert catalog.get_pic_files(catalog.iter_query_rows(query, excluded_pids={4002, 4005})) == expected
+
+def test_unfiltered_listing_keeps_the_first_row(catalog):
+    assert list(catalog.iter_query_rows(FileQuery())) == list(range(len(catalog)))
+    assert catalog.get_rows([4003, 4009, 4001]) == [4, 5, 6, 0, 1]
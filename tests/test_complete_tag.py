@@ -0,0 +1,84 @@
+import pytest
+
+from conftest import write_library
+from service.database import PicDatabase
+from utils.tag_completion import TagCompleter
+
+LIBRARY = {
+    5001: ["#初音未来"],
+    5002: ["#39", "#unknown"], # a synonym of #初音未来
+    5003: ["#KAITO"],
+    5004: ["#白发"],
+    5005: ["#unknown"],
+    5006: ["#ボーカロイド"], # a synonym of #VOCALOID
+    5007: [],
+}
+
+@pytest.fixture
+def database(tmp_path, database_directory) -> PicDatabase:
+    library = tmp_path / "library"
+    library.mkdir()
+    write_library(str(library), LIBRARY)
+    database = PicDatabase()
+    database.collect_data(str(library))
+    return database
+
+def complete_naively(tag_tree, tags: set[str]) -> set[str]:
+    """The completion of the per picture loop complete_tag replaced"""
+    parent_tag_dict = tag_tree.get_all_parent_tag(include_synonyms=True)
+    completed_tags = set()
+    for tag in tags:
+        completed_tags.update(parent_tag_dict.get(tag, ()))
+        if tag_tree.is_in_tree(tag):
+            completed_tags.add(tag)
+    return completed_tags
+
+def read_completed_tags(database: PicDatabase) -> dict[int, set[str]]:
+    return {pid: metadata.completed_tags for pid, metadata in database.get_metadata_dict(list(LIBRARY)).items()}
+
+def test_completion_matches_the_per_picture_loop(database, tag_tree):
+    changed_pids = database.complete_tag(tag_tree)
+    assert sorted(changed_pids) == sorted(LIBRARY) # NULL completed tags become empty ones
+    assert read_completed_tags(database) == {pid: complete_naively(tag_tree, set(tags)) for pid, tags in LIBRARY.items()}
+    assert read_completed_tags(database)[5002] == {"#初音未来", "#VOCALOID", "#白发"}
+    # completed tags are stored sorted, an unchanged tree writes nothing
+    assert database.complete_tag(tag_tree) == []
+
+def test_completer_shares_blobs_of_equal_completions(database, tag_tree):
+    completer = TagCompleter(tag_tree, database.tag_dictionary, database.cursor)
+    encode = lambda tags: database.tag_dictionary.encode(tags, database.cursor)
+    assert completer.complete_blob(encode(["#初音未来"])) is completer.complete_blob(encode(["#39", "#unknown"]))
+    assert completer.complete_blob(encode(["#unknown"])) == b""
+
+@pytest.mark.parametrize("indexed", [True, False])
+def test_subtree_completion_matches_full_completion(database, tag_tree, indexed):
+    database.complete_tag(tag_tree)
+    if indexed:
+        database.init_tag_index(tag_tree)
+    else: # like metadata inserted without collect_data, neither a tag index nor tag counts
+        database.cursor.execute("DELETE FROM tags")
+        database.database.commit()
+
+    # #unknown joins the tree under #KAITO, #VOCALOID gets a new synonym
+    tag_tree.add_new_tag("#unknown", "#KAITO")
+    tag_tree.add_synonym("#VOCALOID", "#ミク")
+    changed_tags = tag_tree.get_changed_tags()
+    assert database.get_pids_with_tags(changed_tags) == [5002, 5005]
+
+    changed_pids = database.complete_tag(tag_tree, affected_tags=changed_tags)
+    assert sorted(changed_pids) == [5002, 5005]
+    assert database.complete_tag(tag_tree) == []
+    assert read_completed_tags(database)[5005] == {"#unknown", "#KAITO", "#VOCALOID"}
+
+@pytest.mark.parametrize("instr_scan_limit", [0, 8])
+def test_pids_with_tags_finds_unindexed_tags(database, tag_tree, monkeypatch, instr_scan_limit):
+    monkeypatch.setattr("service.database.INSTR_SCAN_LIMIT", instr_scan_limit)
+    database.complete_tag(tag_tree)
+    database.init_tag_index(tag_tree)
+
+    # 5001 and 5002 are indexed under #初音未来 and found through its postings, 5006 is indexed under #VOCALOID
+    assert database.get_pids_with_tags(["#初音未来"]) == [5001, 5002]
+    assert database.get_pids_with_tags(["#VOCALOID"]) == [5006]
+    # #39 and #ボーカロイド have no postings, the pictures carrying them are found in the metadata
+    assert database.get_pids_with_tags(["#ボーカロイド", "#39", "#unknown"]) == [5002, 5005, 5006]
+    assert database.get_pids_with_tags(["#missing"]) == []
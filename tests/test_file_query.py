@@ -0,0 +1,88 @@
+import pytest
+from PIL import Image
+
+from conftest import write_metadata, write_picture
+from service.database import PicDatabase, PicFile, FileQuery
+
+# pid: tags and sizes of its pictures
+LIBRARY = {
+    4101: (["#KAITO"], [(4, 3), (3, 4)]),
+    4102: (["#R-18", "#KAITO"], [(8, 2)]),
+    4103: (["#unknown"], [(4, 4), (6, 3), (4, 3)]),
+    4104: (["#初音未来"], [(2, 8)]),
+    4105: ([], [(5, 5), (10, 8)]),
+}
+
+QUERIES = [
+    FileQuery(),
+    FileQuery(ratio=1.0),
+    FileQuery(ratio=0.75, excluded_file_types=frozenset({"png"})),
+    FileQuery(excluded_file_types=frozenset({"jpg", "gif"})),
+    FileQuery(width_range=(4, -1), height_range=(-1, 4), ratio=1.3),
+    FileQuery(width_range=(-1, 5), include_restricted=False),
+    FileQuery(untagged_only=True, ratio=1.2),
+]
+
+@pytest.fixture
+def database(tmp_path, database_directory, tag_tree) -> PicDatabase:
+    library = tmp_path / "library"
+    library.mkdir()
+    for pid, (tags, sizes) in LIBRARY.items():
+        write_metadata(str(library), pid, tags)
+        for num, size in enumerate(sizes):
+            write_picture(str(library), pid, num, size)
+    Image.new("RGB", (7, 7)).save(library / "4102_p1.jpg")
+    Image.new("RGB", (9, 3)).save(library / "4104_p1.gif")
+
+    database = PicDatabase()
+    database.collect_data(str(library))
+    database.complete_tag(tag_tree)
+    return database
+
+def list_naively(database: PicDatabase, query: FileQuery, pids=None) -> list[PicFile]:
+    """Filter and sort every file in Python"""
+    metadata_dict = database.get_metadata_dict(list(LIBRARY))
+    pic_files = []
+    for pic_file in database.get_file_list(list(LIBRARY) if pids is None else pids):
+        metadata = metadata_dict[pic_file.pid]
+        if pic_file.file_type in query.excluded_file_types:
+            continue
+        if not all(
+            (minimum == -1 or value >= minimum) and (maximum == -1 or value <= maximum)
+            for value, (minimum, maximum) in ((pic_file.width, query.width_range), (pic_file.height, query.height_range))
+        ):
+            continue
+        if not query.include_restricted and metadata.x_restrict != "allAges":
+            continue
+        if query.untagged_only and metadata.completed_tags:
+            continue
+        pic_files.append(pic_file)
+    if query.ratio is not None:
+        pic_files.sort(key=lambda pic_file: abs(pic_file.ratio - query.ratio))
+    return pic_files
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("pids", [None, [4103, 4101, 4102]])
+def test_sql_listing_matches_python_filters(database, query, pids):
+    expected = list_naively(database, query, pids)
+    assert expected
+    assert database.get_filtered_file_list(query, pids) == expected
+    assert database.count_filtered_files(query, pids) == len(expected)
+    # pages of two files
+    pages = [database.get_filtered_file_list(query, pids, limit=2, offset=offset) for offset in range(0, len(expected) + 2, 2)]
+    assert [pic_file for page in pages for pic_file in page] == expected
+    assert pages[-1] == []
+
+def test_pid_restriction_is_not_limited_by_sqlite_variables(database):
+    pids = list(range(10_000, 15_000)) + [4104]
+    assert [pic_file.pid for pic_file in database.get_filtered_file_list(FileQuery(), pids)] == [4104, 4104]
+    assert database.count_filtered_files(FileQuery(ratio=1.0), pids) == 2
+
+def test_filters_use_the_indexes(database):
+    cursor = database.cursor
+    def plan(query: FileQuery, ratio_bound: str = None) -> str:
+        sql, params = database._build_file_query(query, None, "*", ratio_bound)
+        return " ".join(row[-1] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall())
+
+    assert "fileRatio" in plan(FileQuery(ratio=1.0), ">=")
+    assert "fileResolution" in plan(FileQuery(width_range=(1000, -1)))
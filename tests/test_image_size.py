@@ -0,0 +1,42 @@
+import pytest
+from PIL import Image
+
+from utils import image_size
+from utils.image_size import probe_image_size
+
+@pytest.fixture
+def no_pil(monkeypatch):
+    """Fail if the probe falls back to decoding the picture with PIL"""
+    def read_image_size_with_pil(file_path):
+        raise AssertionError(f"{file_path} was opened with PIL")
+    monkeypatch.setattr(image_size, "read_image_size_with_pil", read_image_size_with_pil)
+
+@pytest.mark.parametrize("file_name, mode, options", [
+    ("rgb.png", "RGB", {}),
+    ("rgba.png", "RGBA", {}),
+    ("gray.png", "L", {}),
+    ("baseline.jpg", "RGB", {}),
+    ("progressive.jpg", "RGB", {"progressive": True}),
+    ("exif.jpg", "RGB", {"exif": b"Exif\x00\x00" + b"\x00" * 20_000}), # a large APP1 segment before the frame header
+    ("gray.jpg", "L", {}),
+    ("palette.gif", "P", {}),
+])
+def test_header_sizes_match_pil(tmp_path, no_pil, file_name, mode, options):
+    file_path = tmp_path / file_name
+    Image.new(mode, (37, 19)).save(file_path, **options)
+    assert probe_image_size(str(file_path)) == (37, 19)
+
+def test_unknown_formats_fall_back_to_pil(tmp_path):
+    file_path = tmp_path / "bitmap.png" # a bmp file with the wrong extension
+    Image.new("RGB", (12, 5)).save(file_path, format="BMP")
+    assert probe_image_size(str(file_path)) == (12, 5)
+
+def test_truncated_headers_fall_back_to_pil(tmp_path, monkeypatch):
+    file_path = tmp_path / "truncated.jpg"
+    file_path.write_bytes(b"\xff\xd8\xff\xe0\x00")
+    monkeypatch.setattr(image_size, "read_image_size_with_pil", lambda file_path: (-1, -1))
+    assert probe_image_size(str(file_path)) == (-1, -1)
+
+    file_path = tmp_path / "short.gif"
+    file_path.write_bytes(b"GIF89a\x01")
+    assert probe_image_size(str(file_path)) == (-1, -1)
@@ -0,0 +1,72 @@
+import os
+from collections import Counter
+
+import pytest
+from PIL import Image
+
+from conftest import write_library, write_metadata, write_picture
+from service.database import PicDatabase
+from service.ingest import IngestPipeline
+from service.manifest import FileManifest
+
+LIBRARY = {pid: [f"#a{pid % 4}", f"#b{pid % 3}"] for pid in range(9001, 9011)}
+
+@pytest.fixture
+def library(tmp_path) -> str:
+    library = tmp_path / "library"
+    (library / "nested").mkdir(parents=True)
+    write_library(str(library), LIBRARY)
+    write_metadata(str(library / "nested"), 9011, ["#a0", "#nested"])
+    write_picture(str(library / "nested"), 9011, 0, (5, 7))
+    write_picture(str(library / "nested"), 9011, 1, (7, 5))
+    Image.new("RGB", (3, 3)).save(library / "9001_p1.jpg")
+    Image.new("RGB", (2, 6)).save(library / "9002_p1.gif")
+    Image.new("RGB", (2, 2)).save(library / "9003_p1.webp") # not parsable, ignored
+    return str(library)
+
+def read_tables(database: PicDatabase) -> dict[str, object]:
+    cursor = database.cursor
+    metadata = database.get_metadata_dict(database._get_pid_list())
+    return {
+        "imageData": sorted(cursor.execute("SELECT * FROM imageData").fetchall()),
+        "metadata": {pid: (row.title, row.tags, row.user_id) for pid, row in metadata.items()},
+        "tags": sorted(cursor.execute("SELECT originalTag, appearanceCount FROM tags").fetchall()),
+        "fileManifest": sorted(cursor.execute("SELECT path, size FROM fileManifest").fetchall()),
+    }
+
+def reopen_database(database: PicDatabase) -> PicDatabase:
+    """Start over with an empty database in the same directory"""
+    database.database.close()
+    database.database = None
+    PicDatabase._instance = None
+    os.remove("pic_data.db")
+    return PicDatabase()
+
+def test_pipeline_imports_like_the_sequential_import(database_directory, library):
+    database = PicDatabase()
+    processed_pids = database.collect_data(library)
+    expected = read_tables(database)
+    assert len(expected["imageData"]) == 14 and len(expected["metadata"]) == 11
+    tag_counts = Counter(tag for tags in LIBRARY.values() for tag in tags) + Counter(["#a0", "#nested"])
+    assert expected["tags"] == sorted(tag_counts.items())
+
+    database = reopen_database(database)
+    # batches of two files and commits every three rows run the pipeline through many flushes
+    manifest = FileManifest(library, database.cursor)
+    pipeline = IngestPipeline(database, database.database, 2, manifest, batch_size=2, commit_interval=3)
+    assert sorted(pipeline.run(library)) == sorted(processed_pids)
+    assert not database.database.in_transaction
+    assert read_tables(database) == expected
+
+    # through collect_data, an unchanged library is not parsed again
+    assert database.collect_data(library, workers=2) == []
+    assert read_tables(database) == expected
+
+def test_pipeline_updates_tag_counts_of_changed_files(database_directory, library):
+    database = PicDatabase()
+    database.collect_data(library, workers=2)
+    write_metadata(library, 9004, ["#a0", "#changed and longer"]) # was #a0 and #b1
+    database.collect_data(library, workers=2)
+    tags = dict(database.cursor.execute("SELECT originalTag, appearanceCount FROM tags").fetchall())
+    assert tags["#changed and longer"] == 1
+    assert (tags["#a0"], tags["#b1"]) == (3, 3)
@@ -0,0 +1,121 @@
+import os
+import shutil
+
+import pytest
+
+from conftest import write_metadata, write_picture
+from service.database import PicDatabase
+
+def read_files(database: PicDatabase) -> dict[tuple[int, int], str]:
+    rows = database.cursor.execute("SELECT pid, num, directory FROM imageData").fetchall()
+    return {(pid, num): os.path.normcase(os.path.abspath(directory)) for pid, num, directory in rows}
+
+def read_manifest(database: PicDatabase) -> set[str]:
+    return {row[0] for row in database.cursor.execute("SELECT path FROM fileManifest").fetchall()}
+
+def normalize(path) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+@pytest.fixture
+def libraries(tmp_path):
+    # lib_a2 shares the prefix of lib_a, its files are not part of the manifest of lib_a
+    directories = [tmp_path / name for name in ("lib_a", "lib_a2", "lib_b")]
+    for directory in directories:
+        directory.mkdir()
+
+    lib_a, lib_a2, lib_b = map(str, directories)
+    write_metadata(lib_a, 2001, ["#KAITO"])
+    for num in range(3):
+        write_picture(lib_a, 2001, num)
+    write_picture(lib_a, 2002)
+    write_picture(lib_a2, 2003)
+    return lib_a, lib_a2, lib_b
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_moved_and_deleted_files(database_directory, libraries, workers):
+    lib_a, lib_a2, lib_b = libraries
+    database = PicDatabase()
+    assert database.collect_data(lib_a, workers=workers) == [2001]
+    database.collect_data(lib_a2, workers=workers)
+    assert read_files(database) == {
+        (2001, 0): normalize(lib_a), (2001, 1): normalize(lib_a), (2001, 2): normalize(lib_a),
+        (2002, 0): normalize(lib_a), (2003, 0): normalize(lib_a2),
+    }
+
+    # an unchanged library is not parsed again
+    assert database.collect_data(lib_a, workers=workers) == []
+
+    # 2001_p1 moves to lib_b, which is imported before lib_a is imported again, 2001_p2 and 2003_p0 are deleted
+    shutil.move(os.path.join(lib_a, "2001_p1.png"), os.path.join(lib_b, "2001_p1.png"))
+    os.remove(os.path.join(lib_a, "2001_p2.png"))
+    os.remove(os.path.join(lib_a2, "2003_p0.png"))
+    database.collect_data(lib_b, workers=workers)
+    database.collect_data(lib_a, workers=workers)
+
+    assert read_files(database) == {
+        (2001, 0): normalize(lib_a), (2001, 1): normalize(lib_b), (2002, 0): normalize(lib_a), (2003, 0): normalize(lib_a2),
+    }
+    assert read_manifest(database) == {
+        normalize(os.path.join(lib_a, file_name)) for file_name in ("2001.txt", "2001_p0.png", "2002_p0.png")
+    } | {normalize(os.path.join(lib_b, "2001_p1.png")), normalize(os.path.join(lib_a2, "2003_p0.png"))}
+
+    # the deleted file of lib_a2 is only removed when lib_a2 itself is imported
+    database.collect_data(lib_a2, workers=workers)
+    assert (2003, 0) not in read_files(database)
+    assert normalize(os.path.join(lib_a2, "2003_p0.png")) not in read_manifest(database)
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_moved_back_file(database_directory, libraries, workers):
+    """A file moved away and back is imported again from its old folder"""
+    lib_a, lib_a2, lib_b = libraries
+    database = PicDatabase()
+    database.collect_data(lib_a, workers=workers)
+
+    shutil.move(os.path.join(lib_a, "2002_p0.png"), os.path.join(lib_b, "2002_p0.png"))
+    database.collect_data(lib_b, workers=workers)
+    database.collect_data(lib_a, workers=workers)
+    assert read_files(database)[(2002, 0)] == normalize(lib_b)
+
+    shutil.move(os.path.join(lib_b, "2002_p0.png"), os.path.join(lib_a, "2002_p0.png"))
+    database.collect_data(lib_a, workers=workers)
+    database.collect_data(lib_b, workers=workers)
+    assert read_files(database)[(2002, 0)] == normalize(lib_a)
+    assert normalize(os.path.join(lib_b, "2002_p0.png")) not in read_manifest(database)
+
+def test_modified_file(database_directory, libraries):
+    lib_a, lib_a2, lib_b = libraries
+    database = PicDatabase()
+    database.collect_data(lib_a)
+
+    file_path = write_picture(lib_a, 2002, size=(8, 2))
+    stat = os.stat(file_path)
+    os.utime(file_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000)) # a new mtime even on coarse clocks
+    database.collect_data(lib_a)
+    assert database.cursor.execute("SELECT width, height FROM imageData WHERE pid = 2002").fetchall() == [(8, 2)]
+
+def read_tag_counts(database: PicDatabase) -> dict[str, int]:
+    return dict(database.cursor.execute("SELECT originalTag, appearanceCount FROM tags").fetchall())
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_deleted_metadata_file(database_directory, libraries, tag_tree, workers):
+    lib_a, lib_a2, lib_b = libraries
+    write_metadata(lib_a2, 2003, ["#KAITO", "#初音未来"])
+    database = PicDatabase()
+    database.collect_data(lib_a, workers=workers)
+    database.collect_data(lib_a2, workers=workers)
+    database.complete_tag(tag_tree)
+    database.init_tag_index(tag_tree)
+    assert read_tag_counts(database) == {"#KAITO": 2, "#初音未来": 1}
+
+    # 2001.txt moves to lib_b and is still the metadata of 2001, 2003.txt is deleted
+    shutil.move(os.path.join(lib_a, "2001.txt"), os.path.join(lib_b, "2001.txt"))
+    os.remove(os.path.join(lib_a2, "2003.txt"))
+    database.collect_data(lib_b, workers=workers)
+    database.collect_data(lib_a, workers=workers)
+    database.collect_data(lib_a2, workers=workers)
+
+    assert [row[0] for row in database.cursor.execute("SELECT pid FROM metadata").fetchall()] == [2001]
+    assert database.cursor.execute("SELECT DISTINCT pid FROM tagPosting").fetchall() == [(2001,)]
+    assert read_tag_counts(database) == {"#KAITO": 1, "#初音未来": 0}
+    # the picture files of 2003 are kept
+    assert (2003, 0) in read_files(database)
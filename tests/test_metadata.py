@@ -0,0 +1,81 @@
+import pytest
+
+from conftest import write_library
+from service.catalog import FileCatalog
+from service.database import PicDatabase, PicMetadata, FileQuery, ResultCursor, METADATA_GRID_FIELDS
+
+LIBRARY = {
+    3001: ["#KAITO", "#unknown"],
+    3002: ["#初音未来"],
+    3003: [],
+}
+
+@pytest.fixture
+def database(tmp_path, database_directory, tag_tree) -> PicDatabase:
+    library = tmp_path / "library"
+    library.mkdir()
+    write_library(str(library), LIBRARY)
+    database = PicDatabase()
+    database.collect_data(str(library))
+    database.complete_tag(tag_tree)
+    return database
+
+def count_decodes(database: PicDatabase, monkeypatch) -> list[bytes]:
+    decoded = []
+    decode = database.tag_dictionary.decode
+    def counting_decode(blob, *args, **kwargs):
+        decoded.append(blob)
+        return decode(blob, *args, **kwargs)
+    monkeypatch.setattr(database.tag_dictionary, "decode", counting_decode)
+    return decoded
+
+def test_rows_are_slotted():
+    assert not hasattr(PicMetadata(1), "__dict__")
+
+def test_tags_are_decoded_once_on_first_access(database, monkeypatch):
+    metadata_dict = database.get_metadata_dict(list(LIBRARY))
+    decoded = count_decodes(database, monkeypatch)
+    assert decoded == []
+
+    metadata = metadata_dict[3001]
+    assert metadata.tags == {"#KAITO", "#unknown"}
+    assert metadata.tags is metadata.tags
+    assert decoded == [metadata.tags_blob]
+    assert metadata.completed_tags == {"#KAITO", "#VOCALOID"}
+    assert metadata.completed_tags is metadata.completed_tags
+    assert decoded == [metadata.tags_blob, metadata.completed_tags_blob]
+
+    # a picture without tags never reaches the dictionary
+    assert metadata_dict[3003].tags == set()
+    assert len(decoded) == 2
+
+def test_projection_only_sets_the_requested_fields(database, monkeypatch):
+    full = database.get_metadata_dict(list(LIBRARY))
+    decoded = count_decodes(database, monkeypatch)
+    projected = database.get_metadata_dict(list(LIBRARY), fields=METADATA_GRID_FIELDS)
+
+    assert projected.keys() == full.keys()
+    for pid, metadata in projected.items():
+        assert (metadata.pid, metadata.title, metadata.user) == (pid, full[pid].title, full[pid].user)
+        assert metadata.tags_blob is None and metadata.completed_tags_blob is None
+        assert metadata.description is None and metadata.x_restrict is None
+        assert metadata.tags == set() and metadata.completed_tags == set()
+    assert decoded == []
+
+def test_projection_always_includes_pid(database):
+    metadata_list = database.get_metadata_list([3002], fields=["title"])
+    assert [(metadata.pid, metadata.title, metadata.user) for metadata in metadata_list] == [(3002, "title 3002", None)]
+
+def test_projection_rejects_unknown_fields(database):
+    with pytest.raises(ValueError, match="tagz"):
+        database.get_metadata_list([3001], fields=["title", "tagz"])
+
+def test_grid_pages_fetch_the_grid_fields(database):
+    catalog = FileCatalog(database.iter_file_rows())
+    result_cursor = ResultCursor(database, catalog, FileQuery(), pids=[3001, 3003], by_pid=True)
+    rows, pic_file_dict = result_cursor.fetch(10)
+    result_cursor.close()
+
+    assert [metadata.pid for metadata in rows] == [3001, 3003]
+    assert all(metadata.tags_blob is None and metadata.title for metadata in rows)
+    assert [pic_file.file_name for pic_file in pic_file_dict[3001]] == ["3001_p0.png"]
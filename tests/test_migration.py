@@ -0,0 +1,96 @@
+import json
+import sqlite3
+
+from conftest import write_metadata, write_picture
+from service.database import PicDatabase, DATABASE_VERSION
+
+LIBRARY = {
+    1001: ["#初音未来", "#unknown"],
+    1002: ["#39", "#KAITO"], # a synonym
+    1003: ["#白发", "#R-18"],
+    1004: ["#unknown"],
+    1005: ["#ボーカロイド", "#初音未来", "#ミク"],
+    1006: [],
+}
+
+def create_version_1_database(path: str, metadata_rows: list[tuple], image_rows: list[tuple], tag_rows: list[tuple], postings: list[tuple]) -> None:
+    """Create a database with the version 1 schema: JSON tag lists and the tag index keyed by tag strings"""
+    connection = sqlite3.connect(path)
+    connection.executescript(
+        '''
+            CREATE TABLE imageData (
+                pid INT, num INT, directory TEXT, fileName TEXT, fileType TEXT,
+                width INT, height INT, size INT, ratio REAL,
+                PRIMARY KEY (pid, num)
+            );
+            CREATE TABLE metadata (
+                pid INT, title TEXT, tags TEXT, completedTags TEXT, description TEXT, user TEXT, userId INT, date TEXT,
+                xRestrict TEXT, bookmarkCount INT, likeCount INT, viewCount INT, commentCount INT,
+                PRIMARY KEY (pid)
+            );
+            CREATE TABLE tagPosting (tag TEXT, pid INT, PRIMARY KEY (tag, pid)) WITHOUT ROWID;
+            CREATE INDEX postingPid ON tagPosting (pid);
+            CREATE TABLE tags (originalTag TEXT, translatedTag TEXT, appearanceCount INT, PRIMARY KEY (originalTag));
+            CREATE INDEX dataPid ON metadata (pid);
+            CREATE INDEX filePid ON imageData (pid);
+            PRAGMA user_version = 1;
+        '''
+    )
+    connection.executemany("INSERT INTO metadata VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", metadata_rows)
+    connection.executemany("INSERT INTO imageData VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", image_rows)
+    connection.executemany("INSERT INTO tags VALUES (?, ?, ?)", tag_rows)
+    connection.executemany("INSERT INTO tagPosting VALUES (?, ?)", postings)
+    connection.commit()
+    connection.close()
+
+def read_library(database: PicDatabase) -> dict:
+    """Everything the migration rewrites, with tag ids decoded"""
+    pids = database._get_pid_list()
+    metadata_dict = database.get_metadata_dict(pids)
+    return {
+        "tags": {pid: metadata.tags for pid, metadata in metadata_dict.items()},
+        "completed_tags": {pid: metadata.completed_tags for pid, metadata in metadata_dict.items()},
+        "postings": sorted(database.iter_tag_postings()),
+        "tag_counts": sorted(database.get_tag_count_list()),
+        "files": database.cursor.execute("SELECT * FROM imageData ORDER BY pid, num").fetchall(),
+    }
+
+def test_version_1_migrates_to_the_tags_of_a_fresh_import(tmp_path, monkeypatch, database_directory, tag_tree):
+    library = tmp_path / "library"
+    library.mkdir()
+    for pid, tags in LIBRARY.items():
+        write_metadata(str(library), pid, tags)
+        write_picture(str(library), pid)
+
+    database = PicDatabase()
+    database.collect_data(str(library))
+    database.complete_tag(tag_tree)
+    database.init_tag_index(tag_tree)
+    expected = read_library(database)
+
+    assert expected["completed_tags"][1001] == {"#初音未来", "#VOCALOID", "#白发"}
+    assert ("#unknown", None, 2) in expected["tag_counts"]
+    assert expected["postings"]
+
+    decode = database.tag_dictionary.decode
+    metadata_rows = [
+        (*row[:2], json.dumps(decode(row[2]), ensure_ascii=False), json.dumps(decode(row[3]), ensure_ascii=False), *row[4:])
+        for row in database.cursor.execute("SELECT * FROM metadata").fetchall()
+    ]
+    postings = [(tag, pid) for pid, tag in expected["postings"]]
+    database.database.close()
+    database.database = None
+    PicDatabase._instance = None
+
+    migrated_directory = tmp_path / "migrated"
+    migrated_directory.mkdir()
+    monkeypatch.chdir(migrated_directory)
+    create_version_1_database("pic_data.db", metadata_rows, expected["files"], expected["tag_counts"], postings)
+
+    database = PicDatabase()
+    assert database.cursor.execute("PRAGMA user_version").fetchone()[0] == DATABASE_VERSION
+    assert read_library(database) == expected
+    assert database.read_generation() == 0
+    # the migrated completed tags are the ones the tag tree completes to, nothing is left to complete
+    assert database.complete_tag(tag_tree) == []
+    assert set(database.get_pids_by_tag("#初音未来")) == {1001, 1002, 1005}
@@ -0,0 +1,77 @@
+from linecache import getline
+
+import pytest
+
+from conftest import write_metadata
+from utils.parser import parse_metadata, parse_metadata_files, parse_file_name
+
+def parse_with_linecache(file_path: str) -> tuple:
+    """The linecache based parser parse_metadata replaced"""
+    tags = set()
+    xRestrict = "allAges"
+    pid = int(getline(file_path, 2).strip())
+    title = getline(file_path, 5).strip()
+    user = getline(file_path, 8).strip()
+    user_id = int(getline(file_path, 11).strip())
+
+    line_num = 17
+    while getline(file_path, line_num) != "\n":
+        tags.add(getline(file_path, line_num).strip())
+        line_num += 1
+    if "#R-18" in tags:
+        xRestrict = "R-18"
+    elif "#R-18G" in tags:
+        xRestrict = "R-18G"
+    date = getline(file_path, line_num + 2).strip()
+
+    description_lines = []
+    line_num += 6
+    while line := getline(file_path, line_num):
+        description_lines.append(line)
+        line_num += 1
+    return pid, title, list(tags), "\n".join(description_lines), user, user_id, date, xRestrict
+
+def normalize(metadata: tuple) -> tuple:
+    """Tags come from a set, their order is arbitrary"""
+    return metadata[:2] + (sorted(metadata[2]),) + metadata[3:]
+
+@pytest.mark.parametrize("tags, description", [
+    (["#KAITO", "#初音未来"], "description\n"),
+    (["#R-18", "#KAITO"], "first line\n\nsecond line\n"),
+    (["#R-18G"], "no trailing newline"),
+    ([], ""),
+])
+def test_single_pass_parser_matches_linecache(tmp_path, tags, description):
+    file_path = write_metadata(str(tmp_path), 1234, tags)
+    with open(file_path, "r+", encoding="utf-8") as file:
+        content = file.read().replace("\ndescription\n", "\n" + description)
+        file.seek(0)
+        file.write(content)
+        file.truncate()
+
+    metadata = parse_metadata(file_path)
+    assert normalize(metadata) == normalize(parse_with_linecache(file_path))
+    assert metadata[0] == 1234 and metadata[1] == "title 1234" and metadata[5] == 1234 % 7
+
+def test_byte_order_mark_is_skipped(tmp_path):
+    file_path = write_metadata(str(tmp_path), 1234, ["#KAITO"])
+    with open(file_path, "rb") as file:
+        content = file.read()
+    with open(file_path, "wb") as file:
+        file.write(b"\xef\xbb\xbf" + content)
+    assert parse_metadata(file_path)[:3] == (1234, "title 1234", ["#KAITO"])
+
+def test_failed_files_are_collected(tmp_path):
+    good_path = write_metadata(str(tmp_path), 1234, ["#KAITO"])
+    bad_path = tmp_path / "5678.txt"
+    bad_path.write_text("ID\nnot a pid\n", encoding="utf-8")
+
+    errors = []
+    assert [metadata[0] for metadata in parse_metadata_files([str(bad_path), good_path], errors)] == [1234]
+    assert [path for path, message in errors] == [str(bad_path)]
+    with pytest.raises(ValueError):
+        parse_metadata_files([str(bad_path)])
+
+def test_file_names():
+    assert parse_file_name("1234_p5.png") == (1234, 5, "png")
+    assert parse_file_name("1234.jpg") == (1234, 0, "jpg")
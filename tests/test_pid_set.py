@@ -0,0 +1,55 @@
+import random
+
+import pytest
+
+from utils.pid_set import PidSet, ARRAY_LIMIT, CONTAINER_SIZE, set_nbytes
+
+def random_pids(rng: random.Random, kind: str) -> set[int]:
+    """Random pids filling array containers, bitmap containers or both"""
+    base = rng.randrange(0, 200) * CONTAINER_SIZE
+    if kind == "sparse": # a few dozen pids per container, spread over many containers like a real library
+        return {rng.randrange(100_000_000, 130_000_000) for _ in range(rng.randrange(0, 3000))}
+    if kind == "dense": # bitmap containers
+        return {base + rng.randrange(CONTAINER_SIZE) for _ in range(rng.randrange(ARRAY_LIMIT + 1, 3 * ARRAY_LIMIT))}
+    if kind == "limit": # containers just below and above the array limit
+        return set(rng.sample(range(base, base + CONTAINER_SIZE), rng.randrange(ARRAY_LIMIT - 50, ARRAY_LIMIT + 50)))
+    # arrays and bitmaps next to each other in neighbouring containers, with the first and last pid of a container
+    return (
+        {base, base + CONTAINER_SIZE - 1}
+        | {base + rng.randrange(CONTAINER_SIZE) for _ in range(rng.randrange(1, 200))}
+        | {base + CONTAINER_SIZE + rng.randrange(CONTAINER_SIZE) for _ in range(rng.randrange(ARRAY_LIMIT, 2 * ARRAY_LIMIT))}
+    )
+
+KINDS = ["sparse", "dense", "limit", "mixed"]
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("kind", KINDS)
+def test_pid_set_matches_set(kind, seed):
+    rng = random.Random(f"{kind} {seed}")
+    pids = random_pids(rng, kind)
+    pid_set = PidSet(rng.sample(sorted(pids), len(pids)) * 2) # unsorted, with duplicates
+
+    assert len(pid_set) == len(pids)
+    assert bool(pid_set) == bool(pids)
+    assert list(pid_set) == sorted(pids)
+    assert frozenset(pid_set) == pids
+    assert pid_set == pids and pid_set == frozenset(pids)
+    assert pid_set == PidSet(sorted(pids))
+    assert pid_set != pids | {-1 if not pids else max(pids) + 1}
+
+    probes = list(pids)[:500] + [rng.randrange(0, 200 * CONTAINER_SIZE) for _ in range(500)] + [0, CONTAINER_SIZE - 1, CONTAINER_SIZE]
+    for pid in probes:
+        assert (pid in pid_set) == (pid in pids)
+
+def test_empty():
+    empty = PidSet()
+    assert not empty
+    assert len(empty) == 0
+    assert list(empty) == []
+    assert 0 not in empty
+    assert empty == set()
+
+def test_dense_postings_are_smaller_than_sets():
+    rng = random.Random(0)
+    pids = random_pids(rng, "dense") | random_pids(rng, "mixed")
+    assert PidSet(pids).nbytes() * 5 < set_nbytes(frozenset(pids))
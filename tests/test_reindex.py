@@ -0,0 +1,79 @@
+import pytest
+
+from conftest import write_library
+from service.database import PicDatabase
+from service.tag_tree import TagTree
+
+LIBRARY = {
+    5201: ["#初音未来"],
+    5202: ["#ミク", "#unknown"], # a synonym of #初音未来
+    5203: ["#KAITO"],
+    5204: ["#白发"],
+    5205: ["#unknown"],
+    5206: ["#ボーカロイド"], # a synonym of #VOCALOID
+    5207: [],
+}
+
+@pytest.fixture
+def database(tmp_path, database_directory, tag_tree) -> PicDatabase:
+    library = tmp_path / "library"
+    library.mkdir()
+    write_library(str(library), LIBRARY)
+    database = PicDatabase()
+    database.collect_data(str(library))
+    database.complete_tag(tag_tree)
+    database.init_tag_index(tag_tree)
+    return database
+
+def read_index(database: PicDatabase) -> tuple[dict, set]:
+    completed_tags = {pid: metadata.completed_tags for pid, metadata in database.get_metadata_dict(list(LIBRARY)).items()}
+    return completed_tags, set(database.iter_tag_postings())
+
+EDITS = {
+    "add_new": lambda tag_tree: tag_tree.add_new_tag("#unknown", "#KAITO"),
+    "move": lambda tag_tree: (tag_tree.add_parent_tag("#初音未来", "#KAITO"), tag_tree.delete_tag("#初音未来", "#VOCALOID")),
+    "delete": lambda tag_tree: tag_tree.delete_tag("#初音未来", "#白发"),
+    "add_synonym": lambda tag_tree: tag_tree.add_synonym("#KAITO", "#unknown"),
+    "remove_synonym": lambda tag_tree: tag_tree.remove_synonym("#初音未来", "#ミク"),
+    "set_synonyms": lambda tag_tree: tag_tree.set_synonyms("#VOCALOID", {"#ミク"}),
+}
+
+CHANGED_TAGS = {
+    "add_new": {"#unknown"},
+    "move": {"#初音未来", "#39", "#ミク"},
+    "delete": {"#初音未来", "#39", "#ミク"},
+    "add_synonym": {"#unknown"},
+    "remove_synonym": {"#ミク"},
+    "set_synonyms": {"#ボーカロイド", "#ミク"},
+}
+
+@pytest.mark.parametrize("edit", EDITS)
+def test_changed_tags_of_edits(tag_tree, edit):
+    EDITS[edit](tag_tree)
+    assert tag_tree.get_changed_tags() == CHANGED_TAGS[edit]
+    tag_tree.clear_changes()
+    assert tag_tree.get_changed_tags() == set()
+
+@pytest.mark.parametrize("edit", EDITS)
+def test_reindex_matches_a_full_reindex(database, tag_tree, edit):
+    before = read_index(database)
+    EDITS[edit](tag_tree)
+    tag_tree.save_tree()
+    changed_tags = tag_tree.get_changed_tags()
+    generation = database.read_generation()
+
+    # the reindex thread loads the saved tree
+    reindexed_pids = database.reindex_tags(TagTree(tag_tree.file_path), changed_tags)
+    assert reindexed_pids and set(reindexed_pids) < set(LIBRARY)
+    assert database.read_generation() > generation
+    reindexed = read_index(database)
+    assert reindexed != before
+
+    database.complete_tag(tag_tree)
+    database.init_tag_index(tag_tree)
+    assert reindexed == read_index(database)
+
+def test_unchanged_tree_reindexes_nothing(database, tag_tree):
+    before = read_index(database)
+    assert database.reindex_tags(tag_tree, tag_tree.get_changed_tags()) == []
+    assert read_index(database) == before
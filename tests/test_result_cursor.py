@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import write_library, write_metadata
+from service.catalog import FileCatalog
+from service.database import PicDatabase, FileQuery, ResultCursor
+
+LIBRARY = {pid: ["#KAITO"] for pid in range(5101, 5108)}
+
+@pytest.fixture
+def database(tmp_path, database_directory, tag_tree) -> PicDatabase:
+    library = tmp_path / "library"
+    library.mkdir()
+    write_library(str(library), LIBRARY)
+    write_metadata(str(library), 5104, ["#R-18"])
+    database = PicDatabase()
+    database.collect_data(str(library))
+    database.complete_tag(tag_tree)
+    return database
+
+@pytest.fixture
+def catalog(database) -> FileCatalog:
+    return FileCatalog(database.iter_file_rows())
+
+def fetch_all(result_cursor: ResultCursor, size: int) -> list[list]:
+    pages = []
+    while not result_cursor.exhausted:
+        rows, pic_file_dict = result_cursor.fetch(size)
+        pages.append([row.pid for row in rows])
+    return pages
+
+def test_pictures_are_paged_in_pid_order(database, catalog):
+    assert fetch_all(ResultCursor(database, catalog, FileQuery(), by_pid=True), 3) == [
+        [5101, 5102, 5103], [5104, 5105, 5106], [5107]
+    ]
+    # a result filling its last page ends with an empty page
+    query = FileQuery(include_restricted=False)
+    assert fetch_all(ResultCursor(database, catalog, query, by_pid=True), 3) == [[5101, 5102, 5103], [5105, 5106, 5107], []]
+
+def test_pid_results_are_joined_from_a_temp_table(database, catalog):
+    result_cursor = ResultCursor(database, catalog, FileQuery(include_restricted=False), [5107, 5104, 5102, 9999], by_pid=True)
+    assert not database.database.in_transaction
+    rows, pic_file_dict = result_cursor.fetch(2)
+    assert [row.pid for row in rows] == [5102, 5107]
+    assert [pic_file.pid for pic_file in pic_file_dict[5107]] == [5107]
+
+    result_cursor.close()
+    assert result_cursor.fetch(2) == ([], {})
+    assert database.cursor.execute("SELECT name FROM sqlite_temp_master WHERE name LIKE 'resultPid%'").fetchall() == []
+
+def test_pages_continue_after_the_last_pid(database, catalog):
+    result_cursor = ResultCursor(database, catalog, FileQuery(), by_pid=True)
+    assert [row.pid for row in result_cursor.fetch(3)[0]] == [5101, 5102, 5103]
+    # a picture imported before the current page does not shift the following pages
+    database.cursor.execute("INSERT INTO metadata (pid) VALUES (5100)")
+    assert [row.pid for row in result_cursor.fetch(3)[0]] == [5104, 5105, 5106]
+
+@pytest.mark.parametrize("query", [FileQuery(), FileQuery(ratio=1.0, include_restricted=False)])
+def test_file_pages_match_the_sql_listing(database, catalog, query):
+    result_cursor = ResultCursor(database, catalog, query, [5107, 5104, 5101])
+    pic_files = []
+    while not result_cursor.exhausted:
+        pic_files += result_cursor.fetch(2)[0]
+    assert pic_files == database.get_filtered_file_list(query, [5107, 5104, 5101])
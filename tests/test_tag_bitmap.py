@@ -0,0 +1,17 @@
+from utils.tag_bitmap import TagBitmapIndex
+
+TAG_COUNTS = [("#KAITO", 1), ("#初音未来", 3), ("#白发", 2)]
+POSTINGS = [(1, "#初音未来"), (1, "#白发"), (2, "#初音未来"), (3, "#KAITO"), (3, "#初音未来"), (4, "#白发")]
+
+def test_frequent_tags_take_the_low_bits():
+    index = TagBitmapIndex(TAG_COUNTS, POSTINGS)
+    assert index.tags == ["#初音未来", "#白发", "#KAITO"]
+    assert index.bitmaps == {1: 0b011, 2: 0b001, 3: 0b101, 4: 0b010}
+
+def test_tags_of_pids():
+    index = TagBitmapIndex(TAG_COUNTS, POSTINGS)
+    assert index.get_tags([2]) == {"#初音未来"}
+    assert index.get_tags([2, 4, 9]) == {"#初音未来", "#白发"}
+    assert index.get_tags([3, 4, 1]) == {"#初音未来", "#白发", "#KAITO"}
+    assert index.get_tags([]) == set()
+    assert list(index.iter_tags(0b101)) == ["#初音未来", "#KAITO"]
@@ -0,0 +1,45 @@
+import pytest
+
+from conftest import write_library, write_metadata
+from service.database import PicDatabase
+
+LIBRARY = {
+    6001: ["#KAITO", "#unknown"],
+    6002: ["#初音未来", "#KAITO"],
+    6003: [],
+    6004: ["#KAITO"],
+}
+
+@pytest.fixture
+def library(tmp_path) -> str:
+    library = tmp_path / "library"
+    library.mkdir()
+    write_library(str(library), LIBRARY)
+    return str(library)
+
+def read_tag_counts(database: PicDatabase) -> dict[str, int]:
+    return dict(database.cursor.execute("SELECT originalTag, appearanceCount FROM tags").fetchall())
+
+@pytest.mark.parametrize("fetch_chunk_size", [1, 3, 10_000])
+def test_recount_matches_the_import_counts(database_directory, library, monkeypatch, fetch_chunk_size):
+    monkeypatch.setattr("service.database.FETCH_CHUNK_SIZE", fetch_chunk_size)
+    database = PicDatabase()
+    database.collect_data(library)
+    expected = {"#KAITO": 3, "#unknown": 1, "#初音未来": 1}
+    assert read_tag_counts(database) == expected
+
+    database.cursor.execute("UPDATE tags SET appearanceCount = 100")
+    database.count_tags()
+    assert read_tag_counts(database) == expected
+
+def test_counts_of_updated_tags(database_directory, library):
+    database = PicDatabase()
+    database.collect_data(library)
+    write_metadata(library, 6001, ["#初音未来"])
+    write_metadata(library, 6005, ["#unknown", "#new"])
+    database.collect_data(library)
+    assert read_tag_counts(database) == {"#KAITO": 2, "#unknown": 1, "#初音未来": 2, "#new": 1}
+
+    # the tags of given pids are added to the counts
+    database.count_tags([6004, 6005])
+    assert read_tag_counts(database) == {"#KAITO": 3, "#unknown": 2, "#初音未来": 2, "#new": 2}
@@ -0,0 +1,133 @@
+import sqlite3
+import threading
+
+import pytest
+
+from conftest import write_library
+from service.database import PicDatabase
+from service.tag_dictionary import TagDictionary, SQLITE_VARIABLE_LIMIT
+
+@pytest.fixture
+def database_path(tmp_path) -> str:
+    path = str(tmp_path / "pic_data.db")
+    connection = sqlite3.connect(path)
+    TagDictionary.create_table(connection.cursor())
+    connection.commit()
+    connection.close()
+    return path
+
+def open_dictionary(path: str) -> tuple[sqlite3.Connection, TagDictionary]:
+    """A connection with a dictionary of its own, like the picture manager and the tag manager processes"""
+    connection = sqlite3.connect(path)
+    return connection, TagDictionary(connection.cursor(), lambda: sqlite3.connect(path))
+
+def test_two_connections_share_ids(database_path):
+    connection_a, dictionary_a = open_dictionary(database_path)
+    connection_b, dictionary_b = open_dictionary(database_path)
+
+    ids_a = dictionary_a.intern(["#a", "#shared", "#a"], connection_a.cursor())
+    connection_a.commit()
+    ids_b = dictionary_b.intern(["#shared", "#b"], connection_b.cursor())
+    connection_b.commit()
+
+    assert ids_a[0] == ids_a[2]
+    assert ids_b[0] == ids_a[1]
+    assert len({ids_a[0], ids_a[1], ids_b[1]}) == 3
+
+    # tags added by the other connection are found in the database on a miss
+    assert dictionary_a.get_ids(["#b", "#missing"]) == {"#b": ids_b[1]}
+    assert dictionary_b.get_id("#a", connection_b.cursor()) == ids_a[0]
+    assert dictionary_b.get_id("#missing") is None
+
+    blob = dictionary_b.encode(["#b", "#shared", "#new"], connection_b.cursor())
+    connection_b.commit()
+    assert sorted(dictionary_a.decode(blob)) == ["#b", "#new", "#shared"]
+    assert dictionary_a.get_tag(dictionary_b.get_id("#new")) == "#new"
+
+    connection_a.close()
+    connection_b.close()
+
+def test_interleaved_transactions(database_path):
+    """Both connections intern the same new tags, the second waits for the write lock of the first"""
+    connection_a, dictionary_a = open_dictionary(database_path)
+    tags = [f"#tag{i}" for i in range(2 * SQLITE_VARIABLE_LIMIT + 10)]
+    results = {}
+
+    def intern_b():
+        connection_b, results["dictionary_b"] = open_dictionary(database_path)
+        results["b"] = results["dictionary_b"].intern(tags[::-1], connection_b.cursor())
+        connection_b.commit()
+        connection_b.close()
+
+    results["a"] = dictionary_a.intern(tags, connection_a.cursor())
+    thread = threading.Thread(target=intern_b)
+    thread.start()
+    thread.join(0.2)
+    assert thread.is_alive() # blocked on the uncommitted insert of connection a
+    connection_a.commit()
+    thread.join()
+
+    assert results["b"][::-1] == results["a"]
+    assert len(set(results["a"])) == len(tags)
+    assert dictionary_a.get_ids(tags) == results["dictionary_b"].get_ids(tags)
+
+    connection_a.close()
+
+def test_rolled_back_ids_are_not_cached(database_path):
+    """An id rolled back with its transaction is given to another tag, the cache must not keep the old tag"""
+    connection_a, dictionary = open_dictionary(database_path)
+    connection_b = sqlite3.connect(database_path)
+
+    blob = dictionary.encode(["#a"], connection_a.cursor())
+    # visible to the transaction that added it
+    assert dictionary.decode(blob, connection_a.cursor()) == ["#a"]
+    assert dictionary.get_id("#a", connection_a.cursor()) == dictionary.unpack(blob)[0]
+    connection_a.rollback()
+
+    tag_ids = dictionary.intern(["#b"], connection_b.cursor())
+    connection_b.commit()
+    assert dictionary.pack(tag_ids) == blob # sqlite reuses the rolled back id
+    assert dictionary.decode(blob) == ["#b"]
+    assert dictionary.get_tag(tag_ids[0]) == "#b"
+    assert dictionary.get_id("#a") is None
+    assert dictionary.intern(["#a", "#b"], connection_a.cursor())[1] == tag_ids[0]
+    connection_a.commit()
+    assert dictionary.get_ids(["#a", "#b"]) == dict(zip(["#a", "#b"], dictionary.intern(["#a", "#b"], connection_b.cursor())))
+
+    connection_a.close()
+    connection_b.close()
+
+def test_failed_import_does_not_corrupt_tags(tmp_path, monkeypatch, database_directory):
+    """An import on a connection of its own fails before it commits, its new tags are rolled back"""
+    libraries = {
+        "failed": {4001: ["#a", "#b"]},
+        "other": {4002: ["#c", "#d"]},
+        "retried": {4003: ["#a", "#b"]},
+    }
+    for name, library in libraries.items():
+        (tmp_path / name).mkdir()
+        write_library(str(tmp_path / name), library)
+
+    database = PicDatabase()
+    def fail(cursor):
+        raise RuntimeError("import failed")
+    connection = database.get_new_connection()
+    with monkeypatch.context() as patch, pytest.raises(RuntimeError):
+        patch.setattr(database, "_increase_generation", fail)
+        database.collect_data(str(tmp_path / "failed"), connection=connection)
+    connection.close()
+
+    database.collect_data(str(tmp_path / "other"))
+    database.collect_data(str(tmp_path / "retried"))
+    metadata_dict = database.get_metadata_dict([4001, 4002, 4003])
+    assert sorted(metadata_dict) == [4002, 4003]
+    assert metadata_dict[4002].tags == {"#c", "#d"}
+    assert metadata_dict[4003].tags == {"#a", "#b"}
+    assert sorted(database.cursor.execute("SELECT tag FROM tagDictionary").fetchall()) == [("#a",), ("#b",), ("#c",), ("#d",)]
+
+def test_pack_round_trip():
+    tag_ids = [1, 2, 300, 70_000, 2**32 - 1]
+    assert list(TagDictionary.unpack(TagDictionary.pack(tag_ids))) == tag_ids
+    assert TagDictionary.pack(tag_ids)[:4] == b"\x01\x00\x00\x00"
+    assert list(TagDictionary.unpack(None)) == []
+    assert list(TagDictionary.unpack(b"")) == []
@@ -0,0 +1,63 @@
+import pytest
+
+from conftest import write_library
+from controller.picture_manager import PictureManagerController, TagTreeSnapshot, SearchCancelled
+from service.database import PicDatabase
+from utils.cache import LRUCache
+from utils.pid_set import PidSet, set_nbytes
+
+LIBRARY = {
+    7001: ["#初音未来"],
+    7002: ["#KAITO"],
+    7003: ["#39", "#KAITO"],
+    7004: ["#白发"],
+}
+
+@pytest.fixture
+def controller(tmp_path, database_directory, tag_tree) -> PictureManagerController:
+    """A controller without a view, holding only the state the search executor reads"""
+    library = tmp_path / "library"
+    library.mkdir()
+    write_library(str(library), LIBRARY)
+    database = PicDatabase()
+    database.collect_data(str(library))
+    database.complete_tag(tag_tree)
+    database.init_tag_index(tag_tree)
+    database.read_generation()
+
+    controller = PictureManagerController.__new__(PictureManagerController)
+    controller.database = database
+    controller.tag_index_cache = LRUCache(100, 1 << 20, PidSet.nbytes)
+    controller.tag_bitmap_index = None
+    controller.restricted_pids = None
+    controller.search_file_catalog = None
+    return controller
+
+def snapshot(tag_tree) -> TagTreeSnapshot:
+    return TagTreeSnapshot(tag_tree, LRUCache(100, 1 << 20, set_nbytes))
+
+def search(controller, tree, include_tags, exclude_tags=()):
+    return controller._search_pics_by_tags(set(include_tags), set(exclude_tags), True, tree, controller.database.cursor, lambda: None)
+
+def test_tag_search_with_facet_counts(controller, tag_tree):
+    result = search(controller, snapshot(tag_tree), ["#VOCALOID"], ["#白发"])
+    assert result.pids == {7002}
+    assert result.tag_counts == {"#VOCALOID": 1, "#KAITO": 1} # the tag type nodes are not shown
+
+    result = search(controller, snapshot(tag_tree), ["#VOCALOID"])
+    assert result.pids == {7001, 7002, 7003}
+    assert result.tag_counts == {"#VOCALOID": 3, "#初音未来": 2, "#KAITO": 2, "#白发": 2}
+
+def test_search_reads_the_tree_it_was_submitted_with(controller, tag_tree):
+    tree = snapshot(tag_tree)
+    # the GUI thread reloads the tree while the search runs, the search must not see the new state
+    controller.tag_tree = None
+    controller.descendant_pids_cache = None
+    assert search(controller, tree, ["#初音未来"]).pids == {7001, 7003}
+    assert ("#初音未来", tag_tree.version, controller.database.generation) in tree.descendant_pids_cache
+
+def test_cancelled_search_stops(controller, tag_tree):
+    def check_cancelled():
+        raise SearchCancelled()
+    with pytest.raises(SearchCancelled):
+        controller._search_pics_by_tags({"#KAITO"}, set(), True, snapshot(tag_tree), controller.database.cursor, check_cancelled)
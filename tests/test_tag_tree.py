@@ -0,0 +1,59 @@
+import pytest
+
+from service.tag_tree import TagTree
+
+def walk_sub_tags(tag_tree: TagTree, tag: str, include_synonyms: bool = False) -> set[str]:
+    """The recursive walk the closure replaced"""
+    node = tag_tree.get_tag(tag)
+    sub_tags = set(node.synonyms) if include_synonyms else set()
+    for sub_tag in node.sub_tags:
+        sub_tags.add(sub_tag)
+        sub_tags |= walk_sub_tags(tag_tree, sub_tag, include_synonyms)
+    return sub_tags
+
+def walk_ancestors(tag_tree: TagTree, tag: str) -> set[str]:
+    """Every node of the tree with tag below it"""
+    return {name for name in tag_tree.tag_dict if tag in walk_sub_tags(tag_tree, name)}
+
+def assert_closure_matches_walks(tag_tree: TagTree) -> None:
+    parent_tag_dict = tag_tree.get_all_parent_tag()
+    parent_tag_dict_with_synonyms = tag_tree.get_all_parent_tag(include_synonyms=True)
+    for name, tag in tag_tree.tag_dict.items():
+        assert tag_tree.get_sub_tags(name) == walk_sub_tags(tag_tree, name)
+        assert tag_tree.get_sub_tags(name, include_synonyoms=True) == walk_sub_tags(tag_tree, name, True)
+        assert tag_tree.get_ancestors(name) == walk_ancestors(tag_tree, name)
+        if tag.is_tag:
+            parent_tags = {ancestor for ancestor in walk_ancestors(tag_tree, name) if ancestor.startswith("#")}
+            assert parent_tag_dict[name] == parent_tags
+            for synonym in tag.synonyms:
+                assert parent_tags | {name} <= parent_tag_dict_with_synonyms[synonym]
+
+def test_closure_matches_recursive_walks(tag_tree):
+    assert_closure_matches_walks(tag_tree)
+    # #初音未来 has two parents
+    assert tag_tree.get_all_parent_tag()["#初音未来"] == {"#VOCALOID", "#白发"}
+    assert tag_tree.get_all_parent_tag(include_synonyms=True)["#39"] == {"#初音未来", "#VOCALOID", "#白发"}
+    assert tag_tree.get_ancestors("#KAITO") == {"标签", "角色", "#VOCALOID"}
+    assert tag_tree.is_sub_tag("角色", "#初音未来") and not tag_tree.is_sub_tag("#KAITO", "#初音未来")
+
+@pytest.mark.parametrize("edit", [
+    lambda tag_tree: tag_tree.add_new_tag("#new", "#KAITO"),
+    lambda tag_tree: tag_tree.add_parent_tag("#KAITO", "#白发"),
+    lambda tag_tree: tag_tree.delete_tag("#初音未来", "#白发"),
+    lambda tag_tree: tag_tree.add_synonym("#KAITO", "#カイト"),
+    lambda tag_tree: tag_tree.remove_synonym("#初音未来", "#39"),
+    lambda tag_tree: tag_tree.set_synonyms("#VOCALOID", {"#ボカロ"}),
+])
+def test_edits_rebuild_the_closure(tag_tree, edit):
+    tag_tree.get_all_parent_tag()
+    version = tag_tree.version
+    edit(tag_tree)
+    assert tag_tree.version == version + 1
+    assert_closure_matches_walks(tag_tree)
+
+def test_closure_is_shared_until_the_tree_changes(tag_tree):
+    assert tag_tree.get_all_parent_tag() is tag_tree.get_all_parent_tag()
+    assert tag_tree.get_sub_tags("角色") is tag_tree.get_sub_tags("角色")
+    with pytest.raises(ValueError):
+        tag_tree.get_sub_tags("#missing")
+    assert tag_tree.get_ancestors("#missing") == frozenset()